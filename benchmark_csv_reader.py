@@ -0,0 +1,108 @@
+import argparse
+import csv
+import time
+from typing import Callable, Dict
+
+import get_ranking
+
+READERS = {"csv.reader": csv.reader, "iterate_csv_rows": get_ranking.iterate_csv_rows}
+
+
+def measure_tokenize(log_path: str, reader: Callable) -> Dict:
+    """入力ファイルを行と列に分割するだけの処理時間を計測
+
+    Args:
+        log_path (str): 入力ファイルパス
+        reader (Callable): テキストストリームから行を返すCSVリーダー
+
+    Returns:
+        Dict: 行数と秒数
+    """
+    started = time.perf_counter()
+    with get_ranking.open_log(log_path) as log_file:
+        rows = sum(1 for _ in reader(log_file)) - 1
+    return {"rows": rows, "seconds": time.perf_counter() - started}
+
+
+def measure_generate(
+    entry_log_path: str, score_log_path: str, reader: Callable
+) -> Dict:
+    """generate_entry_data･generate_score_dataの処理時間を計測
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+        reader (Callable): get_ranking内で使うCSVリーダー
+
+    Returns:
+        Dict: 関数ごとの秒数
+    """
+    original_reader = get_ranking.iterate_csv_rows
+    get_ranking.iterate_csv_rows = reader
+    try:
+        started = time.perf_counter()
+        entry_data = get_ranking.generate_entry_data(entry_log_path)
+        entry_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        get_ranking.generate_score_data(score_log_path, entry_data)
+        score_seconds = time.perf_counter() - started
+    finally:
+        get_ranking.iterate_csv_rows = original_reader
+
+    return {"generate_entry_data": entry_seconds, "generate_score_data": score_seconds}
+
+
+def main(entry_log_path: str, score_log_path: str, repeat: int):
+    """csv.readerとiterate_csv_rowsの読み込み速度(rows/sec)を比較する
+
+    行と列への分割のみの速度と、generate_entry_data･generate_score_data全体の
+    速度をそれぞれのCSVリーダーで計測する。
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+        repeat (int): 計測回数(最速の回を出力)
+    """
+    rows = {}
+    print("phase,reader,rows,seconds,rows_per_second")
+    for phase, log_path in [
+        ("generate_entry_data", entry_log_path),
+        ("generate_score_data", score_log_path),
+    ]:
+        for reader_name, reader in READERS.items():
+            result = min(
+                (measure_tokenize(log_path, reader) for _ in range(repeat)),
+                key=lambda result: result["seconds"],
+            )
+            rows[phase] = result["rows"]
+            print(
+                f"tokenize:{phase},{reader_name},{result['rows']},"
+                f"{result['seconds']:.3f},{result['rows'] / result['seconds']:.0f}"
+            )
+
+    for reader_name, reader in READERS.items():
+        measurements = [
+            measure_generate(entry_log_path, score_log_path, reader)
+            for _ in range(repeat)
+        ]
+        for phase in rows:
+            seconds = min(measurement[phase] for measurement in measurements)
+            print(
+                f"{phase},{reader_name},{rows[phase]},{seconds:.3f},"
+                f"{rows[phase] / seconds:.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="csv.readerとiterate_csv_rowsの入力ファイルの読み込み速度を比較する"
+    )
+    parser.add_argument("entry_log_path", help="エントリーファイルパス")
+    parser.add_argument("score_log_path", help="プレイログファイルパス")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="計測回数(最速の回を出力)"
+    )
+    arguments = parser.parse_args()
+
+    main(arguments.entry_log_path, arguments.score_log_path, arguments.repeat)
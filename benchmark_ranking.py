@@ -0,0 +1,293 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import get_ranking
+
+
+def count_rows(log_path: str) -> int:
+    """ヘッダーを除いたログファイルの行数を数える
+
+    Args:
+        log_path (str): ログファイルパス
+
+    Returns:
+        int: 行数
+    """
+    with open(log_path, mode="rb") as log_file:
+        return max(sum(1 for _ in log_file) - 1, 0)
+
+
+def measure_phases(
+    aggregate_mode: str, entry_log_path: str, score_log_path: str, engine: str
+) -> Dict:
+    """main()の各処理を順に実行して処理時間を計測する
+
+    ピークメモリを他の計測と分けるため、計測ごとに新しいプロセスで実行する。
+
+    Args:
+        aggregate_mode (str): 集計モードを表す文字列
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+        engine (str): プレイログの集計エンジン(python/numpy)
+
+    Returns:
+        Dict: 処理ごとの秒数とピークメモリ
+    """
+    phase_seconds = {}
+
+    def run_phase(name, function, *arguments):
+        started = time.perf_counter()
+        result = function(*arguments)
+        phase_seconds[name] = time.perf_counter() - started
+        if result is None and name != "output_ranking_data":
+            raise RuntimeError(f"{name}が失敗しました。")
+        return result
+
+    entry_data = run_phase(
+        "load_entry_log",
+        get_ranking.load_entry_log,
+        entry_log_path,
+        get_ranking.ENTRY_LOG_HEADER,
+    )
+    score_data = run_phase(
+        "load_score_log",
+        get_ranking.load_score_log,
+        score_log_path,
+        get_ranking.SCORE_LOG_HEADER,
+        entry_data,
+        engine,
+        False,
+        None,
+        aggregate_mode in get_ranking.PERCENTILE_MODES,
+    )
+    ranking_data = run_phase(
+        "extract_ranking_data",
+        get_ranking.extract_ranking_data,
+        entry_data,
+        score_data,
+        aggregate_mode,
+        get_ranking.LOWEST_PLAY_TIMES,
+        get_ranking.RANKING_THRESHOLD,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_phase("output_ranking_data", get_ranking.output_ranking_data, ranking_data)
+
+    return {"phase_seconds": phase_seconds, "peak_rss": get_ranking.get_peak_rss()}
+
+
+def get_commit() -> Optional[str]:
+    """計測したソースコードのコミットを取得
+
+    Returns:
+        Optional[str]: コミットハッシュ(gitで管理されていない場合はNone、
+            未コミットの変更がある場合は末尾に+dirty)
+    """
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=source_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=source_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return commit + "+dirty" if status else commit
+
+
+def run_benchmark(
+    entry_log_path: str,
+    score_log_path: str,
+    engine: str,
+    repeat: int,
+    aggregate_modes: List[str],
+) -> List[Dict]:
+    """集計モードごとに計測し、最速だった回の結果を返す
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+        engine (str): プレイログの集計エンジン(python/numpy)
+        repeat (int): 計測回数
+        aggregate_modes (List[str]): 計測する集計モード
+
+    Returns:
+        List[Dict]: 集計モードごとの計測結果
+    """
+    results = []
+    entry_rows = count_rows(entry_log_path)
+    score_rows = count_rows(score_log_path)
+    context = multiprocessing.get_context("spawn")
+
+    for aggregate_mode in aggregate_modes:
+        measurements = []
+        for _ in range(repeat):
+            with context.Pool(1) as pool:
+                measurements.append(
+                    pool.apply(
+                        measure_phases,
+                        (aggregate_mode, entry_log_path, score_log_path, engine),
+                    )
+                )
+        measurement = min(
+            measurements,
+            key=lambda measurement: sum(measurement["phase_seconds"].values()),
+        )
+        total_seconds = sum(measurement["phase_seconds"].values())
+        results.append(
+            {
+                "aggregate_mode": aggregate_mode,
+                "engine": engine,
+                "entry_rows": entry_rows,
+                "score_rows": score_rows,
+                "phase_seconds": measurement["phase_seconds"],
+                "total_seconds": total_seconds,
+                "rows_per_second": (entry_rows + score_rows) / total_seconds,
+                "peak_rss": measurement["peak_rss"],
+            }
+        )
+
+    return results
+
+
+def read_previous_results(results_path: str) -> List[Dict]:
+    """保存済みの計測結果を読み込む
+
+    Args:
+        results_path (str): 計測結果ファイルパス(JSON Lines)
+
+    Returns:
+        List[Dict]: 計測結果
+    """
+    if not os.path.exists(results_path):
+        return []
+
+    with open(results_path, mode="r", encoding="utf-8") as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+
+def find_baseline(previous_results: List[Dict], result: Dict) -> Optional[Dict]:
+    """同じ条件で別のコミットを計測した直近の結果を探す
+
+    Args:
+        previous_results (List[Dict]): 保存済みの計測結果
+        result (Dict): 今回の計測結果
+
+    Returns:
+        Optional[Dict]: 比較対象の計測結果(見つからない場合はNone)
+    """
+    condition_keys = ["aggregate_mode", "engine", "entry_rows", "score_rows", "dataset"]
+    for previous_result in reversed(previous_results):
+        if previous_result.get("commit") == result["commit"]:
+            continue
+        if all(previous_result.get(key) == result[key] for key in condition_keys):
+            return previous_result
+
+    return None
+
+
+def main(
+    entry_log_path: str,
+    score_log_path: str,
+    engine: str,
+    repeat: int,
+    results_path: str,
+):
+    """ランキング処理の各フェーズを計測し、結果を保存して前回との差を出力する
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+        engine (str): プレイログの集計エンジン(python/numpy)
+        repeat (int): 計測回数
+        results_path (str): 計測結果を追記するファイルパス(JSON Lines)
+    """
+    previous_results = read_previous_results(results_path)
+    commit = get_commit()
+    measured_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    dataset = os.path.basename(os.path.dirname(os.path.abspath(score_log_path)))
+
+    # median/p90のヒストグラムはpythonエンジンでのみ集計できる
+    aggregate_modes = [
+        aggregate_mode
+        for aggregate_mode in get_ranking.AGGREGATE_MODES
+        if engine == "python" or aggregate_mode not in get_ranking.PERCENTILE_MODES
+    ]
+    results = run_benchmark(
+        entry_log_path, score_log_path, engine, repeat, aggregate_modes
+    )
+
+    print("mode,phase,seconds,baseline_seconds,ratio")
+    with open(results_path, mode="a", encoding="utf-8") as results_file:
+        for result in results:
+            result.update(commit=commit, measured_at=measured_at, dataset=dataset)
+            results_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+            # 同じ条件の前回の計測と比較
+            baseline = find_baseline(previous_results, result)
+            phase_seconds = dict(result["phase_seconds"], total=result["total_seconds"])
+            for phase, seconds in phase_seconds.items():
+                baseline_seconds = None
+                if baseline is not None:
+                    baseline_seconds = dict(
+                        baseline["phase_seconds"], total=baseline["total_seconds"]
+                    ).get(phase)
+                if not baseline_seconds:
+                    print(f"{result['aggregate_mode']},{phase},{seconds:.3f},,")
+                    continue
+                print(
+                    f"{result['aggregate_mode']},{phase},{seconds:.3f},"
+                    f"{baseline_seconds:.3f},{seconds / baseline_seconds:.2f}"
+                )
+
+            summary = (
+                f"# {result['aggregate_mode']}: {result['rows_per_second']:.0f} rows/s"
+            )
+            if result["peak_rss"] is not None:
+                summary += f", peak RSS {result['peak_rss'] / 2 ** 20:.1f} MiB"
+            print(summary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="ランキング処理のフェーズごとの処理時間とピークメモリを計測する"
+    )
+    parser.add_argument("entry_log_path", help="エントリーファイルパス")
+    parser.add_argument("score_log_path", help="プレイログファイルパス")
+    parser.add_argument(
+        "--engine", choices=["python", "numpy"], default="python", help="集計エンジン"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="計測回数(最速の回を記録)"
+    )
+    parser.add_argument(
+        "--results",
+        default="benchmark_results.jsonl",
+        help="計測結果を追記するファイルパス(JSON Lines)",
+    )
+    arguments = parser.parse_args()
+
+    main(
+        arguments.entry_log_path,
+        arguments.score_log_path,
+        arguments.engine,
+        arguments.repeat,
+        arguments.results,
+    )
@@ -0,0 +1,104 @@
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from typing import Callable, List
+
+from get_ranking import ScoreData
+
+ENTRY_TIME = "2022-01-01 00:00:00"
+
+
+def build_legacy_score_data(player_ids: List[str], scores: List[int]) -> dict:
+    """従来形式(プレイヤーごとの5要素のリスト)のプレイログデータを生成
+
+    Args:
+        player_ids (List[str]): プレイヤーID
+        scores (List[int]): プレイヤーごとのスコア
+
+    Returns:
+        dict: プレイログデータ
+    """
+    score_data = {}
+    for player_id, score in zip(player_ids, scores):
+        total_plays = 3
+        total_score = score * total_plays + 1
+        score_data[player_id] = [
+            ENTRY_TIME,
+            total_plays,
+            score,
+            total_score,
+            round(total_score / total_plays),
+        ]
+    return score_data
+
+
+def build_compact_score_data(player_ids: List[str], scores: List[int]) -> ScoreData:
+    """列形式のプレイログデータを生成
+
+    Args:
+        player_ids (List[str]): プレイヤーID
+        scores (List[int]): プレイヤーごとのスコア
+
+    Returns:
+        ScoreData: プレイログデータ
+    """
+    score_data = ScoreData()
+    for player_id, score in zip(player_ids, scores):
+        total_plays = 3
+        score_data.merge_player(
+            player_id, 1640995200, total_plays, score, score * total_plays + 1
+        )
+    return score_data
+
+
+def measure_memory(builder: Callable, player_ids: List[str], scores: List[int]) -> int:
+    """プレイログデータの生成で確保されたままのメモリ量を計測
+
+    Args:
+        builder (Callable): プレイログデータを生成する関数
+        player_ids (List[str]): プレイヤーID
+        scores (List[int]): プレイヤーごとのスコア
+
+    Returns:
+        int: 確保されたままのバイト数
+    """
+    gc.collect()
+    tracemalloc.start()
+    score_data = builder(player_ids, scores)
+    current_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del score_data
+    return current_size
+
+
+def main(player_count: int):
+    """プレイヤー数ごとのプレイログデータのメモリ使用量を比較する
+
+    プレイヤーIDの文字列はエントリーデータと共有される前提のため計測対象外とする。
+
+    Args:
+        player_count (int): プレイヤー数
+    """
+    random.seed(0)
+    player_ids = [sys.intern(f"player_{number}") for number in range(player_count)]
+    scores = [random.randint(0, 100000) for _ in range(player_count)]
+
+    print("format,players,bytes,bytes_per_player")
+    for name, builder in [
+        ("legacy", build_legacy_score_data),
+        ("compact", build_compact_score_data),
+    ]:
+        size = measure_memory(builder, player_ids, scores)
+        print(f"{name},{player_count},{size},{size / player_count:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="プレイログデータのメモリ使用量を比較するベンチマーク"
+    )
+    parser.add_argument("--players", type=int, default=10_000_000, help="プレイヤー数")
+    arguments = parser.parse_args()
+
+    main(arguments.players)
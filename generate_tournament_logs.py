@@ -0,0 +1,274 @@
+import argparse
+import bisect
+import heapq
+import itertools
+import math
+import os
+import random
+from array import array
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+ENTRY_LOG_HEADER = "create_timestamp,player_id,handle_name"
+SCORE_LOG_HEADER = "create_timestamp,player_id,score"
+WRITE_BATCH_SIZE = 10000  # まとめて書き込む行数
+
+
+def format_timestamps(start: datetime, seconds: list) -> list:
+    """開始日時からの経過秒数をタイムスタンプ文字列に変換
+
+    経過秒数が前の行と同じ場合は変換結果を使い回す。
+
+    Args:
+        start (datetime): 開始日時
+        seconds (list): 昇順に並んだ経過秒数
+
+    Returns:
+        list: タイムスタンプ文字列
+    """
+    timestamps = []
+    previous_second = None
+    timestamp = ""
+    for second in seconds:
+        if second != previous_second:
+            timestamp = (start + timedelta(seconds=second)).strftime(TIMESTAMP_FORMAT)
+            previous_second = second
+        timestamps.append(timestamp)
+    return timestamps
+
+
+def get_player_id(number: int) -> str:
+    """連番からプレイヤーIDを生成
+
+    Args:
+        number (int): プレイヤーの連番
+
+    Returns:
+        str: プレイヤーID
+    """
+    return f"player{number}"
+
+
+def get_handle_name(generator: random.Random) -> str:
+    """ハンドルネームを生成
+
+    Args:
+        generator (random.Random): 乱数生成器
+
+    Returns:
+        str: ハンドルネーム
+    """
+    return f"name_{generator.randrange(16 ** 8):08x}"
+
+
+def write_entry_log(
+    entry_log_path: str,
+    player_count: int,
+    start: datetime,
+    entry_span: int,
+    update_ratio: float,
+    generator: random.Random,
+):
+    """エントリーファイルを生成
+
+    プレイヤーは連番順にエントリーし、update_ratioの割合のプレイヤーは後から
+    ハンドルネームを変えて再エントリーする。
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        player_count (int): プレイヤー数
+        start (datetime): 大会の開始日時
+        entry_span (int): エントリーを受け付ける秒数
+        update_ratio (float): ハンドルネームを更新するプレイヤーの割合
+        generator (random.Random): 乱数生成器
+    """
+    pending_updates = []  # 再エントリーの(経過秒数, 連番)
+
+    with open(entry_log_path, mode="w", encoding="utf-8", newline="") as entry_file:
+        entry_file.write(ENTRY_LOG_HEADER + "\n")
+        for batch_start in range(0, player_count, WRITE_BATCH_SIZE):
+            batch_end = min(batch_start + WRITE_BATCH_SIZE, player_count)
+            rows = []
+            for number in range(batch_start, batch_end):
+                second = number * entry_span // player_count
+                # 予定時刻を過ぎた再エントリーを先に書き込む
+                while pending_updates and pending_updates[0][0] <= second:
+                    update_second, update_number = heapq.heappop(pending_updates)
+                    rows.append((update_second, update_number))
+                rows.append((second, number))
+                if generator.random() < update_ratio:
+                    heapq.heappush(
+                        pending_updates,
+                        (second + generator.randrange(1, entry_span + 1), number),
+                    )
+            if batch_end == player_count:
+                while pending_updates:
+                    rows.append(heapq.heappop(pending_updates))
+
+            timestamps = format_timestamps(start, [second for second, _ in rows])
+            entry_file.write(
+                "".join(
+                    f"{timestamp},{get_player_id(number)},{get_handle_name(generator)}\n"
+                    for timestamp, (_, number) in zip(timestamps, rows)
+                )
+            )
+
+
+def write_score_log(
+    score_log_path: str,
+    player_count: int,
+    play_count: int,
+    start: datetime,
+    score_span: int,
+    skew: float,
+    unregistered_ratio: float,
+    generator: random.Random,
+):
+    """プレイログファイルを生成
+
+    プレイヤーの活動量はZipf分布に従い、上位のプレイヤーほど多くプレイする。
+    プレイ日時は大会期間に均等に並べるため、遅くエントリーしたプレイヤーには
+    エントリー日時より前のプレイログが含まれる。
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        player_count (int): プレイヤー数
+        play_count (int): プレイログの行数
+        start (datetime): 大会の開始日時
+        score_span (int): プレイログを記録する秒数
+        skew (float): Zipf分布の指数(0で全員が同じ頻度)
+        unregistered_ratio (float): エントリーしていないプレイヤーのプレイの割合
+        generator (random.Random): 乱数生成器
+    """
+    # 活動量の順位から連番への対応(順位とエントリー順が相関しないよう散らす)
+    stride = next(
+        stride
+        for stride in itertools.count(max(player_count // 2 + 1, 1) | 1)
+        if math.gcd(stride, player_count) == 1
+    )
+    cumulative_weights = array(
+        "d",
+        itertools.accumulate(1 / (rank + 1) ** skew for rank in range(player_count)),
+    )
+    total_weight = cumulative_weights[-1]
+
+    with open(score_log_path, mode="w", encoding="utf-8", newline="") as score_file:
+        score_file.write(SCORE_LOG_HEADER + "\n")
+        for batch_start in range(0, play_count, WRITE_BATCH_SIZE):
+            batch_end = min(batch_start + WRITE_BATCH_SIZE, play_count)
+            timestamps = format_timestamps(
+                start,
+                [
+                    row * score_span // play_count
+                    for row in range(batch_start, batch_end)
+                ],
+            )
+            rows = []
+            for timestamp in timestamps:
+                if generator.random() < unregistered_ratio:
+                    player_id = get_player_id(player_count + generator.randrange(1000))
+                else:
+                    rank = bisect.bisect(
+                        cumulative_weights, generator.random() * total_weight
+                    )
+                    rank = min(rank, player_count - 1)
+                    player_id = get_player_id(rank * stride % player_count)
+                score = int(generator.expovariate(1 / 5000))
+                rows.append(f"{timestamp},{player_id},{score}\n")
+            score_file.write("".join(rows))
+
+
+def main(
+    output_dir: str,
+    player_count: int,
+    play_count: int,
+    days: int,
+    skew: float,
+    update_ratio: float,
+    unregistered_ratio: float,
+    seed: int,
+):
+    """大会のエントリーファイルとプレイログファイルを生成する
+
+    Args:
+        output_dir (str): 出力先ディレクトリ
+        player_count (int): プレイヤー数
+        play_count (int): プレイログの行数
+        days (int): 大会の日数
+        skew (float): プレイヤーの活動量の偏り(Zipf分布の指数)
+        update_ratio (float): ハンドルネームを更新するプレイヤーの割合
+        unregistered_ratio (float): エントリーしていないプレイヤーのプレイの割合
+        seed (int): 乱数のシード
+    """
+    if player_count < 1 or play_count < 0 or days < 1:
+        raise ValueError(
+            "プレイヤー数と日数には1以上、行数には0以上を指定してください。"
+        )
+
+    generator = random.Random(seed)
+    start = datetime(2022, 1, 1)
+    score_span = days * 86400
+    os.makedirs(output_dir, exist_ok=True)
+
+    # エントリーは大会期間の前半に受け付ける
+    write_entry_log(
+        os.path.join(output_dir, "game_entry_log.csv"),
+        player_count,
+        start,
+        score_span // 2,
+        update_ratio,
+        generator,
+    )
+    write_score_log(
+        os.path.join(output_dir, "game_score_log.csv"),
+        player_count,
+        play_count,
+        start,
+        score_span,
+        skew,
+        unregistered_ratio,
+        generator,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="ベンチマーク用の大会のエントリーファイルとプレイログファイルを生成する"
+    )
+    parser.add_argument("output_dir", help="出力先ディレクトリ")
+    parser.add_argument("--players", type=int, default=10000, help="プレイヤー数")
+    parser.add_argument(
+        "--plays", type=int, default=100_000, help="プレイログの行数(10^5〜10^8)"
+    )
+    parser.add_argument("--days", type=int, default=7, help="大会の日数")
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=1.0,
+        help="プレイヤーの活動量の偏り(Zipf分布の指数)",
+    )
+    parser.add_argument(
+        "--update-ratio",
+        type=float,
+        default=0.1,
+        help="ハンドルネームを更新して再エントリーするプレイヤーの割合",
+    )
+    parser.add_argument(
+        "--unregistered-ratio",
+        type=float,
+        default=0.01,
+        help="エントリーしていないプレイヤーによるプレイの割合",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    arguments = parser.parse_args()
+
+    main(
+        arguments.output_dir,
+        arguments.players,
+        arguments.plays,
+        arguments.days,
+        arguments.skew,
+        arguments.update_ratio,
+        arguments.unregistered_ratio,
+        arguments.seed,
+    )
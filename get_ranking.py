@@ -1,362 +1,5978 @@
+import argparse
+import bisect
+import bz2
+import contextlib
 import csv
+import dataclasses
+import glob
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import lzma
+import mmap
+import multiprocessing
 import os
+import queue
 import re
+import signal
+import socket
+import socketserver
 import sys
-from datetime import datetime
-from typing import List, Dict
+import tempfile
+import threading
+import time
+from array import array
+from datetime import date
+from typing import List, Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpyエンジンを使う場合のみ必要
+    np = None
+
+try:
+    import sqlite3
+except ImportError:  # --databaseを使う場合のみ必要
+    sqlite3 = None
+
+try:
+    import resource
+except ImportError:  # Windowsでは実行統計のピークメモリを記録しない
+    resource = None
+
+
+TIMESTAMP_PATTERN = re.compile(
+    r"[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}"
+)  # create_timestamp列のフォーマット(YYYY-MM-DD HH:MM:SS)
+NAME_PATTERN = re.compile(r"^\w+$")  # プレイヤーID･ハンドルネームのフォーマット
+NAME_MAX_LENGTH = 20  # プレイヤーID･ハンドルネームの最大文字数
+ENTRY_LOG_HEADER = "create_timestamp,player_id,handle_name"  # エントリーのヘッダー
+SCORE_LOG_HEADER = "create_timestamp,player_id,score"  # プレイログファイルのヘッダー
+AGGREGATE_MODES = ["highscore", "average", "median", "p90"]  # 集計モード
+PERCENTILE_MODES = {"median": 50, "p90": 90}  # パーセンタイルで集計するモードと百分位
+HISTOGRAM_SIGNIFICANT_BITS = 8  # median/p90の階級で保持するスコアの上位ビット数
+LOWEST_PLAY_TIMES = 10  # average･median･p90集計時の最低プレイ回数
+RANKING_THRESHOLD = 10  # 出力するランキングの閾値
+FOLLOW_POLL_INTERVAL = 0.5  # --follow時に入力ファイルの変更を確認する間隔(秒)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_date_ordinal_cache = {}  # 日付文字列と序数の対応(不正な日付はNone)
+_time_seconds_cache = {}  # 検証済みの時刻文字列と0時からの秒数の対応
+
+
+def parse_timestamp(create_timestamp: str) -> Optional[int]:
+    """YYYY-MM-DD HH:MM:SS形式のタイムスタンプをエポック秒に変換
+
+    固定長の書式を前提に文字位置で切り出して変換する。日付部分の妥当性は
+    日付文字列ごとに一度だけ確認し、結果を再利用する。
+
+    Args:
+        create_timestamp (str): タイムスタンプ
+
+    Returns:
+        Optional[int]: エポック秒(存在しない日時や書式違いの場合はNone)
+    """
+    if len(create_timestamp) != 19 or not TIMESTAMP_PATTERN.fullmatch(create_timestamp):
+        return None
+
+    # 日付部分の確認(うるう年や月末日を含めて存在する日付か)
+    date_part = create_timestamp[:10]
+    ordinal = _date_ordinal_cache.get(date_part, -1)
+    if ordinal == -1:
+        try:
+            ordinal = date(
+                int(date_part[0:4]), int(date_part[5:7]), int(date_part[8:10])
+            ).toordinal()
+        except ValueError:
+            ordinal = None
+        _date_ordinal_cache[date_part] = ordinal
+    if ordinal is None:
+        return None
+
+    # 時刻部分の確認
+    hour = int(create_timestamp[11:13])
+    minute = int(create_timestamp[14:16])
+    second = int(create_timestamp[17:19])
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+
+    return (ordinal - EPOCH_ORDINAL) * 86400 + hour * 3600 + minute * 60 + second
+
+
+def parse_valid_timestamp(create_timestamp: str) -> int:
+    """検証済みのタイムスタンプをエポック秒に変換
+
+    parse_timestampで検証した日付の序数を再利用し、書式の確認は行わない。
+    時刻部分の秒数も時刻文字列ごとに一度だけ算出する。
+
+    Args:
+        create_timestamp (str): parse_timestampで検証済みのタイムスタンプ
+
+    Returns:
+        int: エポック秒
+    """
+    ordinal = _date_ordinal_cache.get(create_timestamp[:10])
+    if ordinal is None:
+        return parse_timestamp(create_timestamp)
+
+    time_part = create_timestamp[11:]
+    seconds = _time_seconds_cache.get(time_part)
+    if seconds is None:
+        seconds = (
+            int(time_part[0:2]) * 3600 + int(time_part[3:5]) * 60 + int(time_part[6:8])
+        )
+        _time_seconds_cache[time_part] = seconds
+
+    return (ordinal - EPOCH_ORDINAL) * 86400 + seconds
+
+
+def is_valid_name(name: str) -> bool:
+    """プレイヤーID･ハンドルネームが正しいフォーマットか確認
+
+    Args:
+        name (str): プレイヤーIDまたはハンドルネーム
+
+    Returns:
+        bool: 照合結果
+    """
+    return 0 < len(name) <= NAME_MAX_LENGTH and NAME_PATTERN.match(name) is not None
+
+
+def check_entry_row(row: List[str], headers: List[str]) -> Optional[str]:
+    """エントリーファイルの1行が仕様と同様か確認し、不正な理由を返す
+
+    Args:
+        row (List[str]): エントリーファイルの1行
+        headers (List[str]): エントリーファイルのヘッダー
+
+    Returns:
+        Optional[str]: エラーメッセージ(仕様と同様の場合はNone)
+    """
+    if len(row) != len(headers):
+        return "エントリーファイルの要素数が正しくありません。"
+
+    # タイムスタンプが正しいフォーマットか確認
+    if parse_timestamp(row[0]) is None:
+        return "エントリーファイルのcreate_timestamp列に不正な値が含まれています。"
+
+    # プレイヤーIDが正しいフォーマットか確認
+    if not is_valid_name(row[1]):
+        return "プレイヤーIDに不正な文字列が含まれています。"
+
+    # ハンドルネームが正しいフォーマットか確認
+    if not is_valid_name(row[2]):
+        return "ハンドルネームに不正な文字列が含まれています。"
+
+    return None
+
+
+def check_score_row(row: List[str], headers: List[str]) -> Optional[str]:
+    """プレイログファイルの1行が仕様と同様か確認し、不正な理由を返す
+
+    Args:
+        row (List[str]): プレイログファイルの1行
+        headers (List[str]): プレイログファイルのヘッダー
+
+    Returns:
+        Optional[str]: エラーメッセージ(仕様と同様の場合はNone)
+    """
+    if len(row) != len(headers):
+        return "プレイログファイルの要素数が正しくありません。"
+
+    # タイムスタンプが正しいフォーマットか確認
+    if parse_timestamp(row[0]) is None:
+        return "プレイログファイルのcreate_timestamp列に不正な値が含まれています。"
+
+    # プレイヤーIDが正しいフォーマットか確認
+    if not is_valid_name(row[1]):
+        return "プレイヤーIDに不正な文字列が含まれています。"
+
+    # スコアが正しいフォーマットか確認(isdigitを満たせば負の値にはならない)
+    if not row[2].isdigit():
+        return "プレイログファイルのスコアに不正な値が含まれています。"
+
+    return None
+
+
+def validate_entry_row(row: List[str], headers: List[str]) -> bool:
+    """エントリーファイルの1行が仕様と同様か確認
+
+    Args:
+        row (List[str]): エントリーファイルの1行
+        headers (List[str]): エントリーファイルのヘッダー
+
+    Returns:
+        bool: 照合結果
+    """
+    error_message = check_entry_row(row, headers)
+    if error_message is None:
+        return True
+
+    print(error_message, file=sys.stderr)
+    return False
+
+
+def validate_score_row(row: List[str], headers: List[str]) -> bool:
+    """プレイログファイルの1行が仕様と同様か確認
+
+    Args:
+        row (List[str]): プレイログファイルの1行
+        headers (List[str]): プレイログファイルのヘッダー
+
+    Returns:
+        bool: 照合結果
+    """
+    error_message = check_score_row(row, headers)
+    if error_message is None:
+        return True
+
+    print(error_message, file=sys.stderr)
+    return False
+
+
+def get_peak_rss() -> Optional[int]:
+    """実行中のプロセスのピークメモリ(RSS)を取得
+
+    Returns:
+        Optional[int]: ピークメモリのバイト数(計測できない環境ではNone)
+    """
+    if resource is None:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト単位、それ以外はキロバイト単位
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+class RunStats:
+    """フェーズごとの実行統計を記録する
+
+    measureで囲んだ処理の実時間･CPU時間･終了時点のピークメモリを記録する。
+    load_entry_log･load_score_logにstatsとして渡すと、実行中のフェーズに
+    読み込んだ行数と不正な行数も記録される。
+    """
+
+    def __init__(self):
+        self.phases = []  # フェーズごとの実行統計(実行順)
+
+    @contextlib.contextmanager
+    def measure(self, phase_name: str):
+        """囲んだ処理を1つのフェーズとして計測する
+
+        Args:
+            phase_name (str): フェーズ名
+        """
+        phase = {
+            "phase": phase_name,
+            "wall_seconds": None,
+            "cpu_seconds": None,
+            "rows_read": None,
+            "rows_rejected": None,
+            "peak_rss_bytes": None,
+        }
+        self.phases.append(phase)
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield phase
+        finally:
+            phase["wall_seconds"] = time.perf_counter() - wall_started
+            phase["cpu_seconds"] = time.process_time() - cpu_started
+            phase["peak_rss_bytes"] = get_peak_rss()
+
+    def count_rows(self, rows_read: int, rows_rejected: int = 0):
+        """実行中のフェーズに読み込んだ行数と不正な行数を加算
+
+        Args:
+            rows_read (int): 読み込んだ行数(ヘッダーを除く)
+            rows_rejected (int): 不正な行数
+        """
+        if not self.phases:
+            return
+        phase = self.phases[-1]
+        phase["rows_read"] = (phase["rows_read"] or 0) + rows_read
+        phase["rows_rejected"] = (phase["rows_rejected"] or 0) + rows_rejected
+
+    def report(self) -> Dict:
+        """実行統計をJSONに変換できる形式で取得
+
+        Returns:
+            Dict: フェーズごとの実行統計と合計
+        """
+        return {
+            "phases": self.phases,
+            "total": {
+                "wall_seconds": sum(
+                    phase["wall_seconds"] or 0 for phase in self.phases
+                ),
+                "cpu_seconds": sum(phase["cpu_seconds"] or 0 for phase in self.phases),
+                "rows_read": sum(phase["rows_read"] or 0 for phase in self.phases),
+                "rows_rejected": sum(
+                    phase["rows_rejected"] or 0 for phase in self.phases
+                ),
+                "peak_rss_bytes": get_peak_rss(),
+            },
+        }
+
+    def write_report(self, stats_path: str):
+        """実行統計をJSONで出力する
+
+        Args:
+            stats_path (str): 出力先ファイルパス(-の場合は標準エラー出力)
+        """
+        report = json.dumps(self.report(), ensure_ascii=False)
+        if stats_path == "-":
+            print(report, file=sys.stderr)
+            return
+
+        with open(stats_path, mode="w", encoding="utf-8") as stats_file:
+            stats_file.write(report + "\n")
+
+
+COMPRESSION_MAGIC_NUMBERS = {  # 圧縮形式と圧縮ファイルの先頭のバイト列
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+}
+COMPRESSION_OPENERS = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+DECOMPRESS_CHUNK_SIZE = 1 << 20  # 展開スレッドが1回に展開するバイト数
+DECOMPRESS_QUEUE_SIZE = 8  # 読み込みを待つ展開済みのチャンク数の上限
+
+
+class LogDecompressionError(OSError):
+    """圧縮されたログファイルを展開できない場合の例外"""
+
+
+def detect_compression(log_path: str) -> Optional[str]:
+    """先頭のバイト列からログファイルの圧縮形式を判定
+
+    Args:
+        log_path (str): ログファイルパス
+
+    Returns:
+        Optional[str]: 圧縮形式(gzip/bz2/xz、圧縮されていないか読み込めない場合はNone)
+    """
+    try:
+        with open(log_path, mode="rb") as log_file:
+            head = log_file.read(max(map(len, COMPRESSION_MAGIC_NUMBERS.values())))
+    except OSError:
+        return None
+
+    for compression, magic_number in COMPRESSION_MAGIC_NUMBERS.items():
+        if head.startswith(magic_number):
+            return compression
+
+    return None
+
+
+class DecompressedLogReader(io.RawIOBase):
+    """圧縮されたログファイルを別スレッドで展開しながら読み込むバイナリストリーム
+
+    展開処理(zlib/bz2/lzma)はGILを解放するため、CSVの解析･集計と並行して進む。
+    展開済みのデータはDECOMPRESS_QUEUE_SIZE個のチャンクまでしか先読みしない。
+    """
+
+    def __init__(self, log_path: str, compression: str):
+        """
+        Args:
+            log_path (str): ログファイルパス
+            compression (str): 圧縮形式(gzip/bz2/xz)
+        """
+        super().__init__()
+        self._chunks = queue.Queue(maxsize=DECOMPRESS_QUEUE_SIZE)
+        self._closing = threading.Event()
+        self._buffer = memoryview(b"")
+        self._finished = False
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._decompress,
+            args=(log_path, COMPRESSION_OPENERS[compression]),
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _decompress(self, log_path: str, open_compressed):
+        """展開したチャンクを順にキューに入れる(展開スレッドで実行)"""
+        try:
+            with open_compressed(log_path, mode="rb") as compressed_file:
+                while not self._closing.is_set():
+                    chunk = compressed_file.read(DECOMPRESS_CHUNK_SIZE)
+                    self._put(chunk)
+                    if not chunk:
+                        return
+        except Exception as error:  # zlib.errorなど展開時の例外は形式ごとに異なる
+            self._put(error)
+
+    def _put(self, item):
+        # 読み込み側が閉じられた場合は待たずに終了する
+        while not self._closing.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._error is not None:
+            raise LogDecompressionError(str(self._error)) from self._error
+        if not self._buffer:
+            if self._finished:
+                return 0
+            item = self._chunks.get()
+            if isinstance(item, Exception):
+                self._error = item
+                raise LogDecompressionError(str(item)) from item
+            if not item:
+                self._finished = True
+                return 0
+            self._buffer = memoryview(item)
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        self._closing.set()
+        super().close()
+
+
+def open_log(log_path: str):
+    """ログファイルをテキストモードで開く
+
+    gzip/bz2/xzで圧縮されている場合は一時ファイルを作らず、
+    別スレッドで展開しながら読み込む。
+
+    Args:
+        log_path (str): ログファイルパス
+
+    Returns:
+        ログファイルのテキストストリーム
+    """
+    compression = detect_compression(log_path)
+    if compression is None:
+        return open(log_path, mode="r", encoding="utf-8")
+
+    return io.TextIOWrapper(
+        io.BufferedReader(DecompressedLogReader(log_path, compression)),
+        encoding="utf-8",
+    )
+
+
+CSV_BLOCK_SIZE = 1 << 20  # iterate_csv_rowsが1回に読み込む文字数
+
+
+def iterate_csv_rows(log_file) -> Iterable[List[str]]:
+    """CSVファイルを改行位置で区切ったブロックごとにstr.splitで行と列に分割
+
+    入力ファイルは引用符を使わないため、csv.readerで1文字ずつ解析せずに
+    ブロック単位の分割で読み込む。引用符(")やCRを含むブロックが現れた場合は、
+    そのブロック以降をcsv.readerで解析するため、結果はcsv.readerと一致する。
+
+    Args:
+        log_file: テキストモードで開いたCSVファイル
+
+    Yields:
+        List[str]: 行の各列
+    """
+    remainder = ""
+    while True:
+        chunk = log_file.read(CSV_BLOCK_SIZE)
+        if not chunk:
+            break
+
+        # 最後の改行までを1ブロックとし、残りは次のブロックに回す
+        block = remainder + chunk
+        block_end = block.rfind("\n") + 1
+        if block_end == 0:
+            remainder = block
+            continue
+        block, remainder = block[:block_end], block[block_end:]
+
+        # 引用符内の改行がブロックをまたぐ場合があるため以降はcsv.readerで読む
+        if '"' in block or "\r" in block:
+            remainder += log_file.readline()
+            yield from csv.reader(
+                itertools.chain(io.StringIO(block + remainder), log_file)
+            )
+            return
+
+        for line in block[:-1].split("\n"):
+            # 空行はcsv.readerと同じく空のリストとする
+            yield line.split(",") if line else []
+
+    # 改行で終わっていない最終行
+    if remainder:
+        yield from csv.reader(io.StringIO(remainder))
 
 
 def validate_entry_log(entry_log_path: str, entry_log_header: str) -> bool:
     """入力ファイルがエントリーファイルの仕様と同様か確認
 
     Args:
-        entry_log_path (str): エントリーファイルパス
-        entry_log_header (str): エントリーファイルのヘッダー
+        entry_log_path (str): エントリーファイルパス
+        entry_log_header (str): エントリーファイルのヘッダー
+
+    Returns:
+        bool: 照合結果
+    """
+    # 入力ファイルの存在確認
+    if not os.path.exists(entry_log_path):
+        print("ゲームのエントリーファイルが存在しません。", file=sys.stderr)
+        return False
+
+    # ヘッダー確認と要素数の確認
+    try:
+        with open_log(entry_log_path) as entry_file:
+            csv_rows = iterate_csv_rows(entry_file)
+            headers = next(csv_rows)
+            if headers != entry_log_header.split(","):
+                print(
+                    "エントリーファイルのヘッダーが正しくありません。", file=sys.stderr
+                )
+                return False
+
+            for row in csv_rows:
+                if not validate_entry_row(row, headers):
+                    return False
+    except LogDecompressionError:
+        print("エントリーファイルを展開できません。", file=sys.stderr)
+        return False
+
+    return True
+
+
+def validate_score_log(score_log_path: str, score_log_header: str) -> bool:
+    """入力ファイルがプレイログファイルの仕様と同様か確認
+
+    Args:
+        score_log_path (str): エントリーファイルパス
+        score_log_header (str): エントリーファイルのヘッダー
+
+    Returns:
+        bool: 照合結果
+    """
+    # 入力ファイルの存在確認
+    if not os.path.exists(score_log_path):
+        print("ゲームのプレイログファイルが存在しません。", file=sys.stderr)
+        return False
+
+    # ヘッダー確認と要素数の確認
+    try:
+        with open_log(score_log_path) as score_file:
+            csv_rows = iterate_csv_rows(score_file)
+            headers = next(csv_rows)
+            if headers != score_log_header.split(","):
+                print(
+                    "プレイログファイルのヘッダーが正しくありません。", file=sys.stderr
+                )
+                return False
+
+            for row in csv_rows:
+                if not validate_score_row(row, headers):
+                    return False
+    except LogDecompressionError:
+        print("プレイログファイルを展開できません。", file=sys.stderr)
+        return False
+
+    return True
+
+
+def add_entry_row(entry_data: Dict[str, List[str]], row: List[str]):
+    """エントリーファイルの1行をエントリーデータに反映
+
+    Args:
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        row (List[str]): エントリーファイルの1行
+    """
+    entry_time = row[0]
+    player_id = sys.intern(row[1])  # プレイログデータとプレイヤーIDの文字列を共有
+    handle_name = row[2]
+    # 既にエントリーしている場合はハンドルネームのみ更新
+    if player_id in entry_data.keys():
+        existing_entry_time = entry_data[player_id][0]
+        entry_data[player_id] = [existing_entry_time, handle_name]
+    else:
+        entry_data[player_id] = [entry_time, handle_name]
+
+
+def get_histogram_bucket(game_score: int) -> int:
+    """スコアをヒストグラムの階級(階級に含まれる最小のスコア)に変換
+
+    HISTOGRAM_SIGNIFICANT_BITSビットで表せるスコアはそのまま階級とし、それより
+    大きいスコアは上位HISTOGRAM_SIGNIFICANT_BITSビットを残して下位ビットを切り捨てる。
+
+    Args:
+        game_score (int): 0以上のスコア
+
+    Returns:
+        int: 階級
+    """
+    shift = game_score.bit_length() - HISTOGRAM_SIGNIFICANT_BITS
+    if shift <= 0:
+        return game_score
+
+    return game_score >> shift << shift
+
+
+def get_histogram_percentile(
+    histogram: Dict[int, int], total_plays: int, percentile: int
+) -> int:
+    """ヒストグラムから最近傍順位法のパーセンタイル値を求める
+
+    階級を小さい順に累積し、プレイ回数のpercentile%(切り上げ、最低1回)以上の
+    プレイを含んだ階級を返す。階級への変換は単調なため、全スコアから求めた
+    パーセンタイル値を階級に変換した値と一致する。
+
+    Args:
+        histogram (Dict[int, int]): 階級とプレイ回数の対応
+        total_plays (int): プレイ回数(ヒストグラムの合計)
+        percentile (int): 百分位(0〜100)
+
+    Returns:
+        int: パーセンタイル値の階級
+    """
+    target_plays = max(-(-total_plays * percentile // 100), 1)
+    cumulative_plays = 0
+    for bucket in sorted(histogram):
+        cumulative_plays += histogram[bucket]
+        if cumulative_plays >= target_plays:
+            return bucket
+
+    return bucket
+
+
+def create_int_column(values: Iterable[int]) -> Union[array, List[int]]:
+    """整数の列を8バイト整数の配列として生成
+
+    8バイト整数に収まらない値を含む場合は任意精度の整数のリストとして生成する。
+
+    Args:
+        values (Iterable[int]): 整数の列(8バイト整数のバイト列も可)
+
+    Returns:
+        Union[array, List[int]]: 整数の列
+    """
+    if not isinstance(values, (bytes, array, list)):
+        values = list(values)
+    try:
+        return array("q", values)
+    except OverflowError:
+        return list(values)
+
+
+class ScoreData:
+    """プレイヤーごとの集計値を列形式で保持するプレイログデータ
+
+    プレイヤーIDを連番に割り当て、エントリー日時(エポック秒)･プレイ回数･
+    最高スコア･合計スコアをそれぞれ配列で保持する。平均スコアは保持せず
+    ランキング作成時に算出する。最高スコア･合計スコアが8バイト整数に収まらない
+    場合は、その時点で両方の列を任意精度の整数のリストに切り替える。
+    track_histogramsを指定した場合は、median/p90の
+    集計用にプレイヤーごとのスコアのヒストグラム(get_histogram_bucketの階級と
+    プレイ回数の対応)も保持する。ヒストグラムの大きさはプレイ回数によらず、
+    スコアが2^(k-1)以上2^k未満の範囲ごとに最大2^(HISTOGRAM_SIGNIFICANT_BITS-1)階級となる。
+    """
+
+    __slots__ = (
+        "player_ids",
+        "player_indexes",
+        "entry_times",
+        "total_plays",
+        "best_scores",
+        "total_scores",
+        "histograms",
+    )
+
+    def __init__(self, track_histograms: bool = False):
+        """
+        Args:
+            track_histograms (bool): median/p90用のスコアのヒストグラムも保持するか
+        """
+        self.player_ids = []  # 連番とプレイヤーIDの対応
+        self.player_indexes = {}  # プレイヤーIDと連番の対応
+        self.entry_times = array("q")
+        self.total_plays = array("q")
+        self.best_scores = array("q")
+        self.total_scores = array("q")
+        self.histograms = [] if track_histograms else None  # 連番ごとのヒストグラム
+
+    def __len__(self) -> int:
+        return len(self.player_ids)
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self.player_indexes
+
+    @classmethod
+    def from_columns(
+        cls,
+        player_ids: List[str],
+        entry_times: Iterable[int],
+        total_plays: Iterable[int],
+        best_scores: Iterable[int],
+        total_scores: Iterable[int],
+    ) -> "ScoreData":
+        """列ごとの集計値からプレイログデータを生成
+
+        Args:
+            player_ids (List[str]): プレイヤーID
+            entry_times (Iterable[int]): エントリー日時のエポック秒
+            total_plays (Iterable[int]): プレイ回数
+            best_scores (Iterable[int]): 最高スコア
+            total_scores (Iterable[int]): 合計スコア
+
+        Returns:
+            ScoreData: プレイログデータ
+        """
+        score_data = cls()
+        score_data.player_ids = [sys.intern(player_id) for player_id in player_ids]
+        score_data.player_indexes = {
+            player_id: index for index, player_id in enumerate(score_data.player_ids)
+        }
+        score_data.entry_times = array("q", entry_times)
+        score_data.total_plays = array("q", total_plays)
+        score_data.best_scores = create_int_column(best_scores)
+        score_data.total_scores = create_int_column(total_scores)
+
+        return score_data
+
+    def widen_score_columns(self):
+        """最高スコア･合計スコアの列を任意精度の整数のリストに切り替える"""
+        self.best_scores = list(self.best_scores)
+        self.total_scores = list(self.total_scores)
+
+    def add_play(self, player_id: str, entry_time: str, game_score: int):
+        """1回分のプレイを集計値に反映
+
+        Args:
+            player_id (str): プレイヤーID
+            entry_time (str): プレイヤーのエントリー日時
+            game_score (int): スコア
+        """
+        index = self.player_indexes.get(player_id)
+
+        # 既存スコアがなければ新規追加
+        if index is None:
+            self.merge_player(
+                player_id,
+                parse_timestamp(entry_time),
+                1,
+                game_score,
+                game_score,
+                (
+                    {get_histogram_bucket(game_score): 1}
+                    if self.histograms is not None
+                    else None
+                ),
+            )
+            return
+
+        # 既存スコアがあればプレイ回数･最高スコア･合計スコア(･ヒストグラム)更新
+        self.total_plays[index] += 1
+        try:
+            if game_score > self.best_scores[index]:
+                self.best_scores[index] = game_score
+            self.total_scores[index] += game_score
+        except OverflowError:
+            # 最高スコアの更新は繰り返しても結果が変わらないため、切り替えてやり直す
+            self.widen_score_columns()
+            if game_score > self.best_scores[index]:
+                self.best_scores[index] = game_score
+            self.total_scores[index] += game_score
+        if self.histograms is not None:
+            histogram = self.histograms[index]
+            bucket = get_histogram_bucket(game_score)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def merge_player(
+        self,
+        player_id: str,
+        entry_time: int,
+        total_plays: int,
+        best_score: int,
+        total_score: int,
+        histogram: Optional[Dict[int, int]] = None,
+    ):
+        """プレイヤーの途中集計を集計値に統合
+
+        Args:
+            player_id (str): プレイヤーID
+            entry_time (int): エントリー日時のエポック秒
+            total_plays (int): プレイ回数
+            best_score (int): 最高スコア
+            total_score (int): 合計スコア
+            histogram (Optional[Dict[int, int]]): スコアのヒストグラム
+                (ヒストグラムを保持する場合のみ必要、新規のプレイヤーでは引き継ぐ)
+        """
+        index = self.player_indexes.get(player_id)
+
+        if index is None:
+            player_id = sys.intern(player_id)
+            self.player_indexes[player_id] = len(self.player_ids)
+            self.player_ids.append(player_id)
+            self.entry_times.append(entry_time)
+            self.total_plays.append(total_plays)
+            try:
+                self.best_scores.append(best_score)
+                self.total_scores.append(total_score)
+            except OverflowError:
+                del self.best_scores[len(self.total_scores) :]
+                self.widen_score_columns()
+                self.best_scores.append(best_score)
+                self.total_scores.append(total_score)
+            if self.histograms is not None:
+                self.histograms.append(histogram)
+            return
+
+        self.total_plays[index] += total_plays
+        try:
+            if best_score > self.best_scores[index]:
+                self.best_scores[index] = best_score
+            self.total_scores[index] += total_score
+        except OverflowError:
+            self.widen_score_columns()
+            if best_score > self.best_scores[index]:
+                self.best_scores[index] = best_score
+            self.total_scores[index] += total_score
+        if self.histograms is not None:
+            merged_histogram = self.histograms[index]
+            for bucket, plays in histogram.items():
+                merged_histogram[bucket] = merged_histogram.get(bucket, 0) + plays
+
+    def get(self, player_id: str) -> Optional[Tuple[int, int, int, int]]:
+        """プレイヤーの集計値を取得
+
+        Args:
+            player_id (str): プレイヤーID
+
+        Returns:
+            Optional[Tuple[int, int, int, int]]:
+                エントリー日時のエポック秒･プレイ回数･最高スコア･合計スコア
+                (プレイログがない場合はNone)
+        """
+        index = self.player_indexes.get(player_id)
+        if index is None:
+            return None
+
+        return (
+            self.entry_times[index],
+            self.total_plays[index],
+            self.best_scores[index],
+            self.total_scores[index],
+        )
+
+    def iterate_ranking_items(
+        self, aggregate_mode: str, lowest_play_times: int
+    ) -> Iterable[Tuple[int, int, str]]:
+        """ランキング対象のプレイヤーを(スコア, エントリー日時, プレイヤーID)で列挙
+
+        Args:
+            aggregate_mode (str): 集計モードを表す文字列
+            lowest_play_times (int): average･median･p90集計時の最低プレイ回数
+
+        Returns:
+            Iterable[Tuple[int, int, str]]: スコア･エントリー日時･プレイヤーIDの組
+        """
+        if aggregate_mode == "highscore":
+            return zip(self.best_scores, self.entry_times, self.player_ids)
+
+        # パーセンタイル値はヒストグラムから算出する
+        percentile = PERCENTILE_MODES.get(aggregate_mode)
+        if percentile is not None:
+            return (
+                (
+                    get_histogram_percentile(histogram, total_plays, percentile),
+                    entry_time,
+                    player_id,
+                )
+                for player_id, entry_time, total_plays, histogram in zip(
+                    self.player_ids,
+                    self.entry_times,
+                    self.total_plays,
+                    self.get_histograms(),
+                )
+                if total_plays >= lowest_play_times
+            )
+
+        # 平均スコアはここで一度だけ算出する
+        # (プレイ回数が指定回数に満たないユーザは集計しない)
+        return (
+            (round(total_score / total_plays), entry_time, player_id)
+            for player_id, entry_time, total_plays, total_score in zip(
+                self.player_ids, self.entry_times, self.total_plays, self.total_scores
+            )
+            if total_plays >= lowest_play_times
+        )
+
+    def get_ranking_item(
+        self, player_id: str, aggregate_mode: str, lowest_play_times: int
+    ) -> Optional[Tuple[int, int, str]]:
+        """プレイヤー1人分の(スコア, エントリー日時, プレイヤーID)を取得
+
+        Args:
+            player_id (str): プレイヤーID
+            aggregate_mode (str): 集計モードを表す文字列
+            lowest_play_times (int): average･median･p90集計時の最低プレイ回数
+
+        Returns:
+            Optional[Tuple[int, int, str]]: スコア･エントリー日時･プレイヤーIDの組
+                (ランキング対象外の場合はNone)
+        """
+        index = self.player_indexes.get(player_id)
+        if index is None:
+            return None
+
+        if aggregate_mode == "highscore":
+            return self.best_scores[index], self.entry_times[index], player_id
+
+        total_plays = self.total_plays[index]
+        if total_plays < lowest_play_times:
+            return None
+        percentile = PERCENTILE_MODES.get(aggregate_mode)
+        if percentile is not None:
+            return (
+                get_histogram_percentile(
+                    self.get_histograms()[index], total_plays, percentile
+                ),
+                self.entry_times[index],
+                player_id,
+            )
+        return (
+            round(self.total_scores[index] / total_plays),
+            self.entry_times[index],
+            player_id,
+        )
+
+    def get_histograms(self) -> List[Dict[int, int]]:
+        """連番ごとのスコアのヒストグラムを取得
+
+        Returns:
+            List[Dict[int, int]]: 連番ごとの階級とプレイ回数の対応
+
+        Raises:
+            RankingError: ヒストグラムを保持していない場合
+        """
+        if self.histograms is None:
+            raise RankingError("median/p90の集計にはスコアのヒストグラムが必要です。")
+
+        return self.histograms
+
+    def dump_state(self) -> Dict[str, List]:
+        """チェックポイントに保存できる形式に変換
+
+        Returns:
+            Dict[str, List]: 列名と値の対応
+        """
+        return {
+            "player_ids": self.player_ids,
+            "entry_times": self.entry_times.tolist(),
+            "total_plays": self.total_plays.tolist(),
+            "best_scores": list(self.best_scores),
+            "total_scores": list(self.total_scores),
+        }
+
+    @classmethod
+    def load_state(cls, state: Dict[str, List]) -> "ScoreData":
+        """dump_stateで変換した値からプレイログデータを復元
+
+        Args:
+            state (Dict[str, List]): 列名と値の対応
+
+        Returns:
+            ScoreData: プレイログデータ
+        """
+        return cls.from_columns(
+            state["player_ids"],
+            state["entry_times"],
+            state["total_plays"],
+            state["best_scores"],
+            state["total_scores"],
+        )
+
+
+def add_score_row(
+    score_data: ScoreData,
+    entry_data: Dict[str, List[str]],
+    row: List[str],
+):
+    """プレイログファイルの1行をプレイログデータに反映
+
+    Args:
+        score_data (ScoreData): プレイログデータ
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        row (List[str]): プレイログファイルの1行
+    """
+    create_timestamp = row[0]
+    player_id = row[1]
+
+    # エントリ―データにプレイヤーIDがなければ記録しない
+    entry = entry_data.get(player_id)
+    if entry is None:
+        return
+
+    # エントリー日時より古いプレイログは集計しない
+    entry_time = entry[0]
+    if create_timestamp < entry_time:
+        return
+
+    # プレイログデータ更新
+    score_data.add_play(player_id, entry_time, int(row[2]))
+
+
+def generate_entry_data(entry_log_path: str) -> Dict[str, List[str]]:
+    """エントリーデータを生成
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+
+    Returns:
+        Dict[str, List[str]]: エントリーデータ
+    """
+    entry_data = {}
+
+    # エントリーファイルを開く
+    with open_log(entry_log_path) as entry_file:
+        csv_rows = iterate_csv_rows(entry_file)
+        next(csv_rows)  # ヘッダーをスキップ
+
+        # 各行を辞書に格納
+        for row in csv_rows:
+            add_entry_row(entry_data, row)
+
+    return entry_data
+
+
+def generate_score_data(
+    score_log_path: str, entry_data: Dict[str, List[str]]
+) -> ScoreData:
+    """プレイログデータを生成
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        entry_data (Dict[str, List[str]]): エントリーデータ
+
+    Returns:
+        ScoreData: プレイログデータ
+    """
+    score_data = ScoreData()
+
+    with open_log(score_log_path) as score_file:
+        csv_rows = iterate_csv_rows(score_file)
+        next(csv_rows)  # ヘッダーをスキップ
+
+        # 各行を辞書に格納
+        for row in csv_rows:
+            add_score_row(score_data, entry_data, row)
+
+    return score_data
+
+
+LOG_CACHE_SUFFIX = ".rankcache"  # 入力ファイルの隣に書き込むキャッシュファイルの拡張子
+LOG_CACHE_MAGIC = b"RANKCACHE"  # キャッシュファイルの先頭のバイト列
+LOG_CACHE_VERSION = 1  # キャッシュファイルの形式のバージョン
+
+
+def get_log_signature(log_path: str) -> Dict:
+    """キャッシュが入力ファイルと一致しているか確認するための情報を取得
+
+    Args:
+        log_path (str): 入力ファイルパス
+
+    Returns:
+        Dict: 入力ファイルのサイズ･更新日時･フィンガープリント
+    """
+    file_stat = os.stat(log_path)
+
+    return {
+        "size": file_stat.st_size,
+        "mtime_ns": file_stat.st_mtime_ns,
+        "fingerprint": compute_fingerprint(log_path, file_stat.st_size),
+    }
+
+
+def write_log_cache(
+    log_path: str,
+    kind: str,
+    signature: Dict,
+    string_columns: Dict[str, List[str]],
+    int_columns: Dict[str, array],
+):
+    """解析済みの列をキャッシュファイルに書き込む
+
+    文字列の列は改行区切り、整数の列は8バイト整数の配列として書き込み、
+    読み込み時にメモリマップしたまま参照できるよう各列を8バイト境界に揃える。
+    読み込み中に入力ファイルが変更された場合や書き込めない場合はキャッシュを作らない。
+
+    Args:
+        log_path (str): 入力ファイルパス
+        kind (str): 入力ファイルの種類(entry/score)
+        signature (Dict): 読み込み開始時の入力ファイルの情報
+        string_columns (Dict[str, List[str]]): 列名と文字列の列
+        int_columns (Dict[str, array]): 列名と整数の列
+    """
+    if get_log_signature(log_path) != signature:
+        return
+    # 8バイト整数に収まらない値を含む列(整数のリスト)は書き込めない
+    if not all(isinstance(values, array) for values in int_columns.values()):
+        return
+
+    blocks = []
+    layout = {}
+    data_size = 0
+    for name, values in string_columns.items():
+        block = "\n".join(values).encode("utf-8")
+        layout[name] = {
+            "type": "str",
+            "offset": data_size,
+            "size": len(block),
+            "count": len(values),
+        }
+        blocks.append(block + b"\0" * (-len(block) % 8))
+        data_size += len(blocks[-1])
+    for name, values in int_columns.items():
+        block = values.tobytes()
+        layout[name] = {
+            "type": "int64",
+            "offset": data_size,
+            "size": len(block),
+            "count": len(values),
+        }
+        blocks.append(block)
+        data_size += len(block)
+
+    header = json.dumps(
+        {
+            "version": LOG_CACHE_VERSION,
+            "kind": kind,
+            "byteorder": sys.byteorder,
+            "source": signature,
+            "columns": layout,
+        }
+    ).encode("utf-8")
+    header += b" " * (-(len(LOG_CACHE_MAGIC) + 8 + len(header)) % 8)
+
+    cache_path = log_path + LOG_CACHE_SUFFIX
+    temporary_path = cache_path + ".tmp"
+    try:
+        with open(temporary_path, mode="wb") as cache_file:
+            cache_file.write(LOG_CACHE_MAGIC)
+            cache_file.write(len(header).to_bytes(8, "little"))
+            cache_file.write(header)
+            for block in blocks:
+                cache_file.write(block)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(temporary_path)
+
+
+def read_log_cache(
+    log_path: str, kind: str
+) -> Optional[Tuple[Dict[str, List[str]], Dict[str, memoryview]]]:
+    """入力ファイルと一致するキャッシュファイルを読み込む
+
+    整数の列はメモリマップしたファイルをそのまま参照する。
+
+    Args:
+        log_path (str): 入力ファイルパス
+        kind (str): 入力ファイルの種類(entry/score)
+
+    Returns:
+        Optional[Tuple[Dict[str, List[str]], Dict[str, memoryview]]]:
+            列名と文字列の列、列名と整数の列(キャッシュが使えない場合はNone)
+    """
+    try:
+        with open(log_path + LOG_CACHE_SUFFIX, mode="rb") as cache_file:
+            mapped_file = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    # ヘッダーを読み込み、入力ファイルと一致しているか確認
+    header_start = len(LOG_CACHE_MAGIC) + 8
+    if mapped_file[: len(LOG_CACHE_MAGIC)] != LOG_CACHE_MAGIC:
+        return None
+    header_length = int.from_bytes(
+        mapped_file[len(LOG_CACHE_MAGIC) : header_start], "little"
+    )
+    try:
+        header = json.loads(mapped_file[header_start : header_start + header_length])
+    except ValueError:
+        return None
+    if (
+        header.get("version") != LOG_CACHE_VERSION
+        or header.get("kind") != kind
+        or header.get("byteorder") != sys.byteorder
+        or header.get("source") != get_log_signature(log_path)
+    ):
+        return None
+
+    string_columns = {}
+    int_columns = {}
+    data = memoryview(mapped_file)[header_start + header_length :]
+    for name, column in header["columns"].items():
+        block = data[column["offset"] : column["offset"] + column["size"]]
+        if len(block) != column["size"]:
+            return None
+        if column["type"] == "int64":
+            int_columns[name] = block.cast("q")
+        elif column["count"] == 0:
+            string_columns[name] = []
+        else:
+            string_columns[name] = [
+                sys.intern(value) for value in bytes(block).decode("utf-8").split("\n")
+            ]
+
+    return string_columns, int_columns
+
+
+def aggregate_cached_score_log(
+    player_ids: List[str],
+    player_indexes: Iterable[int],
+    timestamps: Iterable[int],
+    scores: Iterable[int],
+    entry_data: Dict[str, List[str]],
+    engine: str = "python",
+    track_histograms: bool = False,
+) -> ScoreData:
+    """型付きの列になったプレイログを集計しプレイログデータを生成
+
+    Args:
+        player_ids (List[str]): プレイログに含まれるプレイヤーID
+        player_indexes (Iterable[int]): 行ごとのプレイヤーIDの位置
+        timestamps (Iterable[int]): 行ごとのプレイ日時のエポック秒
+        scores (Iterable[int]): 行ごとのスコア
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        engine (str): 集計エンジン(python/numpy)
+        track_histograms (bool): median/p90用のヒストグラムも集計するか
+            (pythonエンジンのみ)
+
+    Returns:
+        ScoreData: プレイログデータ
+    """
+    if engine == "numpy":
+        # プレイヤーIDの位置をエントリーデータ内の位置に置き換えてnumpyで集計
+        entry_index = {player_id: index for index, player_id in enumerate(entry_data)}
+        index_lookup = np.array(
+            [entry_index.get(player_id, -1) for player_id in player_ids], dtype=np.int64
+        )
+        return aggregate_score_columns(
+            index_lookup[np.frombuffer(player_indexes, dtype=np.int64)],
+            timestamps,
+            scores,
+            entry_data,
+        )
+
+    score_data = ScoreData(track_histograms)
+    entry_times = [
+        parse_timestamp(entry_data[player_id][0]) if player_id in entry_data else None
+        for player_id in player_ids
+    ]
+
+    for index, timestamp, score in zip(player_indexes, timestamps, scores):
+        # エントリーしていないプレイヤーとエントリー日時より古いプレイログは除外
+        entry_time = entry_times[index]
+        if entry_time is None or timestamp < entry_time:
+            continue
+        score_data.merge_player(
+            player_ids[index],
+            entry_time,
+            1,
+            score,
+            score,
+            {get_histogram_bucket(score): 1} if track_histograms else None,
+        )
+
+    return score_data
+
+
+class RankingError(Exception):
+    """ランキングを集計できない場合の例外の基底クラス
+
+    メッセージはCLIが標準エラー出力に出力するエラーメッセージと同じ。
+    """
+
+
+class LogNotFoundError(RankingError):
+    """入力ファイルが存在しない場合の例外"""
+
+
+class InvalidLogError(RankingError):
+    """入力ファイルや追加された行が仕様と異なる場合の例外"""
+
+
+def read_entry_log(
+    entry_log_path: str,
+    entry_log_header: str,
+    use_cache: bool = False,
+    stats: Optional[RunStats] = None,
+    entry_data: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, List[str]]:
+    """エントリーファイルのバリデーションとエントリーデータ生成を1回の読み込みで行う
+
+    不正な行が見つかった時点で読み込みを中断し、途中まで生成したデータは破棄する。
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        entry_log_header (str): エントリーファイルのヘッダー
+        use_cache (bool): キャッシュファイルを利用するか
+            (入力ファイルと一致するキャッシュがあれば読み込み、なければ作成する)
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+        entry_data (Optional[Dict[str, List[str]]]): 読み込んだ行を格納する空の辞書
+            (読み込み中に別スレッドから参照する場合に指定、Noneの場合は新規作成)
+
+    Returns:
+        Dict[str, List[str]]: エントリーデータ
+
+    Raises:
+        LogNotFoundError: エントリーファイルが存在しない場合
+        InvalidLogError: エントリーファイルが不正な場合
+    """
+    if entry_data is None:
+        entry_data = {}
+
+    # 入力ファイルの存在確認
+    if not os.path.exists(entry_log_path):
+        raise LogNotFoundError("ゲームのエントリーファイルが存在しません。")
+
+    # キャッシュがあれば検証済みのエントリーデータを復元
+    if use_cache:
+        cached_columns = read_log_cache(entry_log_path, "entry")
+        if cached_columns is not None:
+            string_columns, _ = cached_columns
+            entry_data.update(
+                (player_id, [entry_time, handle_name])
+                for player_id, entry_time, handle_name in zip(
+                    string_columns["player_ids"],
+                    string_columns["entry_times"],
+                    string_columns["handle_names"],
+                )
+            )
+            return entry_data
+        signature = get_log_signature(entry_log_path)
+
+    try:
+        with open_log(entry_log_path) as entry_file:
+            csv_rows = iterate_csv_rows(entry_file)
+            headers = next(csv_rows)
+            row_count = 0
+            if headers != entry_log_header.split(","):
+                raise InvalidLogError(
+                    "エントリーファイルのヘッダーが正しくありません。"
+                )
+
+            # 各行を検証してから辞書に格納
+            for row_count, row in enumerate(csv_rows, 1):
+                error_message = check_entry_row(row, headers)
+                if error_message is not None:
+                    if stats is not None:
+                        stats.count_rows(row_count, 1)
+                    raise InvalidLogError(error_message)
+                add_entry_row(entry_data, row)
+    except LogDecompressionError:
+        raise InvalidLogError("エントリーファイルを展開できません。") from None
+
+    if stats is not None:
+        stats.count_rows(row_count)
+
+    if use_cache:
+        write_log_cache(
+            entry_log_path,
+            "entry",
+            signature,
+            {
+                "player_ids": list(entry_data),
+                "entry_times": [entry[0] for entry in entry_data.values()],
+                "handle_names": [entry[1] for entry in entry_data.values()],
+            },
+            {},
+        )
+
+    return entry_data
+
+
+def load_entry_log(
+    entry_log_path: str,
+    entry_log_header: str,
+    use_cache: bool = False,
+    stats: Optional[RunStats] = None,
+) -> Optional[Dict[str, List[str]]]:
+    """read_entry_logでエントリーデータを生成し、不正な入力の理由を標準エラー出力する
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        entry_log_header (str): エントリーファイルのヘッダー
+        use_cache (bool): キャッシュファイルを利用するか
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+
+    Returns:
+        Optional[Dict[str, List[str]]]: エントリーデータ(不正な入力の場合はNone)
+    """
+    try:
+        return read_entry_log(entry_log_path, entry_log_header, use_cache, stats)
+    except RankingError as error:
+        print(error, file=sys.stderr)
+        return None
+
+
+def read_score_log(
+    score_log_path: str,
+    score_log_header: str,
+    entry_data: Dict[str, List[str]],
+    engine: str = "python",
+    use_cache: bool = False,
+    stats: Optional[RunStats] = None,
+    track_histograms: bool = False,
+) -> ScoreData:
+    """プレイログファイルのバリデーションとプレイログデータ生成を1回の読み込みで行う
+
+    不正な行が見つかった時点で読み込みを中断し、途中まで集計したデータは破棄する。
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        engine (str): 集計エンジン(python/numpy)
+        use_cache (bool): キャッシュファイルを利用するか
+            (入力ファイルと一致するキャッシュがあれば読み込み、なければ作成する)
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+        track_histograms (bool): median/p90用のヒストグラムも集計するか
+            (pythonエンジンのみ)
+
+    Returns:
+        ScoreData: プレイログデータ
+
+    Raises:
+        LogNotFoundError: プレイログファイルが存在しない場合
+        InvalidLogError: プレイログファイルが不正な場合
+    """
+    score_data = ScoreData(track_histograms)
+    player_index = {player_id: index for index, player_id in enumerate(entry_data)}
+    player_indexes = array("q")
+    timestamps = array("q")
+    scores = array("q")
+    cached_player_ids = {}  # キャッシュに書き込むプレイヤーIDと位置の対応
+
+    # 入力ファイルの存在確認
+    if not os.path.exists(score_log_path):
+        raise LogNotFoundError("ゲームのプレイログファイルが存在しません。")
+
+    # キャッシュがあれば解析済みの列から集計
+    if use_cache:
+        cached_columns = read_log_cache(score_log_path, "score")
+        if cached_columns is not None:
+            string_columns, int_columns = cached_columns
+            if stats is not None:
+                stats.count_rows(len(int_columns["player_indexes"]))
+            return aggregate_cached_score_log(
+                string_columns["player_ids"],
+                int_columns["player_indexes"],
+                int_columns["timestamps"],
+                int_columns["scores"],
+                entry_data,
+                engine,
+                track_histograms,
+            )
+        signature = get_log_signature(score_log_path)
+
+    try:
+        with open_log(score_log_path) as score_file:
+            csv_rows = iterate_csv_rows(score_file)
+            headers = next(csv_rows)
+            row_count = 0
+            if headers != score_log_header.split(","):
+                raise InvalidLogError(
+                    "プレイログファイルのヘッダーが正しくありません。"
+                )
+
+            # 各行を検証してからプレイログデータ(numpyエンジンやキャッシュ作成時は列)に格納
+            for row_count, row in enumerate(csv_rows, 1):
+                error_message = check_score_row(row, headers)
+                if error_message is not None:
+                    if stats is not None:
+                        stats.count_rows(row_count, 1)
+                    raise InvalidLogError(error_message)
+                if use_cache:
+                    player_indexes.append(
+                        cached_player_ids.setdefault(row[1], len(cached_player_ids))
+                    )
+                elif engine == "numpy":
+                    player_indexes.append(player_index.get(row[1], -1))
+                else:
+                    add_score_row(score_data, entry_data, row)
+                    continue
+                timestamps.append(parse_valid_timestamp(row[0]))
+                try:
+                    scores.append(int(row[2]))
+                except OverflowError:
+                    # 8バイト整数に収まらないスコアがあれば整数のリストに切り替える
+                    scores = scores.tolist()
+                    scores.append(int(row[2]))
+    except LogDecompressionError:
+        raise InvalidLogError("プレイログファイルを展開できません。") from None
+
+    if stats is not None:
+        stats.count_rows(row_count)
+
+    if use_cache:
+        write_log_cache(
+            score_log_path,
+            "score",
+            signature,
+            {"player_ids": list(cached_player_ids)},
+            {
+                "player_indexes": player_indexes,
+                "timestamps": timestamps,
+                "scores": scores,
+            },
+        )
+        score_data = aggregate_cached_score_log(
+            list(cached_player_ids),
+            player_indexes,
+            timestamps,
+            scores,
+            entry_data,
+            engine,
+            track_histograms,
+        )
+    elif engine == "numpy":
+        score_data = aggregate_score_columns(
+            player_indexes, timestamps, scores, entry_data
+        )
+
+    return score_data
+
+
+def load_score_log(
+    score_log_path: str,
+    score_log_header: str,
+    entry_data: Dict[str, List[str]],
+    engine: str = "python",
+    use_cache: bool = False,
+    stats: Optional[RunStats] = None,
+    track_histograms: bool = False,
+) -> Optional[ScoreData]:
+    """read_score_logでプレイログデータを生成し、不正な入力の理由を標準エラー出力する
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        engine (str): 集計エンジン(python/numpy)
+        use_cache (bool): キャッシュファイルを利用するか
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+        track_histograms (bool): median/p90用のヒストグラムも集計するか
+
+    Returns:
+        Optional[ScoreData]: プレイログデータ(不正な入力の場合はNone)
+    """
+    try:
+        return read_score_log(
+            score_log_path,
+            score_log_header,
+            entry_data,
+            engine,
+            use_cache,
+            stats,
+            track_histograms,
+        )
+    except RankingError as error:
+        print(error, file=sys.stderr)
+        return None
+
+
+CONCURRENT_CHECK_ROWS = 65536  # エントリーファイルの失敗を確認する行数の間隔
+
+
+def read_score_log_deferred(
+    score_log_path: str,
+    score_log_header: str,
+    entry_data: Dict[str, List[str]],
+    entry_errors: List[Exception],
+    stats: Optional[RunStats] = None,
+    track_histograms: bool = False,
+) -> Tuple[ScoreData, Tuple[List[str], array, array, Union[array, List[int]]]]:
+    """読み込み途中のエントリーデータを参照しながらプレイログファイルを検証･集計する
+
+    エントリー日時は最初のエントリーから変わらないため、読み込み済みのエントリーの
+    プレイヤーのプレイはその場でエントリー日時と比較して集計する。エントリーが
+    まだ読み込まれていないプレイヤーのプレイは、キャッシュと同じ型付きの列
+    (プレイヤーID表･行ごとのプレイヤーIDの位置･エポック秒･スコア)に保留する。
+    スコアの列は8バイト整数に収まらない値があれば整数のリストになる。
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        entry_data (Dict[str, List[str]]): 別スレッドで読み込み中のエントリーデータ
+        entry_errors (List[Exception]): エントリーファイルの読み込みで発生した例外
+            (発生した場合は読み込みを打ち切る)
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+        track_histograms (bool): median/p90用のヒストグラムも集計するか
+
+    Returns:
+        Tuple[ScoreData, Tuple[List[str], array, array, Union[array, List[int]]]]:
+            集計済みのプレイログデータと保留したプレイの列
+
+    Raises:
+        LogNotFoundError: プレイログファイルが存在しない場合
+        InvalidLogError: プレイログファイルが不正な場合
+    """
+    score_data = ScoreData(track_histograms)
+    deferred_player_ids = {}  # 保留したプレイのプレイヤーIDと位置の対応
+    deferred_player_indexes = array("q")
+    deferred_timestamps = array("q")
+    deferred_scores = array("q")
+
+    # 入力ファイルの存在確認
+    if not os.path.exists(score_log_path):
+        raise LogNotFoundError("ゲームのプレイログファイルが存在しません。")
+
+    try:
+        with open_log(score_log_path) as score_file:
+            csv_rows = iterate_csv_rows(score_file)
+            headers = next(csv_rows)
+            row_count = 0
+            if headers != score_log_header.split(","):
+                raise InvalidLogError(
+                    "プレイログファイルのヘッダーが正しくありません。"
+                )
+
+            for row_count, row in enumerate(csv_rows, 1):
+                error_message = check_score_row(row, headers)
+                if error_message is not None:
+                    if stats is not None:
+                        stats.count_rows(row_count, 1)
+                    raise InvalidLogError(error_message)
+
+                # エントリー済みのプレイヤーはエントリー日時以降のプレイのみ集計
+                entry = entry_data.get(row[1])
+                if entry is not None:
+                    if row[0] >= entry[0]:
+                        score_data.add_play(row[1], entry[0], int(row[2]))
+                else:
+                    deferred_player_indexes.append(
+                        deferred_player_ids.setdefault(row[1], len(deferred_player_ids))
+                    )
+                    deferred_timestamps.append(parse_valid_timestamp(row[0]))
+                    try:
+                        deferred_scores.append(int(row[2]))
+                    except OverflowError:
+                        deferred_scores = deferred_scores.tolist()
+                        deferred_scores.append(int(row[2]))
+
+                # エントリーファイルが不正な場合は残りを読まない
+                if not row_count % CONCURRENT_CHECK_ROWS and entry_errors:
+                    break
+    except LogDecompressionError:
+        raise InvalidLogError("プレイログファイルを展開できません。") from None
+
+    if stats is not None:
+        stats.count_rows(row_count)
+
+    return score_data, (
+        list(deferred_player_ids),
+        deferred_player_indexes,
+        deferred_timestamps,
+        deferred_scores,
+    )
+
+
+def read_logs_concurrently(
+    entry_log_path: str,
+    entry_log_header: str,
+    score_log_path: str,
+    score_log_header: str,
+    stats: Optional[RunStats] = None,
+    track_histograms: bool = False,
+) -> Tuple[Dict[str, List[str]], ScoreData]:
+    """エントリーファイルとプレイログファイルを並行して読み込み、検証･集計する
+
+    エントリーファイルは別スレッドでread_entry_logにより読み込み、プレイログファイルは
+    呼び出し元のスレッドでread_score_log_deferredにより読み込む。エントリーファイルを
+    読み終えてから、保留したプレイをエントリー日時で絞り込んで統合する。集計結果と
+    エラーメッセージ(両方が不正な場合はエントリーファイルを優先)は順に読み込む場合と同じ。
+    ネットワークストレージや圧縮ファイルでは2つのファイルの読み込み待ちが重なるが、
+    CSVの解析はGILを共有するため、CPUの処理時間は順に読み込む場合と変わらない。
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        entry_log_header (str): エントリーファイルのヘッダー
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+        track_histograms (bool): median/p90用のヒストグラムも集計するか
+
+    Returns:
+        Tuple[Dict[str, List[str]], ScoreData]: エントリーデータとプレイログデータ
+
+    Raises:
+        LogNotFoundError: 入力ファイルが存在しない場合
+        InvalidLogError: 入力ファイルが不正な場合
+    """
+    entry_data = {}
+    entry_errors = []  # エントリーファイルを読み込むスレッドで発生した例外
+    entry_stats = RunStats()
+
+    def load_entries():
+        try:
+            with entry_stats.measure("load_entry_log"):
+                read_entry_log(
+                    entry_log_path, entry_log_header, False, entry_stats, entry_data
+                )
+        except Exception as error:  # 呼び出し元のスレッドで送出し直す
+            entry_errors.append(error)
+
+    entry_thread = threading.Thread(target=load_entries, daemon=True)
+    entry_thread.start()
+    try:
+        score_data, deferred_columns = read_score_log_deferred(
+            score_log_path,
+            score_log_header,
+            entry_data,
+            entry_errors,
+            stats,
+            track_histograms,
+        )
+    except RankingError:
+        entry_thread.join()
+        if entry_errors:
+            raise entry_errors[0] from None
+        raise
+    entry_thread.join()
+    if entry_errors:
+        raise entry_errors[0]
+
+    if stats is not None:
+        entry_phase = entry_stats.phases[0]
+        stats.count_rows(
+            entry_phase["rows_read"] or 0, entry_phase["rows_rejected"] or 0
+        )
+
+    # 保留したプレイをエントリー日時で絞り込んで統合
+    deferred_data = aggregate_cached_score_log(
+        *deferred_columns, entry_data, "python", track_histograms
+    )
+    for index, player_id in enumerate(deferred_data.player_ids):
+        score_data.merge_player(
+            player_id,
+            deferred_data.entry_times[index],
+            deferred_data.total_plays[index],
+            deferred_data.best_scores[index],
+            deferred_data.total_scores[index],
+            deferred_data.histograms[index] if track_histograms else None,
+        )
+
+    return entry_data, score_data
+
+
+def aggregate_score_columns(
+    player_indexes: array,
+    timestamps: array,
+    scores: Union[array, List[int]],
+    entry_data: Dict[str, List[str]],
+) -> ScoreData:
+    """列形式のプレイログをnumpyで集計しプレイログデータを生成
+
+    エントリーしていないプレイヤーとエントリー日時より古いプレイログの除外、
+    プレイヤーごとのプレイ回数･最高スコア･合計スコアの集計をベクトル演算で行う。
+    スコアや合計スコアが8バイト整数に収まらない場合は任意精度の整数(object型)で集計する。
+
+    Args:
+        player_indexes (array): エントリーデータ上のプレイヤー位置(未エントリーは-1)
+        timestamps (array): プレイ日時のエポック秒
+        scores (Union[array, List[int]]): スコア
+            (8バイト整数に収まらない値を含む場合は整数のリスト)
+        entry_data (Dict[str, List[str]]): エントリーデータ
+
+    Returns:
+        ScoreData: プレイログデータ
+    """
+    player_ids = list(entry_data)
+
+    # エントリー日時の列(末尾は未エントリーのプレイヤー用で常に除外される)
+    entry_times = np.empty(len(player_ids) + 1, dtype=np.int64)
+    entry_times[:-1] = [parse_timestamp(entry[0]) for entry in entry_data.values()]
+    entry_times[-1] = np.iinfo(np.int64).max
+
+    player_column = np.frombuffer(player_indexes, dtype=np.int64).copy()
+    player_column[player_column < 0] = len(player_ids)
+    timestamp_column = np.frombuffer(timestamps, dtype=np.int64)
+    if isinstance(scores, list):
+        score_column = np.array(scores, dtype=object)
+    else:
+        score_column = np.frombuffer(scores, dtype=np.int64)
+
+    # 未エントリーのプレイヤーとエントリー日時より古いプレイログを除外
+    valid_mask = timestamp_column >= entry_times[player_column]
+    player_column = player_column[valid_mask]
+    score_column = score_column[valid_mask]
+    if len(player_column) == 0:
+        return ScoreData()
+
+    # 合計スコアが8バイト整数に収まらない可能性があれば任意精度の整数で集計
+    max_score = np.iinfo(np.int64).max // len(score_column)
+    if score_column.dtype != object and score_column.max() > max_score:
+        score_column = score_column.astype(object)
+
+    # プレイヤーごとにまとめてプレイ回数･最高スコア･合計スコアを集計
+    order = np.argsort(player_column, kind="stable")
+    player_column = player_column[order]
+    score_column = score_column[order]
+    group_starts = np.flatnonzero(
+        np.concatenate(([True], player_column[1:] != player_column[:-1]))
+    )
+    group_players = player_column[group_starts]
+    total_plays = np.diff(np.append(group_starts, len(player_column)))
+    best_scores = np.maximum.reduceat(score_column, group_starts)
+    total_scores = np.add.reduceat(score_column, group_starts)
+
+    # 任意精度の整数で集計した列は整数のリストのまま渡す
+    if score_column.dtype == object:
+        best_scores, total_scores = best_scores.tolist(), total_scores.tolist()
+    else:
+        best_scores, total_scores = best_scores.tobytes(), total_scores.tobytes()
+
+    # プレイログデータ生成
+    return ScoreData.from_columns(
+        [player_ids[index] for index in group_players.tolist()],
+        entry_times[group_players].tobytes(),
+        total_plays.astype(np.int64).tobytes(),
+        best_scores,
+        total_scores,
+    )
+
+
+def split_byte_ranges(
+    file_path: str, data_start: int, range_count: int
+) -> List[Tuple[int, int]]:
+    """ファイルを改行位置で区切ったバイト範囲に分割
+
+    Args:
+        file_path (str): ファイルパス
+        data_start (int): データ行の開始位置(ヘッダーの直後)
+        range_count (int): 分割数
+
+    Returns:
+        List[Tuple[int, int]]: 開始位置と終了位置の組
+    """
+    file_size = os.path.getsize(file_path)
+    boundaries = [data_start]
+
+    with open(file_path, mode="rb") as target_file:
+        for number in range(1, range_count):
+            position = data_start + (file_size - data_start) * number // range_count
+            if position <= boundaries[-1]:
+                continue
+            # 行の途中から始まらないよう次の改行の直後まで進める
+            target_file.seek(position - 1)
+            target_file.readline()
+            position = target_file.tell()
+            if boundaries[-1] < position < file_size:
+                boundaries.append(position)
+    boundaries.append(file_size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_range_lines(target_file, start: int, end: int) -> Iterable[str]:
+    """バイト範囲に含まれる行を順に読み込む
+
+    Args:
+        target_file: バイナリモードで開いたファイル
+        start (int): 開始位置(行頭)
+        end (int): 終了位置(行頭)
+
+    Yields:
+        str: 1行分の文字列
+    """
+    target_file.seek(start)
+    position = start
+    while position < end:
+        line = target_file.readline()
+        if not line:
+            break
+        position += len(line)
+        yield line.decode("utf-8")
+
+
+_worker_entry_times = {}  # ワーカープロセスで参照するエントリー日時
+
+
+def _initialize_score_worker(entry_times: Dict[str, str]):
+    """ワーカープロセスにエントリー日時を設定
+
+    Args:
+        entry_times (Dict[str, str]): プレイヤーIDとエントリー日時の対応
+    """
+    global _worker_entry_times
+    _worker_entry_times = entry_times
+
+
+def aggregate_score_range(
+    score_log_path: str, start: Optional[int], end: int, headers: List[str]
+) -> Tuple[Optional[Dict[str, List]], str]:
+    """プレイログファイルのバイト範囲を検証しプレイヤーごとの途中集計を作成
+
+    ワーカープロセスで実行する。エラーメッセージは呼び出し元で出力するため
+    標準エラー出力を取り込んで返す。
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        start (Optional[int]): 開始位置(Noneの場合は圧縮されたファイルの
+            ヘッダー以降の全体)
+        end (int): 終了位置
+        headers (List[str]): プレイログファイルのヘッダー
+
+    Returns:
+        Tuple[Optional[Dict[str, List]], str]:
+            プレイヤーIDと[プレイ回数, 最高スコア, 合計スコア]の対応
+            (不正な入力の場合はNone)とエラーメッセージ
+    """
+    partial_states = {}
+    entry_times = _worker_entry_times
+    error_output = io.StringIO()
+
+    # 圧縮されたファイルはバイト位置で分割できないため先頭から展開して読み込む
+    if start is None:
+        score_file = open_log(score_log_path)
+        lines = itertools.islice(score_file, 1, None)
+    else:
+        score_file = open(score_log_path, mode="rb")
+        lines = read_range_lines(score_file, start, end)
+
+    with score_file, contextlib.redirect_stderr(error_output):
+        try:
+            for row in csv.reader(lines):
+                if not validate_score_row(row, headers):
+                    return None, error_output.getvalue()
+
+                create_timestamp = row[0]
+                player_id = row[1]
+                game_score = int(row[2])
+
+                # エントリーしていないプレイヤーとエントリー日時より古いプレイログは除外
+                entry_time = entry_times.get(player_id)
+                if entry_time is None or create_timestamp < entry_time:
+                    continue
+
+                state = partial_states.get(player_id)
+                if state is None:
+                    partial_states[player_id] = [1, game_score, game_score]
+                else:
+                    state[0] += 1
+                    if game_score > state[1]:
+                        state[1] = game_score
+                    state[2] += game_score
+        except LogDecompressionError:
+            print("プレイログファイルを展開できません。", file=sys.stderr)
+            return None, error_output.getvalue()
+
+    return partial_states, ""
+
+
+def _aggregate_score_range_task(
+    arguments: Tuple[str, Optional[int], int, List[str]],
+) -> Tuple[Optional[Dict[str, List]], str]:
+    """Pool.imapから呼び出すためのaggregate_score_rangeのラッパー"""
+    return aggregate_score_range(*arguments)
+
+
+def merge_score_states(
+    partial_states_list: Iterable[Dict[str, List]], entry_data: Dict[str, List[str]]
+) -> ScoreData:
+    """途中集計を統合してプレイログデータを生成
+
+    Args:
+        partial_states_list (Iterable[Dict[str, List]]): バイト範囲ごとの途中集計
+        entry_data (Dict[str, List[str]]): エントリーデータ
+
+    Returns:
+        ScoreData: プレイログデータ
+    """
+    score_data = ScoreData()
+
+    for partial_states in partial_states_list:
+        for player_id, partial_state in partial_states.items():
+            total_plays, best_score, total_score = partial_state
+            if player_id in score_data:
+                entry_time = 0  # 既存プレイヤーのエントリー日時は更新されない
+            else:
+                entry_time = parse_timestamp(entry_data[player_id][0])
+            score_data.merge_player(
+                player_id, entry_time, total_plays, best_score, total_score
+            )
+
+    return score_data
+
+
+def load_score_log_parallel(
+    score_log_path: str,
+    score_log_header: str,
+    entry_data: Dict[str, List[str]],
+    workers: int,
+) -> Optional[ScoreData]:
+    """プレイログファイルをバイト範囲に分割し複数プロセスで検証･集計する
+
+    不正な行がある場合はファイル内で最も前の範囲のエラーメッセージを出力する。
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        workers (int): ワーカープロセス数
+
+    Returns:
+        Optional[ScoreData]: プレイログデータ(不正な入力の場合はNone)
+    """
+    return load_score_logs_parallel(
+        [score_log_path], score_log_header, entry_data, workers
+    )
+
+
+def resolve_log_paths(log_paths: List[str]) -> Optional[List[str]]:
+    """ファイル･ディレクトリ･globパターンの指定を入力ファイルパスの一覧に展開
+
+    ディレクトリは直下のファイルを、globパターンは一致するファイルを名前順に並べる。
+    隠しファイルとキャッシュ･時刻索引などの付属ファイルは含めない。
+
+    Args:
+        log_paths (List[str]): ファイルパス･ディレクトリパス･globパターン
+
+    Returns:
+        Optional[List[str]]: 入力ファイルパス(一致するファイルがない指定がある場合はNone)
+    """
+    resolved_paths = []
+    sidecar_suffixes = (LOG_CACHE_SUFFIX, TIME_INDEX_SUFFIX, ".tmp")
+
+    for log_path in log_paths:
+        if os.path.isdir(log_path):
+            matched_paths = [
+                os.path.join(log_path, name) for name in sorted(os.listdir(log_path))
+            ]
+        elif not os.path.exists(log_path) and any(
+            character in log_path for character in "*?["
+        ):
+            matched_paths = sorted(glob.glob(log_path))
+        else:
+            # 存在しないファイルは読み込み時にエラーとする
+            resolved_paths.append(log_path)
+            continue
+
+        matched_paths = [
+            matched_path
+            for matched_path in matched_paths
+            if os.path.isfile(matched_path)
+            and not os.path.basename(matched_path).startswith(".")
+            and not matched_path.endswith(sidecar_suffixes)
+        ]
+        if not matched_paths:
+            print(f"プレイログファイルが見つかりません。({log_path})", file=sys.stderr)
+            return None
+        resolved_paths.extend(matched_paths)
+
+    return resolved_paths
+
+
+def load_score_logs_parallel(
+    score_log_paths: List[str],
+    score_log_header: str,
+    entry_data: Dict[str, List[str]],
+    workers: int,
+) -> Optional[ScoreData]:
+    """複数のプレイログファイルを複数プロセスで検証･集計し1つのプレイログデータに統合する
+
+    ファイルごとにヘッダーを確認し、圧縮されていないファイルはさらにバイト範囲に
+    分割する。プレイヤーごとの集計値は行の順序によらないため、結果は全ファイルを
+    連結して集計した場合と一致する。不正な行がある場合は連結した順で最も前の
+    範囲のエラーメッセージを出力する。
+
+    Args:
+        score_log_paths (List[str]): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        workers (int): ワーカープロセス数
+
+    Returns:
+        Optional[ScoreData]: プレイログデータ(不正な入力の場合はNone)
+    """
+    partial_states_list = []
+    tasks = []
+    ranges_per_file = max(workers // len(score_log_paths), 1)
+
+    for score_log_path in score_log_paths:
+        # 入力ファイルの存在確認
+        if not os.path.exists(score_log_path):
+            print("ゲームのプレイログファイルが存在しません。", file=sys.stderr)
+            return None
+
+        # ヘッダー確認(圧縮されたファイルは展開して1行目のみ読み込む)
+        compressed = detect_compression(score_log_path) is not None
+        if compressed:
+            try:
+                with open_log(score_log_path) as score_file:
+                    header_line = score_file.readline()
+            except LogDecompressionError:
+                print("プレイログファイルを展開できません。", file=sys.stderr)
+                return None
+        else:
+            with open(score_log_path, mode="rb") as score_file:
+                header_line = score_file.readline().decode("utf-8")
+                data_start = score_file.tell()
+        headers = next(csv.reader([header_line]), [])
+        if headers != score_log_header.split(","):
+            print("プレイログファイルのヘッダーが正しくありません。", file=sys.stderr)
+            return None
+
+        if compressed:
+            tasks.append((score_log_path, None, 0, headers))
+            continue
+        tasks.extend(
+            (score_log_path, start, end, headers)
+            for start, end in split_byte_ranges(
+                score_log_path, data_start, ranges_per_file
+            )
+        )
+
+    # 範囲ごとに途中集計し、連結した順序で結果を受け取る
+    entry_times = {player_id: entry[0] for player_id, entry in entry_data.items()}
+    with multiprocessing.Pool(
+        workers, initializer=_initialize_score_worker, initargs=(entry_times,)
+    ) as pool:
+        for partial_states, error_message in pool.imap(
+            _aggregate_score_range_task, tasks
+        ):
+            if partial_states is None:
+                print(error_message, end="", file=sys.stderr)
+                return None
+            partial_states_list.append(partial_states)
+
+    return merge_score_states(partial_states_list, entry_data)
+
+
+def collect_range_violations(
+    log_path: str,
+    check_row_name: str,
+    start: int,
+    end: int,
+    headers: List[str],
+    max_violations: int,
+) -> Tuple[int, int, List[Tuple[int, str]]]:
+    """ログファイルのバイト範囲の全行を検証し、不正な行を集める
+
+    ワーカープロセスで実行する。行番号は範囲の先頭行を1とした値を返す。
+
+    Args:
+        log_path (str): ログファイルパス
+        check_row_name (str): 1行を検証する関数名(check_entry_row/check_score_row)
+        start (int): 開始位置
+        end (int): 終了位置
+        headers (List[str]): ログファイルのヘッダー
+        max_violations (int): 集める不正な行の上限
+
+    Returns:
+        Tuple[int, int, List[Tuple[int, str]]]:
+            範囲の行数、不正な行数、範囲内の行番号とエラーメッセージの組
+    """
+    check_row = globals()[check_row_name]
+    violation_count = 0
+    violations = []
+
+    with open(log_path, mode="rb") as log_file:
+        csv_reader = csv.reader(read_range_lines(log_file, start, end))
+        row_line_number = 1
+        for row in csv_reader:
+            error_message = check_row(row, headers)
+            if error_message is not None:
+                violation_count += 1
+                if len(violations) < max_violations:
+                    violations.append((row_line_number, error_message))
+            row_line_number = csv_reader.line_num + 1
+
+    return csv_reader.line_num, violation_count, violations
+
+
+def _collect_range_violations_task(
+    arguments: Tuple[str, str, int, int, List[str], int],
+) -> Tuple[int, int, List[Tuple[int, str]]]:
+    """Pool.imapから呼び出すためのcollect_range_violationsのラッパー"""
+    return collect_range_violations(*arguments)
+
+
+def report_log_violations(
+    entry_log_path: str, score_log_path: str, workers: int, max_violations: int
+) -> int:
+    """入力ファイルの不正な行を行番号と理由付きで全て出力する
+
+    各入力ファイルを改行位置で区切ったバイト範囲に分割し、複数プロセスで
+    1回ずつ読み込む。出力する件数はmax_violationsまでとし、件数の合計は
+    標準エラー出力に出力する。
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+        workers (int): ワーカープロセス数
+        max_violations (int): 出力する不正な行の上限
+
+    Returns:
+        int: 不正な行数(存在しないファイルや不正なヘッダーを含む)
+    """
+    violations = []  # ファイルパス･行番号･エラーメッセージの組
+    violation_count = 0
+    tasks = []
+    task_logs = []  # タスクごとのログファイルパス
+
+    for log_path, log_header, check_row_name, missing_message, header_message in [
+        (
+            entry_log_path,
+            ENTRY_LOG_HEADER,
+            "check_entry_row",
+            "ゲームのエントリーファイルが存在しません。",
+            "エントリーファイルのヘッダーが正しくありません。",
+        ),
+        (
+            score_log_path,
+            SCORE_LOG_HEADER,
+            "check_score_row",
+            "ゲームのプレイログファイルが存在しません。",
+            "プレイログファイルのヘッダーが正しくありません。",
+        ),
+    ]:
+        # 入力ファイルの存在確認
+        if not os.path.exists(log_path):
+            violations.append((log_path, 0, missing_message))
+            violation_count += 1
+            continue
+
+        # ヘッダー確認(データ行は正しいヘッダーの要素数で検証を続ける)
+        with open(log_path, mode="rb") as log_file:
+            header_line = log_file.readline()
+            data_start = log_file.tell()
+        if next(csv.reader([header_line.decode("utf-8")]), []) != log_header.split(","):
+            violations.append((log_path, 1, header_message))
+            violation_count += 1
+
+        for start, end in split_byte_ranges(log_path, data_start, workers):
+            tasks.append(
+                (
+                    log_path,
+                    check_row_name,
+                    start,
+                    end,
+                    log_header.split(","),
+                    max_violations,
+                )
+            )
+            task_logs.append(log_path)
+
+    # バイト範囲ごとに検証し、ファイル内の順序で行番号を通し番号に変換
+    with multiprocessing.Pool(workers) as pool:
+        line_offsets = {}  # ログファイルパスと範囲の直前までの行数の対応
+        for log_path, (line_count, range_violation_count, range_violations) in zip(
+            task_logs, pool.imap(_collect_range_violations_task, tasks)
+        ):
+            line_offset = line_offsets.get(log_path, 1)  # 1行目はヘッダー
+            violation_count += range_violation_count
+            violations.extend(
+                (log_path, line_offset + line_number, error_message)
+                for line_number, error_message in range_violations
+            )
+            line_offsets[log_path] = line_offset + line_count
+
+    # 不正な行をCSV形式で出力
+    print("file,line_number,reason")
+    for log_path, line_number, error_message in violations[:max_violations]:
+        print(f"{log_path},{line_number},{error_message}")
+    print(
+        f"不正な行が{violation_count}件見つかりました。"
+        f"(出力したのは{min(violation_count, max_violations)}件)",
+        file=sys.stderr,
+    )
+
+    return violation_count
+
+
+CHECKPOINT_VERSION = 2  # チェックポイントファイルの形式のバージョン
+FINGERPRINT_BLOCK_SIZE = 1 << 20  # フィンガープリントの算出時に一度に読み込むバイト数
+
+
+def hash_file_range(digest, file_path: str, start: int, end: int):
+    """ファイルの指定範囲の内容をハッシュオブジェクトに追加
+
+    Args:
+        digest: hashlibのハッシュオブジェクト
+        file_path (str): ファイルパス
+        start (int): 範囲の開始位置
+        end (int): 範囲の終了位置
+
+    Returns:
+        hashlibのハッシュオブジェクト(digestそのもの)
+    """
+    with open(file_path, mode="rb") as target_file:
+        target_file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = target_file.read(min(remaining, FINGERPRINT_BLOCK_SIZE))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+
+    return digest
+
+
+def compute_fingerprint(file_path: str, offset: int) -> str:
+    """ファイルの先頭から指定位置までの内容のフィンガープリントを算出
+
+    途中の行だけが書き換えられた場合も検出できるよう、範囲全体をハッシュ化する。
+
+    Args:
+        file_path (str): ファイルパス
+        offset (int): 対象とする範囲の終了位置
+
+    Returns:
+        str: フィンガープリント
+    """
+    return hash_file_range(hashlib.sha256(), file_path, 0, offset).hexdigest()
+
+
+def get_file_identity(file_path: str) -> List[int]:
+    """ファイルを置き換えられていないか確認するためのデバイス番号とinode番号を取得
+
+    Args:
+        file_path (str): ファイルパス
+
+    Returns:
+        List[int]: デバイス番号とinode番号(JSONに保存した値と比較できるようリスト)
+    """
+    file_stat = os.stat(file_path)
+
+    return [file_stat.st_dev, file_stat.st_ino]
+
+
+def is_log_appended(file_path: str, log_state: Dict) -> bool:
+    """前回読み込んだ範囲の後ろに追記されただけと見なせるか、内容を読まずに確認
+
+    パスが異なる場合、切り詰められた場合、前回の最終行に追記された場合は
+    追記ではないとする。
+
+    Args:
+        file_path (str): ログファイルパス
+        log_state (Dict): 前回読み込んだ範囲(パスと終了位置)
+
+    Returns:
+        bool: 照合結果
+    """
+    offset = log_state["offset"]
+
+    if log_state["path"] != os.path.abspath(file_path):
+        return False
+    file_size = os.path.getsize(file_path)
+    if file_size < offset:
+        return False
+
+    # 改行で終わっていない最終行に追記されていないか確認
+    if offset > 0 and file_size > offset:
+        with open(file_path, mode="rb") as target_file:
+            target_file.seek(offset - 1)
+            if target_file.read(1) != b"\n":
+                return False
+
+    return True
+
+
+def verify_log_prefix(
+    file_path: str, log_state: Dict, log_digest: Optional[Tuple] = None
+):
+    """前回読み込んだ範囲のログが変更されていないか確認
+
+    範囲全体を1回だけハッシュ化してフィンガープリントと照合し、照合に使った
+    ハッシュオブジェクトを返す。呼び出し元は追記分のみを加えて新しい
+    フィンガープリントを算出できる。同じプロセスで保持し続けたハッシュ(log_digest)
+    があり、ファイルが置き換えられていなければ範囲を読み直さずにその複製を返す。
+
+    Args:
+        file_path (str): ログファイルパス
+        log_state (Dict): 前回読み込んだ範囲のパス･終了位置･フィンガープリント
+        log_digest (Optional[Tuple]): 前回の読み込み後のファイルのデバイス番号と
+            inode番号、範囲をハッシュ化したオブジェクトの組
+
+    Returns:
+        読み込み済みの範囲をハッシュ化したオブジェクト(変更されている場合はNone)
+    """
+    if not is_log_appended(file_path, log_state):
+        return None
+
+    if log_digest is not None:
+        file_identity, digest = log_digest
+        if file_identity == get_file_identity(file_path):
+            return digest.copy()
+
+    digest = hash_file_range(hashlib.sha256(), file_path, 0, log_state["offset"])
+    if digest.hexdigest() != log_state["fingerprint"]:
+        return None
+
+    return digest
+
+
+def read_checkpoint(checkpoint_path: str) -> Optional[Dict]:
+    """チェックポイントファイルを読み込む
+
+    Args:
+        checkpoint_path (str): チェックポイントファイルパス
+
+    Returns:
+        Optional[Dict]: チェックポイント(存在しないか読み込めない場合はNone)
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+
+    try:
+        with open(checkpoint_path, mode="r", encoding="utf-8") as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+
+    return checkpoint
+
+
+def write_checkpoint(checkpoint_path: str, checkpoint: Dict):
+    """チェックポイントファイルを書き込む(書き込み途中のファイルは残さない)
+
+    Args:
+        checkpoint_path (str): チェックポイントファイルパス
+        checkpoint (Dict): チェックポイント
+    """
+    temporary_path = checkpoint_path + ".tmp"
+    with open(temporary_path, mode="w", encoding="utf-8") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file, ensure_ascii=False)
+    os.replace(temporary_path, checkpoint_path)
+
+
+def read_log_rows(log_file, start: int, consumed: List[int]) -> Iterable[List[str]]:
+    """バイナリモードで開いたログファイルの指定位置以降をCSVとして1行ずつ読み込む
+
+    Args:
+        log_file: バイナリモードで開いたログファイル
+        start (int): 読み込み開始位置(行頭)
+        consumed (List[int]): 読み込み済みの位置を記録するリスト(先頭要素を更新)
+
+    Returns:
+        Iterable[List[str]]: CSVの行
+    """
+
+    def read_lines():
+        log_file.seek(start)
+        for line in log_file:
+            consumed[0] += len(line)
+            yield line.decode("utf-8")
+
+    consumed[0] = start
+    return csv.reader(read_lines())
+
+
+def create_log_state() -> Dict:
+    """空の集計状態を生成
+
+    Returns:
+        Dict: 各入力ファイルの読み込み位置とエントリーデータ･プレイログデータ
+    """
+    return {
+        "version": CHECKPOINT_VERSION,
+        "entry_log": {"path": "", "offset": 0, "fingerprint": ""},
+        "score_log": {"path": "", "offset": 0, "fingerprint": ""},
+        "latest_timestamp": "",  # 集計済みプレイログの最新日時
+        "entry_data": {},
+        "score_data": ScoreData(),
+    }
+
+
+def update_log_state(
+    log_state: Dict,
+    entry_log_path: str,
+    entry_log_header: str,
+    score_log_path: str,
+    score_log_header: str,
+    updated_players: Optional[set] = None,
+    log_digests: Optional[Dict] = None,
+) -> bool:
+    """前回の読み込み位置以降に追記された行のみを検証し集計状態に反映する
+
+    前回読み込んだ範囲が変更されている場合や、追記されたエントリーが集計済みの
+    プレイログに影響する場合は先頭から読み込み直す。不正な入力の場合は集計状態が
+    途中まで更新されているため、呼び出し元で破棄する。
+
+    読み込み済みの範囲は照合時に1回だけハッシュ化し、そのハッシュに追記分のみを
+    加えてフィンガープリントを更新する。log_digestsを渡した場合は更新後のハッシュを
+    保持し、次回はファイルが置き換えられず追記のみであれば範囲を読み直さない。
+
+    Args:
+        log_state (Dict): create_log_stateで生成した集計状態
+        entry_log_path (str): エントリーファイルパス
+        entry_log_header (str): エントリーファイルのヘッダー
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        updated_players (Optional[set]): 追記されたプレイログのプレイヤーIDを追加する集合
+        log_digests (Optional[Dict]): 入力ファイルごとに読み込み済みの範囲のハッシュを
+            保持する辞書(同じ集計状態で追記を取り込み続ける場合に渡す)
+
+    Returns:
+        bool: 照合結果
+    """
+    consumed = [0]
+    if log_digests is None:
+        log_digests = {}
+
+    # 入力ファイルの存在確認
+    if not os.path.exists(entry_log_path):
+        print("ゲームのエントリーファイルが存在しません。", file=sys.stderr)
+        return False
+    if not os.path.exists(score_log_path):
+        print("ゲームのプレイログファイルが存在しません。", file=sys.stderr)
+        return False
+
+    # 前回読み込んだ範囲が変更されていれば先頭から読み込み直す
+    entry_identity = get_file_identity(entry_log_path)
+    score_identity = get_file_identity(score_log_path)
+    entry_digest = verify_log_prefix(
+        entry_log_path, log_state["entry_log"], log_digests.get("entry_log")
+    )
+    score_digest = None
+    if entry_digest is not None:
+        score_digest = verify_log_prefix(
+            score_log_path, log_state["score_log"], log_digests.get("score_log")
+        )
+    if entry_digest is None or score_digest is None:
+        log_state.update(create_log_state())
+        entry_digest = hashlib.sha256()
+        score_digest = hashlib.sha256()
+    entry_data = log_state["entry_data"]
+    score_data = log_state["score_data"]
+    entry_offset = log_state["entry_log"]["offset"]
+    score_offset = log_state["score_log"]["offset"]
+    latest_timestamp = log_state["latest_timestamp"]
+
+    # エントリーファイルの追記分を読み込む
+    with open(entry_log_path, mode="rb") as entry_file:
+        csv_reader = read_log_rows(entry_file, entry_offset, consumed)
+        if entry_offset == 0:
+            headers = next(csv_reader, [])
+            if headers != entry_log_header.split(","):
+                print(
+                    "エントリーファイルのヘッダーが正しくありません。", file=sys.stderr
+                )
+                return False
+        headers = entry_log_header.split(",")
+
+        for row in csv_reader:
+            if not validate_entry_row(row, headers):
+                return False
+            # 集計済みのプレイログ以前にエントリーした新規プレイヤーがいれば再集計
+            if row[1] not in entry_data and row[0] <= latest_timestamp:
+                score_data = ScoreData()
+                score_offset = 0
+                score_digest = hashlib.sha256()
+                latest_timestamp = ""
+            add_entry_row(entry_data, row)
+        hash_file_range(entry_digest, entry_log_path, entry_offset, consumed[0])
+        entry_offset = consumed[0]
+
+    # プレイログファイルの追記分を読み込む
+    with open(score_log_path, mode="rb") as score_file:
+        csv_reader = read_log_rows(score_file, score_offset, consumed)
+        if score_offset == 0:
+            headers = next(csv_reader, [])
+            if headers != score_log_header.split(","):
+                print(
+                    "プレイログファイルのヘッダーが正しくありません。", file=sys.stderr
+                )
+                return False
+        headers = score_log_header.split(",")
+
+        for row in csv_reader:
+            if not validate_score_row(row, headers):
+                return False
+            add_score_row(score_data, entry_data, row)
+            if updated_players is not None:
+                updated_players.add(row[1])
+            if row[0] > latest_timestamp:
+                latest_timestamp = row[0]
+        hash_file_range(score_digest, score_log_path, score_offset, consumed[0])
+        score_offset = consumed[0]
+
+    # 集計状態を更新
+    log_state["entry_log"] = {
+        "path": os.path.abspath(entry_log_path),
+        "offset": entry_offset,
+        "fingerprint": entry_digest.hexdigest(),
+    }
+    log_state["score_log"] = {
+        "path": os.path.abspath(score_log_path),
+        "offset": score_offset,
+        "fingerprint": score_digest.hexdigest(),
+    }
+    log_digests["entry_log"] = (entry_identity, entry_digest)
+    log_digests["score_log"] = (score_identity, score_digest)
+    log_state["latest_timestamp"] = latest_timestamp
+    log_state["score_data"] = score_data
+
+    return True
+
+
+def load_logs_incremental(
+    entry_log_path: str,
+    entry_log_header: str,
+    score_log_path: str,
+    score_log_header: str,
+    checkpoint_path: str,
+) -> Optional[Tuple[Dict[str, List[str]], ScoreData]]:
+    """チェックポイント以降に追記された行のみを検証･集計する
+
+    集計後にチェックポイントを更新する。
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        entry_log_header (str): エントリーファイルのヘッダー
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        checkpoint_path (str): チェックポイントファイルパス
+
+    Returns:
+        Optional[Tuple[Dict[str, List[str]], ScoreData]]:
+            エントリーデータとプレイログデータ(不正な入力の場合はNone)
+    """
+    log_state = read_checkpoint(checkpoint_path)
+    if log_state is None:
+        log_state = create_log_state()
+    else:
+        log_state["score_data"] = ScoreData.load_state(log_state["score_data"])
+
+    if not update_log_state(
+        log_state, entry_log_path, entry_log_header, score_log_path, score_log_header
+    ):
+        return None
+
+    # チェックポイントを更新
+    checkpoint = dict(log_state, score_data=log_state["score_data"].dump_state())
+    write_checkpoint(checkpoint_path, checkpoint)
+
+    return log_state["entry_data"], log_state["score_data"]
+
+
+TIME_INDEX_SUFFIX = ".timeindex"  # プレイログファイルの隣に書き込む時刻索引の拡張子
+TIME_INDEX_VERSION = 2  # 時刻索引ファイルの形式のバージョン
+TIME_INDEX_BLOCK_SIZE = 1 << 20  # 時刻索引の1ブロックあたりのバイト数
+
+
+def create_time_index() -> Dict:
+    """空の時刻索引を生成
+
+    Returns:
+        Dict: 索引済みの範囲とファイルのデバイス番号･inode番号、ブロックごとの
+            開始位置･終了位置･最小日時･最大日時･内容のハッシュ
+    """
+    return {
+        "version": TIME_INDEX_VERSION,
+        "score_log": {"path": "", "offset": 0, "identity": []},
+        "blocks": [],
+    }
+
+
+def update_time_index(
+    time_index: Dict, score_log_path: str, score_log_header: str
+) -> bool:
+    """前回索引を作った位置以降に追記された行を検証し時刻索引に反映する
+
+    プレイログファイルを行の区切りでおよそTIME_INDEX_BLOCK_SIZEごとのブロックに分け、
+    ブロックに含まれるプレイ日時の最小値と最大値、内容のハッシュを記録する。
+    ファイルが置き換えられた場合や切り詰められた場合は先頭から作り直す。索引済みの
+    範囲は読み直さず、ブロックの書き換えは読み込み時にブロックのハッシュで検出する。
+
+    Args:
+        time_index (Dict): create_time_indexで生成した時刻索引
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+
+    Returns:
+        bool: 照合結果
+    """
+    consumed = [0]
+
+    indexed_log = time_index["score_log"]
+    if not (
+        is_log_appended(score_log_path, indexed_log)
+        and indexed_log["identity"] == get_file_identity(score_log_path)
+    ):
+        time_index.update(create_time_index())
+    blocks = time_index["blocks"]
+    offset = time_index["score_log"]["offset"]
+
+    # 埋まっていない最後のブロックは追記分と合わせて作り直す
+    if blocks and blocks[-1][1] - blocks[-1][0] < TIME_INDEX_BLOCK_SIZE:
+        offset = blocks.pop()[0]
+    indexed_block_count = len(blocks)
+
+    with open(score_log_path, mode="rb") as score_file:
+        csv_reader = read_log_rows(score_file, offset, consumed)
+        if offset == 0:
+            headers = next(csv_reader, [])
+            if headers != score_log_header.split(","):
+                print(
+                    "プレイログファイルのヘッダーが正しくありません。", file=sys.stderr
+                )
+                return False
+        headers = score_log_header.split(",")
+
+        block_start = consumed[0]
+        earliest_timestamp = latest_timestamp = None
+        for row in csv_reader:
+            if not validate_score_row(row, headers):
+                return False
+            timestamp = parse_valid_timestamp(row[0])
+            if earliest_timestamp is None or timestamp < earliest_timestamp:
+                earliest_timestamp = timestamp
+            if latest_timestamp is None or timestamp > latest_timestamp:
+                latest_timestamp = timestamp
+            if consumed[0] - block_start >= TIME_INDEX_BLOCK_SIZE:
+                blocks.append(
+                    [block_start, consumed[0], earliest_timestamp, latest_timestamp]
+                )
+                block_start = consumed[0]
+                earliest_timestamp = latest_timestamp = None
+        if earliest_timestamp is not None:
+            blocks.append(
+                [block_start, consumed[0], earliest_timestamp, latest_timestamp]
+            )
+        offset = consumed[0]
+
+    # 追記分のブロックのみハッシュを記録する
+    for block in blocks[indexed_block_count:]:
+        block.append(
+            hash_file_range(
+                hashlib.sha256(), score_log_path, block[0], block[1]
+            ).hexdigest()
+        )
+    time_index["score_log"] = {
+        "path": os.path.abspath(score_log_path),
+        "offset": offset,
+        "identity": get_file_identity(score_log_path),
+    }
+
+    return True
+
+
+def load_time_index(
+    score_log_path: str, score_log_header: str, rebuild: bool = False
+) -> Optional[Dict]:
+    """プレイログファイルの時刻索引を読み込み、追記分を反映して保存する
+
+    索引ファイルがない場合や読み込めない場合は先頭から作成する。
+    索引ファイルを書き込めない場合は作成した索引をそのまま使う。
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        rebuild (bool): 索引ファイルを使わずに先頭から作り直すか
+
+    Returns:
+        Optional[Dict]: 時刻索引(不正な入力の場合はNone)
+    """
+    index_path = score_log_path + TIME_INDEX_SUFFIX
+    time_index = None
+
+    if not rebuild:
+        with contextlib.suppress(OSError, ValueError):
+            with open(index_path, mode="r", encoding="utf-8") as index_file:
+                time_index = json.load(index_file)
+    if (
+        not isinstance(time_index, dict)
+        or time_index.get("version") != TIME_INDEX_VERSION
+    ):
+        time_index = create_time_index()
+    indexed_log = time_index["score_log"]
+
+    if not update_time_index(time_index, score_log_path, score_log_header):
+        return None
+
+    # 索引が変わった場合のみ書き込む(書き込み途中のファイルは残さない)
+    if time_index["score_log"] != indexed_log:
+        temporary_path = index_path + ".tmp"
+        try:
+            with open(temporary_path, mode="w", encoding="utf-8") as index_file:
+                json.dump(time_index, index_file)
+            os.replace(temporary_path, index_path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(temporary_path)
+
+    return time_index
+
+
+def parse_time_window(
+    window_start: Optional[str], window_end: Optional[str]
+) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """集計する期間の指定をエポック秒に変換
+
+    Args:
+        window_start (Optional[str]): 期間の開始日時(この日時を含む、Noneの場合は先頭から)
+        window_end (Optional[str]): 期間の終了日時(この日時を含まない、Noneの場合は末尾まで)
+
+    Returns:
+        Optional[Tuple[Optional[int], Optional[int]]]:
+            開始日時と終了日時のエポック秒(不正な指定の場合はNone)
+    """
+    window = []
+    for create_timestamp in [window_start, window_end]:
+        if create_timestamp is None:
+            window.append(None)
+            continue
+        # 空白を含む引数を渡せない環境のため日付と時刻の"T"区切りも受け付ける
+        if len(create_timestamp) == 19 and create_timestamp[10] == "T":
+            create_timestamp = create_timestamp[:10] + " " + create_timestamp[11:]
+        timestamp = parse_timestamp(create_timestamp)
+        if timestamp is None:
+            return None
+        window.append(timestamp)
+
+    if None not in window and window[0] >= window[1]:
+        return None
+
+    return window[0], window[1]
+
+
+def read_window_blocks(
+    score_log_path: str,
+    blocks: List[List],
+    entry_data: Dict[str, List[str]],
+    window: Tuple[Optional[int], Optional[int]],
+) -> Optional[Tuple[ScoreData, int]]:
+    """時刻索引のブロックのうち期間と重なるもののみを読み込みプレイログデータを生成する
+
+    読み込んだブロックは内容のハッシュを索引と照合してから集計する。
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        blocks (List[List]): 時刻索引のブロックの一覧
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        window (Tuple[Optional[int], Optional[int]]):
+            parse_time_windowで変換した開始日時と終了日時のエポック秒
+
+    Returns:
+        Optional[Tuple[ScoreData, int]]: プレイログデータと読み込んだ行数
+            (索引を作った後に書き換えられたブロックがある場合はNone)
+    """
+    score_data = ScoreData()
+    window_start, window_end = window
+    rows_read = 0
+
+    with open(score_log_path, mode="rb") as score_file:
+        for start, end, earliest_timestamp, latest_timestamp, block_digest in blocks:
+            # 期間と重ならないブロックは読み込まない
+            if window_start is not None and latest_timestamp < window_start:
+                continue
+            if window_end is not None and earliest_timestamp >= window_end:
+                continue
+
+            score_file.seek(start)
+            block = score_file.read(end - start)
+            if hashlib.sha256(block).hexdigest() != block_digest:
+                return None
+
+            block_lines = io.StringIO(block.decode("utf-8"), newline="\n")
+            for row in csv.reader(block_lines):
+                rows_read += 1
+                timestamp = parse_valid_timestamp(row[0])
+                if window_start is not None and timestamp < window_start:
+                    continue
+                if window_end is not None and timestamp >= window_end:
+                    continue
+                add_score_row(score_data, entry_data, row)
+
+    return score_data, rows_read
+
+
+def load_score_window(
+    score_log_path: str,
+    score_log_header: str,
+    entry_data: Dict[str, List[str]],
+    window: Tuple[Optional[int], Optional[int]],
+    stats: Optional[RunStats] = None,
+) -> Optional[ScoreData]:
+    """時刻索引を使い、期間内のプレイログのみからプレイログデータを生成する
+
+    期間と重なるブロックのみを読み込み、エントリー日時より古いプレイログを
+    除外する規則は全体を集計する場合と同じものを適用する。読み込んだブロックが
+    索引を作った後に書き換えられていた場合は索引を先頭から作り直して読み込み直す。
+
+    Args:
+        score_log_path (str): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        window (Tuple[Optional[int], Optional[int]]):
+            parse_time_windowで変換した開始日時と終了日時のエポック秒
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+
+    Returns:
+        Optional[ScoreData]: プレイログデータ(不正な入力の場合はNone)
+    """
+    # 入力ファイルの存在確認
+    if not os.path.exists(score_log_path):
+        print("ゲームのプレイログファイルが存在しません。", file=sys.stderr)
+        return None
+
+    window_scores = None
+    for rebuild in (False, True):
+        time_index = load_time_index(score_log_path, score_log_header, rebuild)
+        if time_index is None:
+            return None
+        window_scores = read_window_blocks(
+            score_log_path, time_index["blocks"], entry_data, window
+        )
+        if window_scores is not None:
+            break
+    if window_scores is None:
+        print("プレイログファイルが読み込み中に変更されました。", file=sys.stderr)
+        return None
+    score_data, rows_read = window_scores
+
+    if stats is not None:
+        stats.count_rows(rows_read)
+
+    return score_data
+
+
+def select_ranking_candidates(
+    ranking_items: Iterable[Tuple[int, int, str]], ranking_threshold: int
+) -> List[Tuple[int, int, str]]:
+    """ランキング圏内に入りうるプレイヤーのみを抽出し順位順に並べる
+
+    全件をソートせず、上位ranking_threshold件のスコアをヒープで保持しながら
+    そのスコア以上のプレイヤーのみを候補として残す。閾値の順位と同点の
+    プレイヤーも候補に含まれる。
+
+    Args:
+        ranking_items (Iterable[Tuple[int, int, str]]):
+            スコア･エントリー日時･プレイヤーIDの組
+        ranking_threshold (int): 出力するランキングの閾値
+
+    Returns:
+        List[Tuple[int, int, str]]: 順位順に並べたランキング候補
+    """
+    top_scores = []  # 上位ranking_threshold件のスコア(先頭が境界スコア)
+    candidates = []
+    prune_size = max(ranking_threshold * 2, 64)  # 候補を間引く件数
+
+    if ranking_threshold <= 0:
+        return candidates
+
+    for item in ranking_items:
+        score = item[0]
+        if len(top_scores) < ranking_threshold:
+            heapq.heappush(top_scores, score)
+        elif score >= top_scores[0]:
+            heapq.heappushpop(top_scores, score)
+        else:
+            # 境界スコア未満のプレイヤーはランキング圏外
+            continue
+        candidates.append(item)
+
+        # 境界スコアを下回った候補を間引く
+        if len(candidates) > prune_size:
+            boundary_score = top_scores[0]
+            candidates = [item for item in candidates if item[0] >= boundary_score]
+            # 同点が多い場合に間引きを繰り返さないよう間隔を広げる
+            prune_size = max(prune_size, len(candidates) * 2)
+
+    if not candidates:
+        return candidates
+
+    # スコア降順、エントリー日時昇順、プレイヤーID昇順
+    boundary_score = top_scores[0]
+    candidates = [item for item in candidates if item[0] >= boundary_score]
+    candidates.sort(key=lambda item: (-item[0], item[1], item[2]))
+
+    return candidates
+
+
+def update_ranking_candidates(
+    ranking_candidates: List[Tuple[int, int, str]],
+    score_data: ScoreData,
+    updated_players: Iterable[str],
+    aggregate_mode: str,
+    lowest_play_times: int,
+    ranking_threshold: int,
+) -> List[Tuple[int, int, str]]:
+    """プレイログの追記で集計値が変わったプレイヤーのみを反映してランキング候補を更新
+
+    候補外のプレイヤーは境界スコア未満のため、候補だったプレイヤーのスコアが
+    境界スコアを下回らない限り、候補と更新されたプレイヤーのみから選び直せば
+    全件から選んだ結果と一致する。下回った場合(averageでのみ起こる)は全件から選び直す。
+
+    Args:
+        ranking_candidates (List[Tuple[int, int, str]]): 更新前のランキング候補
+        score_data (ScoreData): 更新後のプレイログデータ
+        updated_players (Iterable[str]): 集計値が変わったプレイヤーID
+        aggregate_mode (str): 集計モードを表す文字列
+        lowest_play_times (int): average･median･p90集計時の最低プレイ回数
+        ranking_threshold (int): 出力するランキングの閾値
+
+    Returns:
+        List[Tuple[int, int, str]]: 順位順に並べたランキング候補
+    """
+    updated_players = set(updated_players)
+    updated_items = []
+
+    for player_id in updated_players:
+        item = score_data.get_ranking_item(player_id, aggregate_mode, lowest_play_times)
+        if item is not None:
+            updated_items.append(item)
+
+    # 候補のスコアが境界スコアを下回った場合は全件から選び直す
+    if ranking_candidates:
+        boundary_score = ranking_candidates[-1][0]
+        updated_scores = {item[2]: item[0] for item in updated_items}
+        for _, _, player_id in ranking_candidates:
+            if updated_scores.get(player_id, boundary_score) < boundary_score:
+                return select_ranking_candidates(
+                    score_data.iterate_ranking_items(aggregate_mode, lowest_play_times),
+                    ranking_threshold,
+                )
+
+    unchanged_candidates = (
+        item for item in ranking_candidates if item[2] not in updated_players
+    )
+    return select_ranking_candidates(
+        itertools.chain(unchanged_candidates, updated_items), ranking_threshold
+    )
+
+
+LEADERBOARD_BLOCK_SIZE = 512  # 順位表の1ブロックに保持するプレイヤー数の目安
+
+
+class Leaderboard:
+    """ランキング対象の全プレイヤーを順位順に保持し、任意の順位を引ける順位表
+
+    (-スコア, エントリー日時, プレイヤーID)のキーをソート済みのブロックに分けて保持し、
+    ブロックごとの件数をFenwick木で管理する順序統計構造。プレイヤーの更新と、
+    プレイヤーの順位･指定位置からの列挙をO(log n)(ブロック内の挿入･削除を除く)で行う。
+    順位はbuild_ranking_dataと同じく、同点のプレイヤーが同じ順位になる競技順位とする。
+    """
+
+    __slots__ = ("keys", "blocks", "block_maxes", "block_counts")
+
+    def __init__(self, ranking_items: Iterable[Tuple[int, int, str]] = ()):
+        """
+        Args:
+            ranking_items (Iterable[Tuple[int, int, str]]):
+                スコア･エントリー日時･プレイヤーIDの組
+        """
+        self.keys = {}  # プレイヤーIDとキーの対応
+        for score, entry_time, player_id in ranking_items:
+            self.keys[player_id] = (-score, entry_time, player_id)
+
+        sorted_keys = sorted(self.keys.values())
+        self.blocks = [
+            sorted_keys[start : start + LEADERBOARD_BLOCK_SIZE]
+            for start in range(0, len(sorted_keys), LEADERBOARD_BLOCK_SIZE)
+        ]
+        self._rebuild_index()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _rebuild_index(self):
+        """ブロックの分割･削除後にブロックの末尾キーとFenwick木を作り直す"""
+        self.block_maxes = [block[-1] for block in self.blocks]
+        self.block_counts = [0] * (len(self.blocks) + 1)  # 1始まりのFenwick木
+        for index, block in enumerate(self.blocks, 1):
+            self.block_counts[index] += len(block)
+            parent = index + (index & -index)
+            if parent <= len(self.blocks):
+                self.block_counts[parent] += self.block_counts[index]
+
+    def _add_count(self, block_index: int, count: int):
+        """ブロックの件数の増減をFenwick木に反映"""
+        index = block_index + 1
+        while index < len(self.block_counts):
+            self.block_counts[index] += count
+            index += index & -index
+
+    def _count_before_block(self, block_index: int) -> int:
+        """指定したブロックより前のブロックに含まれる件数"""
+        count = 0
+        index = block_index
+        while index > 0:
+            count += self.block_counts[index]
+            index -= index & -index
+        return count
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """先頭からの位置をブロックの位置とブロック内の位置に変換"""
+        block_index = 0
+        remaining = position
+        step = 1 << (len(self.block_counts) - 1).bit_length()
+        while step:
+            next_index = block_index + step
+            if (
+                next_index < len(self.block_counts)
+                and self.block_counts[next_index] <= remaining
+            ):
+                block_index = next_index
+                remaining -= self.block_counts[next_index]
+            step >>= 1
+        return block_index, remaining
+
+    def _insert(self, key: Tuple[int, int, str]):
+        if not self.blocks:
+            self.blocks.append([key])
+            self._rebuild_index()
+            return
+
+        block_index = min(
+            bisect.bisect_left(self.block_maxes, key), len(self.blocks) - 1
+        )
+        block = self.blocks[block_index]
+        bisect.insort(block, key)
+        self.block_maxes[block_index] = block[-1]
+        self._add_count(block_index, 1)
+
+        # 大きくなりすぎたブロックは分割する
+        if len(block) > LEADERBOARD_BLOCK_SIZE * 2:
+            self.blocks[block_index : block_index + 1] = [
+                block[:LEADERBOARD_BLOCK_SIZE],
+                block[LEADERBOARD_BLOCK_SIZE:],
+            ]
+            self._rebuild_index()
+
+    def _remove(self, key: Tuple[int, int, str]):
+        block_index = bisect.bisect_left(self.block_maxes, key)
+        block = self.blocks[block_index]
+        del block[bisect.bisect_left(block, key)]
+
+        if not block:
+            del self.blocks[block_index]
+            self._rebuild_index()
+            return
+        self.block_maxes[block_index] = block[-1]
+        self._add_count(block_index, -1)
+
+    def update(self, player_id: str, ranking_item: Optional[Tuple[int, int, str]]):
+        """プレイヤーの集計値の変更を反映
+
+        Args:
+            player_id (str): プレイヤーID
+            ranking_item (Optional[Tuple[int, int, str]]):
+                スコア･エントリー日時･プレイヤーIDの組(ランキング対象外になった場合はNone)
+        """
+        previous_key = self.keys.pop(player_id, None)
+        if previous_key is not None:
+            self._remove(previous_key)
+        if ranking_item is not None:
+            key = (-ranking_item[0], ranking_item[1], player_id)
+            self.keys[player_id] = key
+            self._insert(key)
+
+    def count_before(self, key: Tuple) -> int:
+        """キーより前に並ぶプレイヤー数を算出
+
+        Args:
+            key (Tuple): (-スコア, エントリー日時, プレイヤーID)またはその先頭部分
+
+        Returns:
+            int: プレイヤー数
+        """
+        block_index = bisect.bisect_left(self.block_maxes, key)
+        if block_index == len(self.blocks):
+            return len(self.keys)
+
+        return self._count_before_block(block_index) + bisect.bisect_left(
+            self.blocks[block_index], key
+        )
+
+    def get_ranked_item(
+        self, player_id: str
+    ) -> Optional[Tuple[int, Tuple[int, int, str]]]:
+        """プレイヤーの順位と(スコア, エントリー日時, プレイヤーID)を取得
+
+        Args:
+            player_id (str): プレイヤーID
+
+        Returns:
+            Optional[Tuple[int, Tuple[int, int, str]]]:
+                順位とスコア･エントリー日時･プレイヤーIDの組(ランキング対象外の場合はNone)
+        """
+        key = self.keys.get(player_id)
+        if key is None:
+            return None
+
+        # スコアが上回るプレイヤー数+1が順位
+        return self.count_before((key[0],)) + 1, (-key[0], key[1], key[2])
+
+    def iterate_ranked_items(
+        self, offset: int, limit: int
+    ) -> Iterable[Tuple[int, Tuple[int, int, str]]]:
+        """順位順で指定位置から指定件数のプレイヤーを順位付きで列挙
+
+        Args:
+            offset (int): 先頭から読み飛ばす件数
+            limit (int): 列挙する件数
+
+        Yields:
+            Tuple[int, Tuple[int, int, str]]:
+                順位とスコア･エントリー日時･プレイヤーIDの組
+        """
+        if offset >= len(self.keys) or limit <= 0:
+            return
+
+        block_index, local_index = self._locate(offset)
+        keys = itertools.chain(
+            self.blocks[block_index][local_index:],
+            itertools.chain.from_iterable(
+                itertools.islice(self.blocks, block_index + 1, None)
+            ),
+        )
+
+        previous_score = None
+        for position, key in enumerate(itertools.islice(keys, limit), offset):
+            # スコアが変わっている場合は順位を変更(先頭は同点のプレイヤー数から算出)
+            if key[0] != previous_score:
+                rank = (
+                    position + 1
+                    if previous_score is not None
+                    else self.count_before((key[0],)) + 1
+                )
+                previous_score = key[0]
+            yield rank, (-key[0], key[1], key[2])
+
+
+def build_leaderboard_data(
+    entry_data: Dict[str, List[str]],
+    leaderboard: Leaderboard,
+    lookup: Tuple[Optional[str], int, int],
+) -> List[List[str]]:
+    """順位表からプレイヤー1人分または指定範囲のランキングデータを作成する
+
+    Args:
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        leaderboard (Leaderboard): 順位表
+        lookup (Tuple[Optional[str], int, int]):
+            プレイヤーID(Noneの場合は範囲を出力)･先頭から読み飛ばす件数･出力する件数
+
+    Returns:
+        List[List[str]]: ランキングデータ
+    """
+    ranking_data = []
+    ranking_data_header = "rank,player_id,handle_name,score"
+    player_id, offset, limit = lookup
+
+    # ヘッダーを追加
+    ranking_data.append(ranking_data_header.split(","))
+
+    if player_id is not None:
+        ranked_item = leaderboard.get_ranked_item(player_id)
+        if ranked_item is None:
+            print("指定されたプレイヤーはランキングの対象外です。", file=sys.stderr)
+            return ranking_data
+        ranked_items = [ranked_item]
+    else:
+        ranked_items = leaderboard.iterate_ranked_items(offset, limit)
+
+    for rank, (score, _, ranked_player_id) in ranked_items:
+        handle_name = entry_data[ranked_player_id][1]
+        ranking_data.append([rank, ranked_player_id, handle_name, score])
+
+    return ranking_data
+
+
+def build_ranking_data(
+    entry_data: Dict[str, List[str]],
+    ranking_candidates: Iterable[Tuple[int, int, str]],
+    ranking_threshold: int,
+) -> List[List[str]]:
+    """順位順に並べたランキング候補からランキングデータを作成する
+
+    Args:
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        ranking_candidates (Iterable[Tuple[int, int, str]]): 順位順のランキング候補
+        ranking_threshold (int): 出力するランキングの閾値
+
+    Returns:
+        List[List[str]]: ランキングデータ
+    """
+    ranking_data = []
+    rank = 0
+    previous_score = None
+    ranking_data_header = "rank,player_id,handle_name,score"
+
+    # ヘッダーを追加
+    ranking_data.append(ranking_data_header.split(","))
+
+    # 集計データを基にランキングデータ生成
+    for score, _, player_id in ranking_candidates:
+        rank += 1
+
+        # スコアが変わっている場合は順位を変更
+        if score != previous_score:
+            print_rank = rank
+
+        # ランキング圏外は処理しない
+        if print_rank > ranking_threshold:
+            break
+
+        # ランキングデータに格納
+        handle_name = entry_data[player_id][1]
+        ranking_data.append([print_rank, player_id, handle_name, score])
+        previous_score = score
+
+    return ranking_data
+
+
+def extract_ranking_data(
+    entry_data: Dict[str, List[str]],
+    score_data: ScoreData,
+    aggregate_mode: str,
+    lowest_play_times: int,
+    ranking_threshold: int,
+) -> List[List[str]]:
+    """ランキングデータを作成する
+
+    Args:
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        score_data (ScoreData): プレイログデータ
+        aggregate_mode (str): 集計モードを表す文字列
+        lowest_play_times (int): average･median･p90集計時の最低プレイ回数
+        ranking_threshold (int): 出力するランキングの閾値
+
+    Returns:
+        List[List[str]]: ランキングデータ
+    """
+    # ランキング集計(スコア降順、エントリー日時昇順、プレイヤーID昇順)
+    ranking_candidates = select_ranking_candidates(
+        score_data.iterate_ranking_items(aggregate_mode, lowest_play_times),
+        ranking_threshold,
+    )
+
+    return build_ranking_data(entry_data, ranking_candidates, ranking_threshold)
+
+
+def output_ranking_data(ranking_data: Dict[str, List[str]], output_file=None):
+    """ランキングデータを標準出力
+
+    Args:
+        ranking_data (Dict[str,List[str]]): ランキングデータ
+        output_file: 出力先のファイル(Noneの場合は標準出力)
+    """
+    # 配列をCSV形式で出力
+    for output_data in ranking_data:
+        print(",".join(map(str, output_data)), file=output_file)
+
+
+EXPORT_FORMATS = ["csv", "jsonl"]  # エクスポートの出力形式
+EXPORT_BATCH_SIZE = 10000  # エクスポート時にまとめて書き込む行数
+EXPORT_SORT_RUN_SIZE = 100000  # 全件のエクスポート時に一度に並べ替えるプレイヤー数
+
+
+def read_ranking_run(run_file, player_ids: List[str]) -> Iterable[Tuple[int, int, str]]:
+    """並べ替え済みの一時ファイルから(スコア, エントリー日時, プレイヤーID)を順に読み込む
+
+    Args:
+        run_file: sort_ranking_itemsが書き込んだ一時ファイル
+        player_ids (List[str]): 連番とプレイヤーIDの対応
+
+    Yields:
+        Tuple[int, int, str]: スコア･エントリー日時･プレイヤーIDの組
+    """
+    for line in run_file:
+        score, entry_time, player_index = line.split(",")
+        yield int(score), int(entry_time), player_ids[int(player_index)]
+
+
+def sort_ranking_items(
+    ranking_items: Iterable[Tuple[int, int, str]], score_data: ScoreData
+) -> Iterable[Tuple[int, int, str]]:
+    """(スコア, エントリー日時, プレイヤーID)を全件保持せずに順位順に並べる
+
+    EXPORT_SORT_RUN_SIZE件(分割ファイル数がSPILL_MAX_PARTITIONSを超える場合は
+    それ以上)ずつ並べ替えて一時ディレクトリ(環境変数TMPDIRで変更可)に書き出し、
+    heapq.mergeで統合する。プレイヤーIDは連番で書き出す。全件が1回分に収まる
+    場合は一時ファイルを作らない。
+
+    Args:
+        ranking_items (Iterable[Tuple[int, int, str]]):
+            スコア･エントリー日時･プレイヤーIDの組
+        score_data (ScoreData): ranking_itemsを列挙したプレイログデータ
+
+    Yields:
+        Tuple[int, int, str]: 順位順のスコア･エントリー日時･プレイヤーIDの組
+    """
+
+    def ranking_key(item):
+        # スコア降順、エントリー日時昇順、プレイヤーID昇順
+        return -item[0], item[1], item[2]
+
+    ranking_items = iter(ranking_items)
+    run_size = max(EXPORT_SORT_RUN_SIZE, -(-len(score_data) // SPILL_MAX_PARTITIONS))
+    run = sorted(itertools.islice(ranking_items, run_size), key=ranking_key)
+    if len(run) < run_size:
+        yield from run
+        return
+
+    with tempfile.TemporaryDirectory(prefix="ranking_spill_") as spill_dir:
+        run_paths = []
+        while run:
+            run_path = os.path.join(spill_dir, f"run_{len(run_paths)}.csv")
+            with open(run_path, mode="w", encoding="utf-8") as run_file:
+                for start in range(0, len(run), SPILL_WRITE_BATCH_SIZE):
+                    run_file.write(
+                        "".join(
+                            f"{score},{entry_time},"
+                            f"{score_data.player_indexes[player_id]}\n"
+                            for score, entry_time, player_id in run[
+                                start : start + SPILL_WRITE_BATCH_SIZE
+                            ]
+                        )
+                    )
+            run_paths.append(run_path)
+            run = sorted(itertools.islice(ranking_items, run_size), key=ranking_key)
+
+        with contextlib.ExitStack() as stack:
+            runs = [
+                read_ranking_run(
+                    stack.enter_context(open(run_path, mode="r", encoding="utf-8")),
+                    score_data.player_ids,
+                )
+                for run_path in run_paths
+            ]
+            yield from heapq.merge(*runs, key=ranking_key)
+
+
+def iterate_ranking_rows(
+    entry_data: Dict[str, List[str]],
+    score_data: ScoreData,
+    aggregate_mode: str,
+    lowest_play_times: int,
+    ranking_threshold: Optional[int] = None,
+) -> Iterable[Tuple[int, str, str, int]]:
+    """ランキングを順位順に1行ずつ生成する
+
+    閾値を指定した場合はselect_ranking_candidatesで閾値までの候補のみを保持し、
+    全件の場合はsort_ranking_itemsで一時ファイルに分けて並べ替えるため、
+    ランキング全体をメモリ上に保持しない。
+
+    Args:
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        score_data (ScoreData): プレイログデータ
+        aggregate_mode (str): 集計モードを表す文字列
+        lowest_play_times (int): average･median･p90集計時の最低プレイ回数
+        ranking_threshold (Optional[int]): 出力するランキングの閾値(Noneの場合は全件)
+
+    Yields:
+        Tuple[int, str, str, int]: 順位･プレイヤーID･ハンドルネーム･スコア
+    """
+    ranking_items = score_data.iterate_ranking_items(aggregate_mode, lowest_play_times)
+    if ranking_threshold is None:
+        ordered_items = sort_ranking_items(ranking_items, score_data)
+    else:
+        ordered_items = select_ranking_candidates(ranking_items, ranking_threshold)
+
+    previous_score = None
+    for rank, (score, _, player_id) in enumerate(ordered_items, 1):
+        # スコアが変わっている場合は順位を変更
+        if score != previous_score:
+            print_rank = rank
+            previous_score = score
+
+        # ランキング圏外は処理しない
+        if ranking_threshold is not None and print_rank > ranking_threshold:
+            break
+
+        yield print_rank, player_id, entry_data[player_id][1], score
+
+
+def write_ranking_rows(
+    ranking_rows: Iterable[Tuple[int, str, str, int]],
+    output_file,
+    export_format: str,
+) -> int:
+    """ランキングの行をEXPORT_BATCH_SIZE行ずつまとめてファイルに書き込む
+
+    Args:
+        ranking_rows (Iterable[Tuple[int, str, str, int]]):
+            順位･プレイヤーID･ハンドルネーム･スコア
+        output_file: 出力先のファイル
+        export_format (str): 出力形式(csv/jsonl)
+
+    Returns:
+        int: 書き込んだ行数(ヘッダーを除く)
+    """
+    row_count = 0
+    lines = []
+    encode_string = json.JSONEncoder(ensure_ascii=False).encode
+
+    if export_format == "csv":
+        lines.append("rank,player_id,handle_name,score\n")
+
+    for rank, player_id, handle_name, score in ranking_rows:
+        if export_format == "csv":
+            lines.append(f"{rank},{player_id},{handle_name},{score}\n")
+        else:
+            # 行ごとに辞書を作らず、文字列の値のみJSONとしてエスケープする
+            lines.append(
+                f'{{"rank": {rank}, "player_id": {encode_string(player_id)}, '
+                f'"handle_name": {encode_string(handle_name)}, "score": {score}}}\n'
+            )
+        row_count += 1
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            output_file.write("".join(lines))
+            lines.clear()
+    output_file.write("".join(lines))
+
+    return row_count
+
+
+class RankingEngine:
+    """エントリーデータとプレイログデータをメモリに保持し続けるランキング集計器
+
+    ファイルや行の列から一度だけ読み込み、以降はadd_entry･add_scoreで追加された
+    行を集計値に反映する。上位のランキングは(集計モード, 最低プレイ回数)ごとに
+    前回選んだランキング候補を保持し、追加で集計値が変わったプレイヤーのみを
+    update_ranking_candidatesで反映するため、2回目以降はプレイヤー数ではなく
+    閾値と集計値が変わったプレイヤー数に比例する時間で返す。順位や範囲の指定は
+    順位表(Leaderboard)を同様に更新して引く。不正な入力はRankingErrorの
+    派生クラスの例外として送出する。
+
+    ファイルから読み込む場合と同じく、エントリーしていないプレイヤーのプレイと
+    エントリー日時より古いプレイは集計しない。後からエントリーしたプレイヤーの
+    それ以前に追加されたプレイは集計されない。median/p90を集計する場合は
+    track_histogramsを指定してスコアのヒストグラムも保持する。
+    """
+
+    def __init__(
+        self,
+        entry_data: Optional[Dict[str, List[str]]] = None,
+        score_data: Optional[ScoreData] = None,
+        track_histograms: bool = False,
+    ):
+        """
+        Args:
+            entry_data (Optional[Dict[str, List[str]]]): エントリーデータ
+                (Noneの場合は空)
+            score_data (Optional[ScoreData]): entry_dataを基に集計したプレイログデータ
+                (Noneの場合は空)
+            track_histograms (bool): 空のプレイログデータでmedian/p90用の
+                ヒストグラムも保持するか
+        """
+        self.entry_data = entry_data if entry_data is not None else {}
+        self.score_data = (
+            score_data if score_data is not None else ScoreData(track_histograms)
+        )
+        # (集計モード, 最低プレイ回数)ごとの(閾値, ランキング候補)･順位表･
+        # 未反映のプレイヤーID
+        self._ranking_candidates = {}
+        self._leaderboards = {}
+        self._updated_players = {}
+
+    @classmethod
+    def from_logs(
+        cls,
+        entry_log_path: str,
+        score_log_path: str,
+        engine: str = "python",
+        use_cache: bool = False,
+        stats: Optional[RunStats] = None,
+        track_histograms: bool = False,
+        concurrent_load: bool = False,
+    ) -> "RankingEngine":
+        """エントリーファイルとプレイログファイルを読み込む
+
+        Args:
+            entry_log_path (str): エントリーファイルパス
+            score_log_path (str): プレイログファイルパス
+            engine (str): プレイログの集計エンジン(python/numpy)
+            use_cache (bool): 入力ファイルのキャッシュファイルを利用するか
+            stats (Optional[RunStats]): 読み込みのフェーズを記録する実行統計
+            track_histograms (bool): median/p90用のヒストグラムも集計するか
+                (pythonエンジンのみ)
+            concurrent_load (bool): 2つの入力ファイルをread_logs_concurrentlyで
+                並行して読み込むか(キャッシュを使わないpythonエンジンのみ)
+
+        Returns:
+            RankingEngine: 読み込んだデータを保持する集計器
+
+        Raises:
+            RankingError: 同時に利用できない指定を含む場合
+            LogNotFoundError: 入力ファイルが存在しない場合
+            InvalidLogError: 入力ファイルが不正な場合
+        """
+        # CLIと同じ検証を、ヒストグラムの有無に応じた集計モードとして行う
+        validate_ranking_options(
+            RankingOptions(
+                "median" if track_histograms else "highscore",
+                entry_log_path,
+                score_log_path,
+                engine=engine,
+                use_cache=use_cache,
+                concurrent_load=concurrent_load,
+            )
+        )
+        measure = (
+            stats.measure if stats is not None else lambda _: contextlib.nullcontext()
+        )
+        if concurrent_load:
+            with measure("load_logs_concurrently"):
+                return cls(
+                    *read_logs_concurrently(
+                        entry_log_path,
+                        ENTRY_LOG_HEADER,
+                        score_log_path,
+                        SCORE_LOG_HEADER,
+                        stats,
+                        track_histograms,
+                    )
+                )
+
+        with measure("load_entry_log"):
+            entry_data = read_entry_log(
+                entry_log_path, ENTRY_LOG_HEADER, use_cache, stats
+            )
+        with measure("load_score_log"):
+            score_data = read_score_log(
+                score_log_path,
+                SCORE_LOG_HEADER,
+                entry_data,
+                engine,
+                use_cache,
+                stats,
+                track_histograms,
+            )
+
+        return cls(entry_data, score_data)
+
+    @classmethod
+    def from_rows(
+        cls,
+        entry_rows: Iterable[List[str]],
+        score_rows: Iterable[List[str]],
+        track_histograms: bool = False,
+    ) -> "RankingEngine":
+        """ヘッダーを除いたエントリーファイル･プレイログファイルの行の列から読み込む
+
+        Args:
+            entry_rows (Iterable[List[str]]): create_timestamp･player_id･handle_nameの行
+            score_rows (Iterable[List[str]]): create_timestamp･player_id･scoreの行
+            track_histograms (bool): median/p90用のヒストグラムも集計するか
+
+        Returns:
+            RankingEngine: 読み込んだデータを保持する集計器
+
+        Raises:
+            InvalidLogError: 不正な行が含まれる場合
+        """
+        ranking_engine = cls(track_histograms=track_histograms)
+        for row in entry_rows:
+            ranking_engine.add_entry(*row)
+        for row in score_rows:
+            ranking_engine.add_score(*row)
+
+        return ranking_engine
+
+    def add_entry(self, create_timestamp: str, player_id: str, handle_name: str):
+        """エントリーを1件追加する
+
+        既にエントリーしているプレイヤーはハンドルネームのみ更新する。
+
+        Args:
+            create_timestamp (str): エントリー日時(YYYY-MM-DD HH:MM:SS)
+            player_id (str): プレイヤーID
+            handle_name (str): ハンドルネーム
+
+        Raises:
+            InvalidLogError: 仕様と異なる値が含まれる場合
+        """
+        row = [create_timestamp, player_id, handle_name]
+        error_message = check_entry_row(row, ENTRY_LOG_HEADER.split(","))
+        if error_message is not None:
+            raise InvalidLogError(error_message)
+
+        add_entry_row(self.entry_data, row)
+
+    def add_score(self, create_timestamp: str, player_id: str, score: Union[int, str]):
+        """プレイを1件追加する
+
+        Args:
+            create_timestamp (str): プレイ日時(YYYY-MM-DD HH:MM:SS)
+            player_id (str): プレイヤーID
+            score (Union[int, str]): スコア(0以上の整数)
+
+        Raises:
+            InvalidLogError: 仕様と異なる値が含まれる場合
+        """
+        row = [create_timestamp, player_id, str(score)]
+        error_message = check_score_row(row, SCORE_LOG_HEADER.split(","))
+        if error_message is not None:
+            raise InvalidLogError(error_message)
+
+        # 集計値のあるプレイヤーを保持中のランキング候補･順位表に未反映として記録
+        add_score_row(self.score_data, self.entry_data, row)
+        if player_id in self.score_data:
+            for updated_players in self._updated_players.values():
+                updated_players.add(player_id)
+
+    def ranking(
+        self,
+        aggregate_mode: str,
+        ranking_threshold: int = RANKING_THRESHOLD,
+        lowest_play_times: int = LOWEST_PLAY_TIMES,
+    ) -> List[List[str]]:
+        """上位のランキングデータを作成する
+
+        保持中のランキング候補の閾値が指定された閾値以上であれば候補を更新して
+        切り出し、そうでなければ全プレイヤーから選び直して保持する。
+
+        Args:
+            aggregate_mode (str): 集計モードを表す文字列
+            ranking_threshold (int): 出力するランキングの閾値
+            lowest_play_times (int): average･median･p90集計時の最低プレイ回数
+
+        Returns:
+            List[List[str]]: ランキングデータ
+
+        Raises:
+            RankingError: 不正な集計モードが指定された場合や、ヒストグラムを
+                保持せずにmedian/p90が指定された場合
+        """
+        key = self._refresh(aggregate_mode, lowest_play_times)
+        candidates_threshold, ranking_candidates = self._ranking_candidates.get(
+            key, (-1, [])
+        )
+        if candidates_threshold < ranking_threshold:
+            ranking_candidates = select_ranking_candidates(
+                self.score_data.iterate_ranking_items(*key), ranking_threshold
+            )
+            self._ranking_candidates[key] = (ranking_threshold, ranking_candidates)
+            self._updated_players.setdefault(key, set())
+
+        return build_ranking_data(
+            self.entry_data, ranking_candidates, ranking_threshold
+        )
+
+    def lookup(
+        self,
+        aggregate_mode: str,
+        player_id: Optional[str] = None,
+        offset: int = 0,
+        limit: int = RANKING_THRESHOLD,
+        lowest_play_times: int = LOWEST_PLAY_TIMES,
+    ) -> List[List[str]]:
+        """プレイヤー1人分または指定範囲のランキングデータを順位表から作成する
+
+        Args:
+            aggregate_mode (str): 集計モードを表す文字列
+            player_id (Optional[str]): 順位を引くプレイヤーID(Noneの場合は範囲を引く)
+            offset (int): 順位順に先頭から読み飛ばす件数
+            limit (int): offsetから出力する件数
+            lowest_play_times (int): average･median･p90集計時の最低プレイ回数
+
+        Returns:
+            List[List[str]]: ランキングデータ
+
+        Raises:
+            RankingError: 不正な集計モードや負の件数が指定された場合や、
+                ヒストグラムを保持せずにmedian/p90が指定された場合
+        """
+        check_lookup_range(offset, limit)
+        key = self._refresh(aggregate_mode, lowest_play_times)
+        leaderboard = self._leaderboards.get(key)
+        if leaderboard is None:
+            leaderboard = Leaderboard(self.score_data.iterate_ranking_items(*key))
+            self._leaderboards[key] = leaderboard
+            self._updated_players.setdefault(key, set())
+
+        return build_leaderboard_data(
+            self.entry_data, leaderboard, (player_id, offset, limit)
+        )
+
+    def _refresh(self, aggregate_mode: str, lowest_play_times: int) -> Tuple[str, int]:
+        """未反映のプレイヤーを保持中のランキング候補と順位表に反映する
+
+        Args:
+            aggregate_mode (str): 集計モードを表す文字列
+            lowest_play_times (int): average･median･p90集計時の最低プレイ回数
+
+        Returns:
+            Tuple[str, int]: (集計モード, 最低プレイ回数)
+                (highscoreは最低プレイ回数によらないため0)
+
+        Raises:
+            RankingError: 不正な集計モードが指定された場合
+        """
+        if aggregate_mode not in AGGREGATE_MODES:
+            raise RankingError("不正な集計モードが指定されています。")
+        if aggregate_mode == "highscore":
+            lowest_play_times = 0
+        key = (aggregate_mode, lowest_play_times)
+
+        updated_players = self._updated_players.get(key)
+        if not updated_players:
+            return key
+
+        if key in self._ranking_candidates:
+            ranking_threshold, ranking_candidates = self._ranking_candidates[key]
+            self._ranking_candidates[key] = (
+                ranking_threshold,
+                update_ranking_candidates(
+                    ranking_candidates,
+                    self.score_data,
+                    updated_players,
+                    aggregate_mode,
+                    lowest_play_times,
+                    ranking_threshold,
+                ),
+            )
+        if key in self._leaderboards:
+            leaderboard = self._leaderboards[key]
+            for player_id in updated_players:
+                leaderboard.update(
+                    player_id,
+                    self.score_data.get_ranking_item(
+                        player_id, aggregate_mode, lowest_play_times
+                    ),
+                )
+        updated_players.clear()
+
+        return key
+
+
+SPILL_MEMORY_FACTOR = 8  # エントリーファイル1バイトあたりの集計時のメモリ使用量の目安
+SPILL_COMPRESSION_RATIO = 8  # 圧縮されたエントリーファイルの展開後のサイズの目安(倍)
+SPILL_MAX_PARTITIONS = 256  # 同時に開く分割ファイル数の上限
+SPILL_WRITE_BATCH_SIZE = 1000  # 分割ファイルごとにまとめて書き込む行数
+MEMORY_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}  # 単位と倍率
+
+
+def parse_memory_size(memory_size: str) -> Optional[int]:
+    """512M･2Gなどのメモリサイズの指定をバイト数に変換
+
+    Args:
+        memory_size (str): 数値と単位(K/M/G、省略時はバイト)
+
+    Returns:
+        Optional[int]: バイト数(不正な指定の場合はNone)
+    """
+    match = re.fullmatch(r"(\d+)([KMG]?)B?", memory_size.strip().upper())
+    if match is None or int(match[1]) == 0:
+        return None
+    return int(match[1]) * MEMORY_SIZE_UNITS[match[2]]
+
+
+def count_spill_partitions(entry_log_path: str, memory_budget: int) -> int:
+    """1つの分割ファイルの集計がメモリの上限に収まる分割数を見積もる
+
+    集計時のメモリ使用量はプレイヤー数、つまりエントリーファイルのサイズに比例する。
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        memory_budget (int): 集計に使うメモリの上限(バイト)
+
+    Returns:
+        int: 分割数
+    """
+    entry_log_size = os.path.getsize(entry_log_path)
+    if detect_compression(entry_log_path) is not None:
+        entry_log_size *= SPILL_COMPRESSION_RATIO
+    partition_count = -(-entry_log_size * SPILL_MEMORY_FACTOR // memory_budget)
+    return min(max(partition_count, 1), SPILL_MAX_PARTITIONS)
+
+
+def partition_log(
+    log_path: str,
+    log_header: str,
+    validate_row,
+    partition_files: List,
+    stats: Optional[RunStats] = None,
+) -> bool:
+    """入力ファイルを検証しながらプレイヤーIDのハッシュ値で分割ファイルに振り分ける
+
+    同じプレイヤーの行は同じ分割ファイルに元の順序のまま書き込まれる。
+    hash()の値はプロセスごとに異なるため、同じ実行の中でのみ分割先が一致する。
+
+    Args:
+        log_path (str): 入力ファイルパス
+        log_header (str): 入力ファイルのヘッダー
+        validate_row: 1行を検証する関数(validate_entry_row/validate_score_row)
+        partition_files (List): 書き込み先の分割ファイル
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+
+    Returns:
+        bool: 照合結果
+    """
+    log_name = (
+        "エントリーファイル" if log_header == ENTRY_LOG_HEADER else "プレイログファイル"
+    )
+    partition_count = len(partition_files)
+    partition_lines = [[] for _ in partition_files]
+
+    if not os.path.exists(log_path):
+        print(f"ゲームの{log_name}が存在しません。", file=sys.stderr)
+        return False
+
+    try:
+        with open_log(log_path) as log_file:
+            csv_rows = iterate_csv_rows(log_file)
+            headers = next(csv_rows)
+            row_count = 0
+            if headers != log_header.split(","):
+                print(f"{log_name}のヘッダーが正しくありません。", file=sys.stderr)
+                return False
+
+            for row_count, row in enumerate(csv_rows, 1):
+                if not validate_row(row, headers):
+                    if stats is not None:
+                        stats.count_rows(row_count, 1)
+                    return False
+                partition = hash(row[1]) % partition_count
+                lines = partition_lines[partition]
+                lines.append(",".join(row))
+                if len(lines) >= SPILL_WRITE_BATCH_SIZE:
+                    partition_files[partition].write("\n".join(lines) + "\n")
+                    lines.clear()
+    except LogDecompressionError:
+        print(f"{log_name}を展開できません。", file=sys.stderr)
+        return False
+
+    for partition_file, lines in zip(partition_files, partition_lines):
+        if lines:
+            partition_file.write("\n".join(lines) + "\n")
+    if stats is not None:
+        stats.count_rows(row_count)
+
+    return True
+
+
+def partition_logs(
+    entry_log_path: str,
+    entry_log_header: str,
+    score_log_paths: List[str],
+    score_log_header: str,
+    spill_dir: str,
+    partition_count: int,
+    stats: RunStats,
+) -> Optional[List[Tuple[str, str]]]:
+    """エントリーファイルとプレイログファイルをプレイヤーIDで分割ファイルに振り分ける
+
+    分割ファイルにはヘッダーを書き込むため、generate_entry_data･
+    generate_score_dataでそのまま読み込める。
+
+    Args:
+        entry_log_path (str): エントリーファイルパス
+        entry_log_header (str): エントリーファイルのヘッダー
+        score_log_paths (List[str]): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        spill_dir (str): 分割ファイルを書き込むディレクトリ
+        partition_count (int): 分割数
+        stats (RunStats): フェーズごとの実行統計
+
+    Returns:
+        Optional[List[Tuple[str, str]]]: 分割ごとのエントリーファイルと
+            プレイログファイルのパス(不正な入力の場合はNone)
+    """
+    partition_paths = [
+        (
+            os.path.join(spill_dir, f"entry_{index}.csv"),
+            os.path.join(spill_dir, f"score_{index}.csv"),
+        )
+        for index in range(partition_count)
+    ]
+
+    for kind, log_paths, log_header, validate_row in [
+        ("entry", [entry_log_path], entry_log_header, validate_entry_row),
+        ("score", score_log_paths, score_log_header, validate_score_row),
+    ]:
+        with stats.measure(f"partition_{kind}_log"), contextlib.ExitStack() as stack:
+            partition_files = [
+                stack.enter_context(
+                    open(paths[kind == "score"], mode="w", encoding="utf-8")
+                )
+                for paths in partition_paths
+            ]
+            for partition_file in partition_files:
+                partition_file.write(log_header + "\n")
+            for log_path in log_paths:
+                if not partition_log(
+                    log_path, log_header, validate_row, partition_files, stats
+                ):
+                    return None
+
+    return partition_paths
+
+
+def extract_partitioned_ranking_candidates(
+    partition_paths: List[Tuple[str, str]],
+    ranking_thresholds: Dict[Tuple[str, int], int],
+) -> Tuple[Dict[str, List[str]], Dict[Tuple[str, int], List[Tuple[int, int, str]]]]:
+    """分割ごとに集計してランキング候補を選び、全分割の候補を統合する
+
+    プレイヤーは1つの分割にのみ含まれ、分割内の閾値の順位のスコアは全体の
+    閾値の順位のスコア以下のため、全体のランキング圏内のプレイヤーは必ず
+    所属する分割のランキング候補に含まれる。メモリ上に保持するのは1つの
+    分割のデータとランキング候補のみとなる。
+
+    Args:
+        partition_paths (List[Tuple[str, str]]):
+            分割ごとのエントリーファイルとプレイログファイルのパス
+        ranking_thresholds (Dict[Tuple[str, int], int]):
+            (集計モード, 最低プレイ回数)とランキングの閾値の対応
+
+    Returns:
+        Tuple[Dict[str, List[str]], Dict[Tuple[str, int], List[Tuple[int, int, str]]]]:
+            ランキング候補のプレイヤーのエントリーデータと、
+            (集計モード, 最低プレイ回数)ごとの順位順のランキング候補
+    """
+    candidate_entry_data = {}
+    ranking_candidates = {key: [] for key in ranking_thresholds}
+
+    for entry_partition_path, score_partition_path in partition_paths:
+        entry_data = generate_entry_data(entry_partition_path)
+        score_data = generate_score_data(score_partition_path, entry_data)
+        for key, ranking_threshold in ranking_thresholds.items():
+            aggregate_mode, lowest_play_times = key
+            partition_candidates = select_ranking_candidates(
+                score_data.iterate_ranking_items(aggregate_mode, lowest_play_times),
+                ranking_threshold,
+            )
+            for _, _, player_id in partition_candidates:
+                candidate_entry_data[player_id] = entry_data[player_id]
+            ranking_candidates[key] = select_ranking_candidates(
+                itertools.chain(ranking_candidates[key], partition_candidates),
+                ranking_threshold,
+            )
+        # 次の分割を読み込む前に解放する
+        del entry_data, score_data
+
+    return candidate_entry_data, ranking_candidates
+
+
+DATABASE_VERSION = 1  # データベースのスキーマのバージョン(PRAGMA user_version)
+DATABASE_BATCH_SIZE = 50000  # データベースにまとめて挿入する行数
+DATABASE_MAX_SCORE = 2**63 - 1  # SQLiteの整数に格納できるスコアの最大値
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    entry_id INTEGER PRIMARY KEY,
+    create_timestamp TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    handle_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    create_timestamp TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    score INTEGER NOT NULL
+);
+CREATE VIEW IF NOT EXISTS players AS
+SELECT first_entries.player_id, first_entries.create_timestamp AS entry_time,
+    last_entries.handle_name
+FROM (
+    SELECT MIN(entry_id) AS first_id, MAX(entry_id) AS last_id
+    FROM entries GROUP BY player_id
+) AS entry_ranges
+JOIN entries AS first_entries ON first_entries.entry_id = entry_ranges.first_id
+JOIN entries AS last_entries ON last_entries.entry_id = entry_ranges.last_id;
+CREATE VIEW IF NOT EXISTS player_scores AS
+SELECT players.player_id, players.entry_time, players.handle_name,
+    COUNT(*) AS total_plays, MAX(scores.score) AS best_score,
+    SUM(scores.score) AS total_score
+FROM players
+JOIN scores ON scores.player_id = players.player_id
+    AND scores.create_timestamp >= players.entry_time
+GROUP BY players.player_id;
+"""  # 入力ファイルの行と読み込み位置のテーブル、プレイヤーごとの集計値のビュー
+DATABASE_INDEXES = """
+CREATE INDEX IF NOT EXISTS entries_player_id ON entries (player_id);
+CREATE INDEX IF NOT EXISTS scores_player_id
+    ON scores (player_id, create_timestamp, score);
+CREATE INDEX IF NOT EXISTS scores_create_timestamp ON scores (create_timestamp);
+"""  # 一括挿入の後に作成するインデックス(scores_player_idは集計に必要な列を全て含む)
+DATABASE_SCORE_EXPRESSIONS = {
+    "highscore": "best_score",
+    # round(total_score / total_plays)と同じく0.5は偶数に丸める(スコアは0以上)
+    "average": "total_score / total_plays + ("
+    "2 * (total_score % total_plays) > total_plays"
+    " OR (2 * (total_score % total_plays) = total_plays"
+    " AND total_score / total_plays % 2 = 1))",
+}  # 集計モードとplayer_scoresビューからスコアを求める式
+DATABASE_RANKING_QUERY = """
+SELECT rank, player_id, handle_name, score FROM (
+    SELECT RANK() OVER (ORDER BY score DESC) AS rank,
+        player_id, handle_name, score, entry_time
+    FROM (
+        SELECT player_id, handle_name, entry_time, {score_expression} AS score
+        FROM player_scores WHERE total_plays >= ?
+    )
+)
+WHERE rank <= ?
+ORDER BY score DESC, entry_time, player_id
+"""  # 同点を同じ順位とし、スコア降順･エントリー日時昇順･プレイヤーID昇順に並べる
+
+
+def open_database(database_path: str):
+    """ランキング用のデータベースを開き、テーブルとビューを作成する
+
+    スキーマのバージョンが異なるデータベースは作成し直す。トランザクションは
+    呼び出し元でBEGIN/COMMITを実行して管理する。
+
+    Args:
+        database_path (str): データベースファイルパス
+
+    Returns:
+        sqlite3.Connection: データベースへの接続
+    """
+    connection = sqlite3.connect(database_path, isolation_level=None)
+    connection.execute("PRAGMA journal_mode = WAL")
+
+    if connection.execute("PRAGMA user_version").fetchone()[0] != DATABASE_VERSION:
+        connection.executescript("""
+            DROP VIEW IF EXISTS player_scores;
+            DROP VIEW IF EXISTS players;
+            DROP TABLE IF EXISTS scores;
+            DROP TABLE IF EXISTS entries;
+            DROP TABLE IF EXISTS log_files;
+            """)
+        connection.executescript(DATABASE_SCHEMA)
+        connection.execute(f"PRAGMA user_version = {DATABASE_VERSION}")
+
+    return connection
+
+
+def ingest_log(
+    connection,
+    log_path: str,
+    log_header: str,
+    offset: int,
+    digest,
+    stats: Optional[RunStats] = None,
+) -> bool:
+    """入力ファイルの指定位置以降の行を検証しながらデータベースに挿入する
+
+    行はDATABASE_BATCH_SIZE行ずつまとめて挿入し、読み込み位置と、digestに
+    追記分のみを加えたフィンガープリントを記録する。
+    トランザクションは呼び出し元で管理する。
+
+    Args:
+        connection (sqlite3.Connection): データベースへの接続
+        log_path (str): 入力ファイルパス
+        log_header (str): 入力ファイルのヘッダー
+        offset (int): 読み込み開始位置(0の場合はヘッダーから読み込む)
+        digest: 読み込み開始位置までの内容をハッシュ化したhashlibのオブジェクト
+        stats (Optional[RunStats]): 読み込んだ行数を記録する実行統計
+
+    Returns:
+        bool: 照合結果
+    """
+    headers = log_header.split(",")
+    if log_header == ENTRY_LOG_HEADER:
+        kind, validate_row = "entry", validate_entry_row
+        insert_statement = (
+            "INSERT INTO entries (create_timestamp, player_id, handle_name)"
+            " VALUES (?, ?, ?)"
+        )
+    else:
+        kind, validate_row = "score", validate_score_row
+        insert_statement = "INSERT INTO scores VALUES (?, ?, ?)"
+    rows = []
+    row_count = 0
+
+    # 末尾まで読み込むため、読み込み後のバイナリの位置を次回の読み込み位置とする
+    with open(log_path, mode="rb") as log_file:
+        log_file.seek(offset)
+        text_file = io.TextIOWrapper(log_file, encoding="utf-8")
+        csv_rows = iterate_csv_rows(text_file)
+        if offset == 0 and next(csv_rows, []) != headers:
+            log_name = "エントリーファイル" if kind == "entry" else "プレイログファイル"
+            print(f"{log_name}のヘッダーが正しくありません。", file=sys.stderr)
+            return False
+
+        for row_count, row in enumerate(csv_rows, 1):
+            if not validate_row(row, headers):
+                if stats is not None:
+                    stats.count_rows(row_count, 1)
+                return False
+            if kind == "entry":
+                rows.append(row)
+            else:
+                game_score = int(row[2])
+                if game_score > DATABASE_MAX_SCORE:
+                    print(
+                        "データベースに格納できない大きさのスコアが含まれています。",
+                        file=sys.stderr,
+                    )
+                    if stats is not None:
+                        stats.count_rows(row_count, 1)
+                    return False
+                rows.append((row[0], row[1], game_score))
+            if len(rows) >= DATABASE_BATCH_SIZE:
+                connection.executemany(insert_statement, rows)
+                rows.clear()
+        connection.executemany(insert_statement, rows)
+        consumed = log_file.tell()
+        text_file.detach()
+
+    if stats is not None:
+        stats.count_rows(row_count)
+    connection.execute(
+        "INSERT OR REPLACE INTO log_files VALUES (?, ?, ?, ?)",
+        (
+            os.path.abspath(log_path),
+            kind,
+            consumed,
+            hash_file_range(digest, log_path, offset, consumed).hexdigest(),
+        ),
+    )
+
+    return True
+
+
+def ingest_logs(
+    connection,
+    entry_log_path: str,
+    entry_log_header: str,
+    score_log_paths: List[str],
+    score_log_header: str,
+    stats: RunStats,
+) -> bool:
+    """入力ファイルの前回の読み込み位置以降に追記された行をデータベースに取り込む
+
+    読み込み済みの範囲が変更された場合や、前回と異なる入力ファイルが指定された
+    場合は全ての行を削除して先頭から取り込み直す。全ての入力ファイルを1つの
+    トランザクションで取り込み、不正な入力の場合は取り込みを取り消す。
+
+    Args:
+        connection (sqlite3.Connection): データベースへの接続
+        entry_log_path (str): エントリーファイルパス
+        entry_log_header (str): エントリーファイルのヘッダー
+        score_log_paths (List[str]): プレイログファイルパス
+        score_log_header (str): プレイログファイルのヘッダー
+        stats (RunStats): フェーズごとの実行統計
+
+    Returns:
+        bool: 照合結果
+    """
+    # 入力ファイルの存在確認
+    if not os.path.exists(entry_log_path):
+        print("ゲームのエントリーファイルが存在しません。", file=sys.stderr)
+        return False
+    for score_log_path in score_log_paths:
+        if not os.path.exists(score_log_path):
+            print("ゲームのプレイログファイルが存在しません。", file=sys.stderr)
+            return False
+
+    log_paths = [(entry_log_path, entry_log_header)] + [
+        (score_log_path, score_log_header) for score_log_path in score_log_paths
+    ]
+    log_states = {
+        path: {"path": path, "offset": offset, "fingerprint": fingerprint}
+        for path, offset, fingerprint in connection.execute(
+            "SELECT path, offset, fingerprint FROM log_files"
+        )
+    }
+
+    connection.execute("BEGIN")
+    try:
+        # 前回の取り込みから変更されていれば先頭から取り込み直す
+        # (照合でハッシュ化した範囲には追記分のみを加えてフィンガープリントを更新する)
+        log_digests = {}
+        if set(log_states) == {os.path.abspath(log_path) for log_path, _ in log_paths}:
+            for log_path, _ in log_paths:
+                digest = verify_log_prefix(
+                    log_path, log_states[os.path.abspath(log_path)]
+                )
+                if digest is None:
+                    break
+                log_digests[log_path] = digest
+        if len(log_digests) != len({log_path for log_path, _ in log_paths}):
+            connection.execute("DELETE FROM entries")
+            connection.execute("DELETE FROM scores")
+            connection.execute("DELETE FROM log_files")
+            log_states = {}
+            log_digests = {log_path: hashlib.sha256() for log_path, _ in log_paths}
+
+        for log_path, log_header in log_paths:
+            kind = "entry" if log_header == entry_log_header else "score"
+            offset = log_states.get(os.path.abspath(log_path), {"offset": 0})["offset"]
+            with stats.measure(f"ingest_{kind}_log"):
+                if not ingest_log(
+                    connection,
+                    log_path,
+                    log_header,
+                    offset,
+                    log_digests[log_path],
+                    stats,
+                ):
+                    connection.execute("ROLLBACK")
+                    return False
+
+        # インデックスは初回の一括挿入の後に作成し、以降は挿入時に更新される
+        with stats.measure("create_database_indexes"):
+            for statement in DATABASE_INDEXES.split(";"):
+                connection.execute(statement)
+        connection.execute("COMMIT")
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+
+    return True
+
+
+def extract_database_ranking_data(
+    connection,
+    aggregate_mode: str,
+    lowest_play_times: int,
+    ranking_threshold: int,
+) -> List[List[str]]:
+    """データベースのplayer_scoresビューからSQLでランキングデータを作成する
+
+    エントリー日時は最初のエントリー、ハンドルネームは最後のエントリーのものを使い、
+    エントリー日時より前のプレイを除外する点はextract_ranking_dataと同じ。
+
+    Args:
+        connection (sqlite3.Connection): データベースへの接続
+        aggregate_mode (str): 集計モードを表す文字列
+        lowest_play_times (int): average集計時の最低プレイ回数
+        ranking_threshold (int): 出力するランキングの閾値
+
+    Returns:
+        List[List[str]]: ランキングデータ
+    """
+    # highscoreは最低プレイ回数によらない
+    if aggregate_mode == "highscore":
+        lowest_play_times = 0
+    ranking_query = DATABASE_RANKING_QUERY.format(
+        score_expression=DATABASE_SCORE_EXPRESSIONS[aggregate_mode]
+    )
+
+    ranking_data = [["rank", "player_id", "handle_name", "score"]]
+    ranking_data.extend(
+        list(row)
+        for row in connection.execute(
+            ranking_query, (lowest_play_times, ranking_threshold)
+        )
+    )
+
+    return ranking_data
+
+
+def get_file_stats(file_paths: List[str]) -> Optional[Tuple]:
+    """ファイルのサイズと更新日時を取得
+
+    Args:
+        file_paths (List[str]): ファイルパス
+
+    Returns:
+        Optional[Tuple]: ファイルごとのサイズと更新日時(存在しないファイルがある場合はNone)
+    """
+    try:
+        return tuple(
+            (file_stat.st_size, file_stat.st_mtime_ns)
+            for file_stat in map(os.stat, file_paths)
+        )
+    except OSError:
+        return None
+
+
+class RankingRequestHandler(socketserver.StreamRequestHandler):
+    """ランキングサーバーへの1件の問い合わせに応答する
+
+    問い合わせと応答はどちらも1行のJSONで送受信する。
+    """
+
+    def handle(self):
+        query_line = self.rfile.readline()
+        # 接続確認のみの場合は応答しない
+        if not query_line:
+            return
+
+        try:
+            query = json.loads(query_line.decode("utf-8"))
+        except ValueError:
+            response = {
+                "status": 1,
+                "stdout": "",
+                "stderr": "問い合わせの形式が正しくありません。\n",
+            }
+        else:
+            response = self.server.answer_query(query)
+
+        self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode())
+
+
+class RankingServer(socketserver.UnixStreamServer):
+    """エントリーデータとプレイログデータを保持し続けてランキングを応答するサーバー
+
+    問い合わせのたびに入力ファイルのサイズと更新日時を確認し、変更があれば
+    追記された行のみを集計状態に反映する。読み込み済みの範囲のハッシュも保持し、
+    追記のみの場合は追記分だけをハッシュ化する。
+    """
+
+    def __init__(self, socket_path: str, entry_log_path: str, score_log_path: str):
+        super().__init__(socket_path, RankingRequestHandler)
+        self.entry_log_path = os.path.abspath(entry_log_path)
+        self.score_log_path = os.path.abspath(score_log_path)
+        self.log_state = None  # 集計状態(不正な入力を読み込んだ場合はNone)
+        self.file_stats = None  # 集計状態に反映済みのファイルのサイズと更新日時
+        self.log_digests = {}  # 入力ファイルごとの読み込み済みの範囲のハッシュ
+        self.leaderboards = {}  # 集計モードと順位表の対応(問い合わせがあったモードのみ)
+
+    def refresh(self) -> bool:
+        """入力ファイルの追記分を集計状態に反映
+
+        Returns:
+            bool: 照合結果
+        """
+        file_stats = get_file_stats([self.entry_log_path, self.score_log_path])
+        if self.log_state is not None and file_stats == self.file_stats:
+            return True
+
+        if self.log_state is None:
+            log_state = create_log_state()
+            self.log_digests = {}
+            self.leaderboards = {}
+        else:
+            log_state = self.log_state
+        self.log_state = None
+        previous_score_data = log_state["score_data"]
+        updated_players = set()
+        if not update_log_state(
+            log_state,
+            self.entry_log_path,
+            ENTRY_LOG_HEADER,
+            self.score_log_path,
+            SCORE_LOG_HEADER,
+            updated_players,
+            self.log_digests,
+        ):
+            return False
+        self.log_state = log_state
+        self.file_stats = file_stats
+
+        # 順位表は集計値が変わったプレイヤーのみ更新し、集計し直した場合は破棄する
+        if log_state["score_data"] is not previous_score_data:
+            self.leaderboards = {}
+        for aggregate_mode, leaderboard in self.leaderboards.items():
+            for player_id in updated_players:
+                leaderboard.update(
+                    player_id,
+                    log_state["score_data"].get_ranking_item(
+                        player_id, aggregate_mode, LOWEST_PLAY_TIMES
+                    ),
+                )
+
+        return True
+
+    def answer_query(self, query: Dict) -> Dict:
+        """問い合わせに対してCLIと同じ出力と終了ステータスを返す
+
+        Args:
+            query (Dict): 集計モード･エントリーファイルパス･プレイログファイルパス･
+                順位表の問い合わせ
+
+        Returns:
+            Dict: 終了ステータス･標準出力･標準エラー出力
+        """
+        output = io.StringIO()
+        error_output = io.StringIO()
+
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(
+            error_output
+        ):
+            status = self.answer_ranking(
+                query.get("aggregate_mode"),
+                query.get("entry_log_path"),
+                query.get("score_log_path"),
+                query.get("lookup"),
+            )
+
+        return {
+            "status": status,
+            "stdout": output.getvalue(),
+            "stderr": error_output.getvalue(),
+        }
+
+    def answer_ranking(
+        self,
+        aggregate_mode: str,
+        entry_log_path: str,
+        score_log_path: str,
+        lookup: Optional[List] = None,
+    ) -> int:
+        """ランキングデータを標準出力
+
+        Args:
+            aggregate_mode (str): 集計モードを表す文字列
+            entry_log_path (str): エントリーファイルパス
+            score_log_path (str): プレイログファイルパス
+            lookup (Optional[List]): プレイヤーID･先頭から読み飛ばす件数･出力する件数
+                (Noneの場合は上位のランキングを出力)
+
+        Returns:
+            int: 終了ステータス
+        """
+        if aggregate_mode not in AGGREGATE_MODES:
+            print("不正な集計モードが指定されています。", file=sys.stderr)
+            return 1
+        if aggregate_mode in PERCENTILE_MODES:
+            print("median/p90はランキングサーバーで利用できません。", file=sys.stderr)
+            return 1
+
+        # サーバーが保持していない入力ファイルには応答しない
+        if not isinstance(entry_log_path, str) or not isinstance(score_log_path, str):
+            print("入力ファイルパスが指定されていません。", file=sys.stderr)
+            return 1
+        if (os.path.abspath(entry_log_path), os.path.abspath(score_log_path)) != (
+            self.entry_log_path,
+            self.score_log_path,
+        ):
+            print("サーバーが読み込んでいる入力ファイルと異なります。", file=sys.stderr)
+            return 1
+
+        if lookup is not None and not (
+            isinstance(lookup, list)
+            and len(lookup) == 3
+            and (lookup[0] is None or isinstance(lookup[0], str))
+            and all(isinstance(value, int) and value >= 0 for value in lookup[1:])
+        ):
+            print("順位表の問い合わせの形式が正しくありません。", file=sys.stderr)
+            return 1
+
+        if not self.refresh():
+            return 1
+
+        # 順位表は最初の問い合わせで作成し、以降は追記分のみ更新する
+        if lookup is not None:
+            if aggregate_mode not in self.leaderboards:
+                self.leaderboards[aggregate_mode] = Leaderboard(
+                    self.log_state["score_data"].iterate_ranking_items(
+                        aggregate_mode, LOWEST_PLAY_TIMES
+                    )
+                )
+            ranking_data = build_leaderboard_data(
+                self.log_state["entry_data"],
+                self.leaderboards[aggregate_mode],
+                tuple(lookup),
+            )
+        else:
+            ranking_data = extract_ranking_data(
+                self.log_state["entry_data"],
+                self.log_state["score_data"],
+                aggregate_mode,
+                LOWEST_PLAY_TIMES,
+                RANKING_THRESHOLD,
+            )
+        output_ranking_data(ranking_data)
+
+        return 0
+
+
+def is_server_running(socket_path: str) -> bool:
+    """ソケットファイルで待ち受けているサーバーがあるか確認
+
+    Args:
+        socket_path (str): ソケットファイルパス
+
+    Returns:
+        bool: 確認結果
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+
+    return True
+
+
+def serve_ranking(socket_path: str, entry_log_path: str, score_log_path: str):
+    """Unixソケットでランキングの問い合わせを待ち受ける
+
+    起動時に入力ファイルを読み込み、以降は追記分のみを集計しながら
+    停止されるまで応答を続ける。
+
+    Args:
+        socket_path (str): ソケットファイルパス
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        print("この環境ではUnixソケットを利用できません。", file=sys.stderr)
+        sys.exit(1)
+
+    # 停止済みのサーバーが残したソケットファイルは削除する
+    if os.path.exists(socket_path):
+        if is_server_running(socket_path):
+            print("ソケットファイルは他のサーバーが使用しています。", file=sys.stderr)
+            sys.exit(1)
+        os.remove(socket_path)
+
+    # 停止要求(SIGTERM)でもソケットファイルを削除してから終了する
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+
+    with RankingServer(socket_path, entry_log_path, score_log_path) as server:
+        try:
+            # 最初の問い合わせを待たずに入力ファイルを読み込んでおく
+            if not server.refresh():
+                sys.exit(1)
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+
+def request_ranking(
+    socket_path: str,
+    aggregate_mode: str,
+    entry_log_path: str,
+    score_log_path: str,
+    lookup: Optional[Tuple[Optional[str], int, int]] = None,
+) -> Optional[Dict]:
+    """ランキングサーバーに問い合わせる
+
+    Args:
+        socket_path (str): ソケットファイルパス
+        aggregate_mode (str): 集計モードを表す文字列
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+        lookup (Optional[Tuple[Optional[str], int, int]]):
+            プレイヤーID･先頭から読み飛ばす件数･出力する件数
+            (Noneの場合は上位のランキングを問い合わせる)
+
+    Returns:
+        Optional[Dict]: 終了ステータス･標準出力･標準エラー出力
+            (サーバーに接続できない場合はNone)
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    query = {
+        "aggregate_mode": aggregate_mode,
+        "entry_log_path": os.path.abspath(entry_log_path),
+        "score_log_path": os.path.abspath(score_log_path),
+    }
+    if lookup is not None:
+        query["lookup"] = list(lookup)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return None
+        client.sendall((json.dumps(query, ensure_ascii=False) + "\n").encode())
+        with client.makefile(mode="rb") as response_file:
+            response_line = response_file.readline()
+
+    try:
+        return json.loads(response_line.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+def ends_with_newline(file_path: str) -> bool:
+    """ファイルが空か改行で終わっているか確認
+
+    Args:
+        file_path (str): ファイルパス
+
+    Returns:
+        bool: 確認結果
+    """
+    with open(file_path, mode="rb") as target_file:
+        target_file.seek(0, os.SEEK_END)
+        if target_file.tell() == 0:
+            return True
+        target_file.seek(-1, os.SEEK_END)
+        return target_file.read(1) == b"\n"
+
+
+def follow_ranking(
+    aggregate_mode: str,
+    entry_log_path: str,
+    score_log_path: str,
+    emit_interval: float,
+):
+    """入力ファイルへの追記を取り込み続け、ランキングが変わるたびに標準出力する
+
+    追記された行は1行ずつプレイヤーの集計値に反映し、ランキング候補は集計値が
+    変わったプレイヤーのみで更新する。書き込み途中の行を読まないよう、
+    各入力ファイルが改行で終わっている時点で取り込む。
+
+    Args:
+        aggregate_mode (str): 集計モードを表す文字列
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (str): プレイログファイルパス
+        emit_interval (float): ランキングを出力する最短の間隔(秒)
+    """
+    log_state = create_log_state()
+    log_digests = {}  # 入力ファイルごとの読み込み済みの範囲のハッシュ
+    file_stats = None
+    ranking_candidates = None
+    emitted_ranking_data = None
+    emitted_time = None
+
+    while True:
+        # 入力ファイルが変更されていれば追記分を取り込む
+        current_file_stats = get_file_stats([entry_log_path, score_log_path])
+        if current_file_stats is None or (
+            current_file_stats != file_stats
+            and ends_with_newline(entry_log_path)
+            and ends_with_newline(score_log_path)
+        ):
+            score_data = log_state["score_data"]
+            updated_players = set()
+            if not update_log_state(
+                log_state,
+                entry_log_path,
+                ENTRY_LOG_HEADER,
+                score_log_path,
+                SCORE_LOG_HEADER,
+                updated_players,
+                log_digests,
+            ):
+                sys.exit(1)
+            file_stats = current_file_stats
+
+            # 先頭から集計し直した場合はランキング候補も全件から選び直す
+            if ranking_candidates is None or log_state["score_data"] is not score_data:
+                ranking_candidates = select_ranking_candidates(
+                    log_state["score_data"].iterate_ranking_items(
+                        aggregate_mode, LOWEST_PLAY_TIMES
+                    ),
+                    RANKING_THRESHOLD,
+                )
+            elif updated_players:
+                ranking_candidates = update_ranking_candidates(
+                    ranking_candidates,
+                    log_state["score_data"],
+                    updated_players,
+                    aggregate_mode,
+                    LOWEST_PLAY_TIMES,
+                    RANKING_THRESHOLD,
+                )
+
+        # ランキング(ハンドルネームを含む)が変わった場合のみ出力する
+        ranking_data = build_ranking_data(
+            log_state["entry_data"], ranking_candidates, RANKING_THRESHOLD
+        )
+        if ranking_data != emitted_ranking_data and (
+            emitted_time is None or time.monotonic() - emitted_time >= emit_interval
+        ):
+            output_ranking_data(ranking_data)
+            sys.stdout.flush()
+            emitted_ranking_data = ranking_data
+            emitted_time = time.monotonic()
+
+        time.sleep(FOLLOW_POLL_INTERVAL)
+
+
+@dataclasses.dataclass
+class RankingOptions:
+    """コマンドライン引数から作成する実行オプション
+
+    組み合わせの検証はvalidate_ranking_optionsで行う。
+
+    Attributes:
+        aggregate_mode (str): 集計モードを表す文字列
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (Union[str, List[str]]): プレイログファイルパス(複数の場合はリスト)
+        engine (str): プレイログの集計エンジン(python/numpy)
+        workers (int): プレイログを並列に集計するプロセス数
+        checkpoint_path (Optional[str]): チェックポイントファイルパス
+            (指定した場合は前回からの追記分のみを集計する)
+        socket_path (Optional[str]): ランキングサーバーのソケットファイルパス
+            (指定した場合はサーバーに問い合わせ、接続できなければ自身で集計する)
+        follow (bool): 入力ファイルへの追記を取り込み続けるか
+        emit_interval (float): follow時にランキングを出力する最短の間隔(秒)
+        use_cache (bool): 入力ファイルのキャッシュファイルを利用するか
+        stats_path (Optional[str]): 実行統計の出力先ファイルパス
+            (-の場合は標準エラー出力、Noneの場合は出力しない)
+        queries (List[str]): multiで出力するランキングの指定
+            (MODE[:THRESHOLD[:MIN_PLAYS]][=OUTPUT]形式)
+        max_errors (int): validateで出力する不正な行の上限
+        window_start (Optional[str]): 集計する期間の開始日時(この日時を含む)
+        window_end (Optional[str]): 集計する期間の終了日時(この日時を含まない)
+        player_id (Optional[str]): 順位を出力するプレイヤーID
+        offset (Optional[int]): 順位順に先頭から読み飛ばす件数
+        limit (Optional[int]): offsetから出力する件数(省略時は出力するランキングの閾値)
+        export_format (Optional[str]): ランキングを書き出す形式(csv/jsonl)
+        export_threshold (Optional[int]): 書き出すランキングの閾値(Noneの場合は全件)
+        output_path (Optional[str]): 書き出し先ファイルパス(Noneの場合は標準出力)
+        memory_budget (Optional[str]): 集計に使うメモリの上限(512M･2Gなど)
+            (指定した場合は入力ファイルを一時ファイルに分割して分割ごとに集計する)
+        database_path (Optional[str]): SQLiteデータベースファイルパス
+            (指定した場合は追記分を取り込んでSQLでランキングを集計する)
+        concurrent_load (bool): エントリーファイルとプレイログファイルを並行して読み込むか
+    """
+
+    aggregate_mode: str
+    entry_log_path: str
+    score_log_path: Union[str, List[str]]
+    engine: str = "python"
+    workers: int = 1
+    checkpoint_path: Optional[str] = None
+    socket_path: Optional[str] = None
+    follow: bool = False
+    emit_interval: float = 1.0
+    use_cache: bool = False
+    stats_path: Optional[str] = None
+    queries: List[str] = dataclasses.field(default_factory=list)
+    max_errors: int = 100
+    window_start: Optional[str] = None
+    window_end: Optional[str] = None
+    player_id: Optional[str] = None
+    offset: Optional[int] = None
+    limit: Optional[int] = None
+    export_format: Optional[str] = None
+    export_threshold: Optional[int] = None
+    output_path: Optional[str] = None
+    memory_budget: Optional[str] = None
+    database_path: Optional[str] = None
+    concurrent_load: bool = False
+
+
+def check_lookup_range(offset: Optional[int], limit: Optional[int]):
+    """順位順に引く範囲の指定を検証
+
+    Args:
+        offset (Optional[int]): 順位順に先頭から読み飛ばす件数
+        limit (Optional[int]): offsetから出力する件数
+
+    Raises:
+        RankingError: 件数に負の値が指定された場合
+    """
+    if (offset is not None and offset < 0) or (limit is not None and limit < 0):
+        raise RankingError("読み飛ばす件数と出力する件数には0以上を指定してください。")
+
+
+def validate_ranking_options(options: RankingOptions):
+    """実行オプションの値と組み合わせを検証
+
+    CLIとRankingEngine.from_logsが共有する。プレイログファイルパスは
+    resolve_log_pathsで展開済み(1つの場合は文字列)として扱う。
+
+    Args:
+        options (RankingOptions): 実行オプション
 
-    Returns:
-        bool: 照合結果
+    Raises:
+        RankingError: 不正な値や同時に利用できない指定を含む場合
     """
-    timestamp_format = "%Y-%m-%d %H:%M:%S"
-    regexp_format = r"^\w+$"
+    aggregate_mode = options.aggregate_mode
+    engine = options.engine
+    workers = options.workers
+    checkpoint_path = options.checkpoint_path
+    socket_path = options.socket_path
+    follow = options.follow
+    use_cache = options.use_cache
+    single_score_log = isinstance(options.score_log_path, str)
+    has_window = options.window_start is not None or options.window_end is not None
+    has_lookup = (
+        options.player_id is not None
+        or options.offset is not None
+        or options.limit is not None
+    )
 
-    # 入力ファイルの存在確認
-    if not os.path.exists(entry_log_path):
-        print("ゲームのエントリーファイルが存在しません。", file=sys.stderr)
-        return False
+    if not single_score_log and (
+        aggregate_mode in ("serve", "validate")
+        or engine != "python"
+        or checkpoint_path is not None
+        or socket_path is not None
+        or follow
+        or use_cache
+        or has_window
+    ):
+        raise RankingError(
+            "複数のプレイログファイルはpythonエンジンによる1回分のランキング出力でのみ"
+            "利用できます。"
+        )
 
-    # ヘッダー確認と要素数の確認
-    with open(entry_log_path, mode="r", encoding="utf-8") as entry_file:
-        csv_reader = csv.reader(entry_file)
-        headers = next(csv_reader)
-        if headers != entry_log_header.split(","):
-            print("エントリーファイルのヘッダーが正しくありません。", file=sys.stderr)
-            return False
+    # プレイヤーや範囲を指定したランキングは1回分のランキング出力でのみ利用できる
+    if has_lookup:
+        if aggregate_mode in ("serve", "multi", "validate") or follow:
+            raise RankingError(
+                "--player･--offset･--limitはhighscore/average/median/p90の"
+                "1回分のランキング出力でのみ利用できます。"
+            )
+        if options.player_id is not None and (
+            options.offset is not None or options.limit is not None
+        ):
+            raise RankingError("--playerと--offset･--limitは同時に指定できません。")
+        check_lookup_range(options.offset, options.limit)
 
-        for row in csv_reader:
-            if len(row) != len(headers):
-                print("エントリーファイルの要素数が正しくありません。", file=sys.stderr)
-                return False
+    # 全件などの大きなランキングの書き出しは1回分のランキング出力でのみ利用できる
+    if (
+        options.export_format is not None
+        or options.export_threshold is not None
+        or options.output_path
+    ):
+        if options.export_format not in EXPORT_FORMATS:
+            raise RankingError("書き出す形式にはcsvかjsonlを指定してください。")
+        if (
+            aggregate_mode in ("serve", "multi", "validate")
+            or follow
+            or socket_path is not None
+            or has_lookup
+        ):
+            raise RankingError(
+                "--exportはhighscore/average/median/p90の1回分のランキング出力でのみ"
+                "利用でき、--player･--offset･--limitと同時に指定できません。"
+            )
+        if options.export_threshold is not None and options.export_threshold < 0:
+            raise RankingError("書き出すランキングの閾値には0以上を指定してください。")
 
-            # タイムスタンプが正しいフォーマットか確認
-            create_timestamp = row[0]
-            try:
-                datetime.strptime(create_timestamp, timestamp_format)
-            except ValueError:
-                print(
-                    "エントリーファイルのcreate_timestamp列に不正な値が含まれています。",
-                    file=sys.stderr,
-                )
-                return False
+    # 期間を指定した集計は時刻索引を使って1プロセスで1回分のランキングを出力する
+    if has_window:
+        if (
+            aggregate_mode in ("serve", "validate")
+            or engine != "python"
+            or workers != 1
+            or checkpoint_path is not None
+            or socket_path is not None
+            or follow
+            or use_cache
+        ):
+            raise RankingError(
+                "期間の指定は並列数1のpythonエンジンによる1回分のランキング出力でのみ"
+                "利用できます。"
+            )
+        if parse_time_window(options.window_start, options.window_end) is None:
+            raise RankingError("集計する期間の指定が正しくありません。")
 
-            # プレイヤーIDが正しいフォーマットか確認
-            player_id = row[1]
-            pattern = re.compile(regexp_format)
-            if (
-                len(player_id) <= 0
-                or len(player_id) > 20
-                or not pattern.match(player_id)
-            ):
-                print("プレイヤーIDに不正な文字列が含まれています。", file=sys.stderr)
-                return False
+    # 圧縮された入力ファイルはバイト位置を使わず先頭から順に読み込む場合のみ利用できる
+    if (
+        aggregate_mode in ("serve", "validate")
+        or checkpoint_path is not None
+        or follow
+        or has_window
+        or options.database_path is not None
+    ) and any(
+        detect_compression(log_path) is not None
+        for log_path in [options.entry_log_path]
+        + ([options.score_log_path] if single_score_log else options.score_log_path)
+    ):
+        raise RankingError(
+            "圧縮された入力ファイルはチェックポイント･--follow･期間の指定･サーバー･"
+            "validate･データベースと同時に利用できません。"
+        )
 
-            # ハンドルネームが正しいフォーマットか確認
-            handle_name = row[2]
-            pattern = re.compile(regexp_format)
-            if (
-                len(handle_name) <= 0
-                or len(handle_name) > 20
-                or not pattern.match(handle_name)
-            ):
-                print("ハンドルネームに不正な文字列が含まれています。", file=sys.stderr)
-                return False
+    # キャッシュは1回の読み込みで全体を集計する場合のみ利用できる
+    if use_cache and (
+        aggregate_mode == "serve"
+        or workers > 1
+        or checkpoint_path is not None
+        or follow
+    ):
+        raise RankingError(
+            "キャッシュは並列集計･チェックポイント･--follow･サーバーと同時に利用できません。"
+        )
 
-    return True
+    # 並行読み込みは1つのプレイログファイルを1回の読み込みで集計する場合のみ利用できる
+    if options.concurrent_load and (
+        aggregate_mode in ("serve", "validate")
+        or follow
+        or engine != "python"
+        or workers != 1
+        or not single_score_log
+        or checkpoint_path is not None
+        or use_cache
+        or has_window
+        or options.memory_budget is not None
+        or options.database_path is not None
+    ):
+        raise RankingError(
+            "--concurrent-loadは並列数1のpythonエンジンで1つのプレイログファイルを"
+            "1回の読み込みで集計する場合のみ利用でき、チェックポイント･キャッシュ･"
+            "期間の指定･サーバー･validate･--follow･メモリの上限の指定･データベースと"
+            "同時に利用できません。"
+        )
 
+    # 入力ファイルの不正な行を全て出力
+    if aggregate_mode == "validate":
+        if (
+            checkpoint_path is not None
+            or socket_path is not None
+            or follow
+            or use_cache
+            or options.stats_path is not None
+        ):
+            raise RankingError(
+                "validateはチェックポイント･サーバー･--follow･キャッシュ･実行統計と"
+                "同時に利用できません。"
+            )
+        if workers < 1 or options.max_errors < 0:
+            raise RankingError(
+                "並列数には1以上、出力する件数には0以上を指定してください。"
+            )
+        return
 
-def validate_score_log(score_log_path: str, score_log_header: str) -> bool:
-    """入力ファイルがプレイログファイルの仕様と同様か確認
+    # 実行統計は1回分のランキング出力でのみ記録できる
+    if options.stats_path is not None and (aggregate_mode == "serve" or follow):
+        raise RankingError("実行統計はサーバー･--followと同時に利用できません。")
 
-    Args:
-        score_log_path (str): エントリーファイルパス
-        score_log_header (str): エントリーファイルのヘッダー
+    # サーバーとして起動
+    if aggregate_mode == "serve":
+        if socket_path is None:
+            raise RankingError("サーバーの起動にはソケットファイルパスが必要です。")
+        if workers != 1 or engine != "python" or checkpoint_path is not None:
+            raise RankingError("サーバーは並列数1のpythonエンジンでのみ起動できます。")
+        return
 
-    Returns:
-        bool: 照合結果
-    """
-    timestamp_format = "%Y-%m-%d %H:%M:%S"
-    regexp_format = r"^\w+$"
+    # 複数のランキングの指定を確認
+    query_modes = []
+    if aggregate_mode == "multi":
+        if not options.queries:
+            raise RankingError(
+                "multiには--queryで1つ以上のランキングを指定してください。"
+            )
+        for query in options.queries:
+            parsed_query = parse_ranking_query(query)
+            if parsed_query is None:
+                raise RankingError(f"不正なランキングが指定されています。({query})")
+            query_modes.append(parsed_query[0])
+        if socket_path is not None:
+            raise RankingError("multiはランキングサーバーと同時に利用できません。")
 
-    # 入力ファイルの存在確認
-    if not os.path.exists(score_log_path):
-        print("ゲームのプレイログファイルが存在しません。", file=sys.stderr)
-        return False
+    # 集計モードの確認
+    if aggregate_mode not in AGGREGATE_MODES and aggregate_mode != "multi":
+        raise RankingError("不正な集計モードが指定されています。")
 
-    # ヘッダー確認と要素数の確認
-    with open(score_log_path, mode="r", encoding="utf-8") as score_file:
-        csv_reader = csv.reader(score_file)
-        headers = next(csv_reader)
-        if headers != score_log_header.split(","):
-            print("プレイログファイルのヘッダーが正しくありません。", file=sys.stderr)
-            return False
+    # median/p90はスコアのヒストグラムを1プロセスで集計する場合のみ利用できる
+    if any(mode in PERCENTILE_MODES for mode in [aggregate_mode] + query_modes) and (
+        engine != "python"
+        or workers != 1
+        or not single_score_log
+        or checkpoint_path is not None
+        or socket_path is not None
+        or follow
+        or has_window
+        or options.memory_budget is not None
+        or options.database_path is not None
+    ):
+        raise RankingError(
+            "median/p90は並列数1のpythonエンジンによる1つのプレイログファイルの集計でのみ"
+            "利用でき、チェックポイント･サーバー･--follow･期間の指定･メモリの上限の指定･"
+            "データベースと同時に利用できません。"
+        )
 
-        for row in csv_reader:
-            if len(row) != len(headers):
-                print("プレイログファイルの要素数が正しくありません。", file=sys.stderr)
-                return False
+    # 集計エンジンの確認
+    if engine == "numpy" and np is None:
+        raise RankingError("numpyエンジンにはnumpyのインストールが必要です。")
 
-            # タイムスタンプが正しいフォーマットか確認
-            create_timestamp = row[0]
-            try:
-                datetime.strptime(create_timestamp, timestamp_format)
-            except ValueError:
-                print(
-                    "プレイログファイルのcreate_timestamp列に不正な値が含まれています。",
-                    file=sys.stderr,
-                )
-                return False
+    # 並列数の確認
+    if workers < 1:
+        raise RankingError("並列数には1以上を指定してください。")
+    if workers > 1 and engine != "python":
+        raise RankingError("並列集計はpythonエンジンでのみ利用できます。")
+    if checkpoint_path is not None and (workers > 1 or engine != "python"):
+        raise RankingError(
+            "チェックポイントは並列数1のpythonエンジンでのみ利用できます。"
+        )
 
-            # プレイヤーIDが正しいフォーマットか確認
-            player_id = row[1]
-            pattern = re.compile(regexp_format)
-            if (
-                len(player_id) <= 0
-                or len(player_id) > 20
-                or not pattern.match(player_id)
-            ):
-                print("プレイヤーIDに不正な文字列が含まれています。", file=sys.stderr)
-                return False
+    # 追記を取り込み続けてランキングの変化を出力
+    if follow:
+        if (
+            aggregate_mode == "multi"
+            or workers != 1
+            or engine != "python"
+            or checkpoint_path is not None
+            or socket_path is not None
+        ):
+            raise RankingError("--followは並列数1のpythonエンジンでのみ利用できます。")
+        if options.emit_interval < 0:
+            raise RankingError("出力間隔には0以上を指定してください。")
+        return
 
-            # スコアが正しいフォーマットか確認
-            score = row[2]
-            if not score.isdigit() or int(score) < 0:
-                print(
-                    "プレイログファイルのスコアに不正な値が含まれています。",
-                    file=sys.stderr,
-                )
-                return False
+    # メモリの上限を指定した集計は分割ファイルから1回分のランキングを出力する
+    if options.memory_budget is not None:
+        if (
+            engine != "python"
+            or workers != 1
+            or checkpoint_path is not None
+            or socket_path is not None
+            or use_cache
+            or has_window
+            or has_lookup
+            or options.export_format is not None
+        ):
+            raise RankingError(
+                "メモリの上限の指定は並列数1のpythonエンジンによる上位のランキングの"
+                "出力(highscore/average/multi)でのみ利用できます。"
+            )
+        if parse_memory_size(options.memory_budget) is None:
+            raise RankingError(
+                "メモリの上限には1以上のサイズ(例: 512M)を指定してください。"
+            )
 
-    return True
+    # データベースへの取り込みとSQLによる集計は1回分のランキング出力でのみ利用できる
+    if options.database_path is not None:
+        if (
+            engine != "python"
+            or workers != 1
+            or checkpoint_path is not None
+            or socket_path is not None
+            or use_cache
+            or has_window
+            or has_lookup
+            or options.export_format is not None
+            or options.memory_budget is not None
+        ):
+            raise RankingError(
+                "データベースは並列数1のpythonエンジンによる上位のランキングの"
+                "出力(highscore/average/multi)でのみ利用できます。"
+            )
+        if sqlite3 is None:
+            raise RankingError("データベースにはsqlite3モジュールが必要です。")
 
 
-def generate_entry_data(entry_log_path: str) -> Dict[str, List[str]]:
-    """エントリーデータを生成
+def parse_arguments(argv: List[str]) -> RankingOptions:
+    """コマンドライン引数を解析
 
     Args:
-        entry_log_path (str): エントリーファイルパス
+        argv (List[str]): プログラム名を除いたコマンドライン引数
 
     Returns:
-        Dict[str, List[str]]: エントリーデータ
+        RankingOptions: 解析結果(組み合わせは未検証)
     """
-    entry_data = {}
 
-    # エントリーファイルを開く
-    with open(entry_log_path, mode="r", encoding="utf-8") as entry_file:
-        csv_reader = csv.reader(entry_file)
-        next(csv_reader)  # ヘッダーをスキップ
+    def exit_with_argument_error(message: str):
+        # 引数が要件と一致しない場合はエラー出力
+        print(f"入力引数が不正です。({message})", file=sys.stderr)
+        sys.exit(1)
 
-        # 各行を辞書に格納
-        for row in csv_reader:
-            entry_time = row[0]
-            player_id = row[1]
-            handle_name = row[2]
-            # 既にエントリーしている場合はハンドルネームのみ更新
-            if player_id in entry_data.keys():
-                existing_entry_time = entry_data[player_id][0]
-                entry_data[player_id] = [existing_entry_time, handle_name]
-            else:
-                entry_data[player_id] = [entry_time, handle_name]
+    parser = argparse.ArgumentParser(
+        description="eスポーツ大会のランキングを出力するプログラム"
+    )
+    parser.error = exit_with_argument_error
+    parser.add_argument(
+        "aggregate_mode",
+        help="集計モード(highscore/average/median/p90、serveでサーバーを起動、"
+        "multiで--queryの各ランキングを出力、validateで不正な行を全て出力)",
+    )
+    parser.add_argument("entry_log_path", help="エントリーファイルパス")
+    parser.add_argument(
+        "score_log_path",
+        nargs="+",
+        help="プレイログファイルパス(複数のファイル･ディレクトリ･globパターンを指定可)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["python", "numpy"],
+        default="python",
+        help="プレイログの集計エンジン(numpyはnumpyのインストールが必要)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="プレイログを分割して並列に集計するプロセス数",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="集計結果と読み込み位置を保存するチェックポイントファイルパス",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="ランキングサーバーのソケットファイルパス(serveでは待ち受け先)",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="解析済みの入力ファイルを隣のキャッシュファイルに保存して再利用する",
+    )
+    parser.add_argument(
+        "--query",
+        action="append",
+        default=[],
+        metavar="MODE[:THRESHOLD[:MIN_PLAYS]][=OUTPUT]",
+        help="multiで出力するランキング(複数指定可、OUTPUT省略時は標準出力)",
+    )
+    parser.add_argument(
+        "--max-errors",
+        type=int,
+        default=100,
+        help="validateで出力する不正な行の上限",
+    )
+    parser.add_argument(
+        "--from",
+        dest="window_start",
+        default=None,
+        metavar="TIMESTAMP",
+        help="集計する期間の開始日時(YYYY-MM-DD HH:MM:SSまたはYYYY-MM-DDTHH:MM:SS、この日時を含む)",
+    )
+    parser.add_argument(
+        "--to",
+        dest="window_end",
+        default=None,
+        metavar="TIMESTAMP",
+        help="集計する期間の終了日時(YYYY-MM-DD HH:MM:SSまたはYYYY-MM-DDTHH:MM:SS、この日時を含まない)",
+    )
+    parser.add_argument(
+        "--player",
+        default=None,
+        metavar="PLAYER_ID",
+        help="指定したプレイヤーの順位のみを出力する",
+    )
+    parser.add_argument(
+        "--offset",
+        type=int,
+        default=None,
+        help="順位順に先頭から読み飛ばす件数(--limitと組み合わせて範囲を出力する)",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="--offsetから出力する件数(省略時は10件)",
+    )
+    parser.add_argument(
+        "--export",
+        choices=EXPORT_FORMATS,
+        default=None,
+        help="ランキングを閾値なし(または--export-thresholdまで)で指定した形式で書き出す",
+    )
+    parser.add_argument(
+        "--export-threshold",
+        type=int,
+        default=None,
+        help="--exportで書き出すランキングの閾値(省略時は全件)",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="--exportの書き出し先ファイルパス(省略時は標準出力)",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        default=None,
+        metavar="SIZE",
+        help="集計に使うメモリの上限(例: 512M、2G)。指定した場合は入力ファイルを"
+        "プレイヤーIDで一時ファイルに分割して分割ごとに集計する",
+    )
+    parser.add_argument(
+        "--database",
+        default=None,
+        metavar="PATH",
+        help="入力ファイルの追記分を取り込むSQLiteデータベースファイルパス"
+        "(指定した場合はSQLでランキングを集計する)",
+    )
+    parser.add_argument(
+        "--concurrent-load",
+        action="store_true",
+        help="エントリーファイルとプレイログファイルを別スレッドで並行して読み込む",
+    )
+    parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="-",
+        default=None,
+        metavar="PATH",
+        help="フェーズごとの実行統計をJSONで出力する(PATH省略時は標準エラー出力)",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="入力ファイルへの追記を取り込み続け、ランキングが変わるたびに出力する",
+    )
+    parser.add_argument(
+        "--emit-interval",
+        type=float,
+        default=1.0,
+        help="--follow時にランキングを出力する最短の間隔(秒)",
+    )
 
-    return entry_data
+    arguments = parser.parse_args(argv)
 
+    return RankingOptions(
+        arguments.aggregate_mode,
+        arguments.entry_log_path,
+        arguments.score_log_path,
+        engine=arguments.engine,
+        workers=arguments.workers,
+        checkpoint_path=arguments.checkpoint,
+        socket_path=arguments.socket,
+        follow=arguments.follow,
+        emit_interval=arguments.emit_interval,
+        use_cache=arguments.cache,
+        stats_path=arguments.stats,
+        queries=arguments.query,
+        max_errors=arguments.max_errors,
+        window_start=arguments.window_start,
+        window_end=arguments.window_end,
+        player_id=arguments.player,
+        offset=arguments.offset,
+        limit=arguments.limit,
+        export_format=arguments.export,
+        export_threshold=arguments.export_threshold,
+        output_path=arguments.output,
+        memory_budget=arguments.memory_budget,
+        database_path=arguments.database,
+        concurrent_load=arguments.concurrent_load,
+    )
 
-def generate_score_data(
-    score_log_path: str, entry_data: Dict[str, List[str]]
-) -> Dict[str, List[str]]:
-    """プレイログデータを生成
+
+def load_logs(
+    entry_log_path: str,
+    score_log_path: Union[str, List[str]],
+    engine: str,
+    workers: int,
+    checkpoint_path: Optional[str],
+    use_cache: bool,
+    stats: RunStats,
+    window: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    track_histograms: bool = False,
+    concurrent_load: bool = False,
+) -> RankingEngine:
+    """入力ファイルのバリデーションとエントリーデータ･プレイログデータ生成を行う
+
+    不正な入力の場合は終了ステータス1で終了する(1つのプレイログファイルを
+    1プロセスで読み込む場合はRankingEngine.from_logsの例外を送出する)。
 
     Args:
-        score_log_path (str): プレイログファイルパス
-        entry_data (Dict[str, List[str]]): エントリーデータ
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (Union[str, List[str]]): プレイログファイルパス(複数の場合はリスト)
+        engine (str): プレイログの集計エンジン(python/numpy)
+        workers (int): プレイログを並列に集計するプロセス数
+        checkpoint_path (Optional[str]): チェックポイントファイルパス
+        use_cache (bool): 入力ファイルのキャッシュファイルを利用するか
+        stats (RunStats): フェーズごとの実行統計
+        window (Optional[Tuple[Optional[int], Optional[int]]]):
+            集計する期間の開始日時と終了日時のエポック秒(Noneの場合は全期間)
+        track_histograms (bool): median/p90用のヒストグラムも集計するか
+            (1つのプレイログファイルを1プロセスで読み込む場合のみ)
+        concurrent_load (bool): 2つの入力ファイルを並行して読み込むか
+            (1つのプレイログファイルを1プロセスで読み込む場合のみ)
 
     Returns:
-        Dict[str,List[str]]: プレイログデータ
+        RankingEngine: 読み込んだデータを保持する集計器
     """
-    score_data = {}
+    # 入力ファイルのバリデーションと辞書への格納を同時に行う
+    # (不正な行があれば集計途中のデータは出力せずに終了する)
+    if checkpoint_path is not None:
+        with stats.measure("load_logs_incremental"):
+            loaded_data = load_logs_incremental(
+                entry_log_path,
+                ENTRY_LOG_HEADER,
+                score_log_path,
+                SCORE_LOG_HEADER,
+                checkpoint_path,
+            )
+        if loaded_data is None:
+            sys.exit(1)
+        return RankingEngine(*loaded_data)
 
-    with open(score_log_path, mode="r", encoding="utf-8") as score_file:
-        csv_reader = csv.reader(score_file)
-        next(csv_reader)  # ヘッダーをスキップ
+    if window is None and isinstance(score_log_path, str) and workers == 1:
+        return RankingEngine.from_logs(
+            entry_log_path,
+            score_log_path,
+            engine,
+            use_cache,
+            stats,
+            track_histograms,
+            concurrent_load,
+        )
 
-        # 各行を辞書に格納
-        for row in csv_reader:
-            create_timestamp = row[0]
-            player_id = row[1]
-            game_score = int(row[2])
+    with stats.measure("load_entry_log"):
+        entry_data = load_entry_log(entry_log_path, ENTRY_LOG_HEADER, use_cache, stats)
+    if entry_data is None:
+        sys.exit(1)
+    if window is not None:
+        with stats.measure("load_score_window"):
+            score_data = load_score_window(
+                score_log_path, SCORE_LOG_HEADER, entry_data, window, stats
+            )
+    elif not isinstance(score_log_path, str):
+        with stats.measure("load_score_logs_parallel"):
+            score_data = load_score_logs_parallel(
+                score_log_path, SCORE_LOG_HEADER, entry_data, workers
+            )
+    else:
+        with stats.measure("load_score_log_parallel"):
+            score_data = load_score_log_parallel(
+                score_log_path, SCORE_LOG_HEADER, entry_data, workers
+            )
+    if score_data is None:
+        sys.exit(1)
 
-            # エントリ―データにプレイヤーIDがなければ記録しない
-            if player_id not in entry_data.keys():
-                continue
+    return RankingEngine(entry_data, score_data)
 
-            # エントリー日時より古いプレイログは集計しない
-            entry_time = entry_data[player_id][0]
-            if create_timestamp < entry_time:
-                continue
 
-            # 既存スコアがあればプレイ回数･最高スコア･合計スコア更新
-            if player_id in score_data.keys():
-                entry_time = entry_data[player_id][0]
-                total_plays = score_data[player_id][1] + 1
-                best_score = score_data[player_id][2]
-                total_score = score_data[player_id][3] + game_score
-                average_score = round(total_score / total_plays)
-                # 最高スコアの更新
-                if game_score > best_score:
-                    best_score = game_score
-            # 既存スコアがなければ新規追加
-            else:
-                entry_time = entry_data[player_id][0]
-                total_plays = 1
-                best_score = game_score
-                total_score = game_score
-                average_score = game_score
-            # プレイログデータ更新
-            score_data[player_id] = [
-                entry_time,
-                total_plays,
-                best_score,
-                total_score,
-                average_score,
-            ]
+def print_ranking(
+    aggregate_mode: str,
+    entry_log_path: str,
+    score_log_path: Union[str, List[str]],
+    engine: str,
+    workers: int,
+    checkpoint_path: Optional[str],
+    socket_path: Optional[str],
+    use_cache: bool,
+    stats: RunStats,
+    window: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    lookup: Optional[Tuple[Optional[str], int, int]] = None,
+    concurrent_load: bool = False,
+):
+    """入力ファイルを読み込み、ランキングを1回標準出力する
 
-    return score_data
+    不正な入力の場合は終了ステータス1で終了する。
+
+    Args:
+        aggregate_mode (str): 集計モードを表す文字列
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (Union[str, List[str]]): プレイログファイルパス(複数の場合はリスト)
+        engine (str): プレイログの集計エンジン(python/numpy)
+        workers (int): プレイログを並列に集計するプロセス数
+        checkpoint_path (Optional[str]): チェックポイントファイルパス
+        socket_path (Optional[str]): ランキングサーバーのソケットファイルパス
+        use_cache (bool): 入力ファイルのキャッシュファイルを利用するか
+        stats (RunStats): フェーズごとの実行統計
+        window (Optional[Tuple[Optional[int], Optional[int]]]):
+            集計する期間の開始日時と終了日時のエポック秒(Noneの場合は全期間)
+        lookup (Optional[Tuple[Optional[str], int, int]]):
+            プレイヤーID･先頭から読み飛ばす件数･出力する件数
+            (Noneの場合は上位のランキングを出力)
+        concurrent_load (bool): 2つの入力ファイルを並行して読み込むか
+    """
+    # 起動中のサーバーがあれば集計済みのデータで応答してもらう
+    if socket_path is not None:
+        with stats.measure("request_ranking"):
+            response = request_ranking(
+                socket_path, aggregate_mode, entry_log_path, score_log_path, lookup
+            )
+        if response is not None:
+            print(response["stdout"], end="")
+            print(response["stderr"], end="", file=sys.stderr)
+            if response["status"] != 0:
+                sys.exit(response["status"])
+            return
 
+    ranking_engine = load_logs(
+        entry_log_path,
+        score_log_path,
+        engine,
+        workers,
+        checkpoint_path,
+        use_cache,
+        stats,
+        window,
+        aggregate_mode in PERCENTILE_MODES,
+        concurrent_load,
+    )
 
-def extract_ranking_data(
-    entry_data: Dict[str, List[str]],
-    score_data: Dict[str, List[str]],
+    # ランキングデータ作成(プレイヤーや範囲の指定があれば順位表から引く)
+    if lookup is not None:
+        with stats.measure("build_leaderboard"):
+            ranking_data = ranking_engine.lookup(aggregate_mode, *lookup)
+    else:
+        with stats.measure("extract_ranking_data"):
+            ranking_data = ranking_engine.ranking(aggregate_mode)
+
+    # ランキングデータ出力
+    with stats.measure("output_ranking_data"):
+        output_ranking_data(ranking_data)
+
+
+def export_ranking(
     aggregate_mode: str,
-    lowest_play_times: int,
-    ranking_threshold: int,
-) -> List[List[str]]:
-    """ランキングデータを作成する
+    entry_log_path: str,
+    score_log_path: Union[str, List[str]],
+    engine: str,
+    workers: int,
+    checkpoint_path: Optional[str],
+    use_cache: bool,
+    stats: RunStats,
+    window: Optional[Tuple[Optional[int], Optional[int]]],
+    export_format: str,
+    ranking_threshold: Optional[int],
+    output_path: Optional[str],
+    concurrent_load: bool = False,
+):
+    """入力ファイルを読み込み、閾値までのランキングを指定した形式で書き出す
+
+    数百万人分のランキングを書き出せるよう、行を順位順に生成しながら
+    まとめて書き込む。不正な入力の場合は終了ステータス1で終了する。
 
     Args:
-        entry_data (Dict[str, List[str]]): エントリーデータ
-        score_data (Dict[str, List[str]]): プレイログデータ
         aggregate_mode (str): 集計モードを表す文字列
-        lowest_play_times (int): average集計時の最低プレイ回数
-        ranking_threshold (int): 出力するランキングの閾値
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (Union[str, List[str]]): プレイログファイルパス(複数の場合はリスト)
+        engine (str): プレイログの集計エンジン(python/numpy)
+        workers (int): プレイログを並列に集計するプロセス数
+        checkpoint_path (Optional[str]): チェックポイントファイルパス
+        use_cache (bool): 入力ファイルのキャッシュファイルを利用するか
+        stats (RunStats): フェーズごとの実行統計
+        window (Optional[Tuple[Optional[int], Optional[int]]]):
+            集計する期間の開始日時と終了日時のエポック秒(Noneの場合は全期間)
+        export_format (str): 出力形式(csv/jsonl)
+        ranking_threshold (Optional[int]): 出力するランキングの閾値(Noneの場合は全件)
+        output_path (Optional[str]): 出力先ファイルパス(Noneの場合は標準出力)
+        concurrent_load (bool): 2つの入力ファイルを並行して読み込むか
+    """
+    ranking_engine = load_logs(
+        entry_log_path,
+        score_log_path,
+        engine,
+        workers,
+        checkpoint_path,
+        use_cache,
+        stats,
+        window,
+        aggregate_mode in PERCENTILE_MODES,
+        concurrent_load,
+    )
+
+    with stats.measure("export_ranking"):
+        ranking_rows = iterate_ranking_rows(
+            ranking_engine.entry_data,
+            ranking_engine.score_data,
+            aggregate_mode,
+            LOWEST_PLAY_TIMES,
+            ranking_threshold,
+        )
+        if output_path is None:
+            write_ranking_rows(ranking_rows, sys.stdout, export_format)
+            return
+        with open(output_path, mode="w", encoding="utf-8") as output_file:
+            write_ranking_rows(ranking_rows, output_file, export_format)
+
+
+def parse_ranking_query(query: str) -> Optional[Tuple[str, int, int, Optional[str]]]:
+    """MODE[:THRESHOLD[:MIN_PLAYS]][=OUTPUT]形式のランキングの指定を解析
+
+    閾値と最低プレイ回数を省略した場合は通常の実行と同じ値を使い、
+    出力先を省略した場合は標準出力に出力する。
+
+    Args:
+        query (str): ランキングの指定
 
     Returns:
-        List[List[str]]: ランキングデータ
+        Optional[Tuple[str, int, int, Optional[str]]]:
+            集計モード･閾値･average集計時の最低プレイ回数･出力先ファイルパス
+            (不正な指定の場合はNone)
     """
-    ranking_data = []
-    rank = 0
-    previous_score = None
-    ranking_data_header = "rank,player_id,handle_name,score"
+    ranking_spec, separator, output_path = query.partition("=")
+    if separator and not output_path:
+        return None
 
-    # ランキング集計(スコア降順、エントリー日時昇順、プレイヤーID昇順)
-    if aggregate_mode == "highscore":
-        score_data = dict(
-            sorted(
-                score_data.items(),
-                key=lambda item: (-int(item[1][2]), item[1][0], item[0]),
+    fields = ranking_spec.split(":")
+    if len(fields) > 3 or fields[0] not in AGGREGATE_MODES:
+        return None
+    if not all(field.isdigit() for field in fields[1:]):
+        return None
+    ranking_threshold = int(fields[1]) if len(fields) > 1 else RANKING_THRESHOLD
+    lowest_play_times = int(fields[2]) if len(fields) > 2 else LOWEST_PLAY_TIMES
+
+    return fields[0], ranking_threshold, lowest_play_times, output_path or None
+
+
+def print_multiple_rankings(
+    queries: List[Tuple[str, int, int, Optional[str]]],
+    entry_log_path: str,
+    score_log_path: Union[str, List[str]],
+    engine: str,
+    workers: int,
+    checkpoint_path: Optional[str],
+    use_cache: bool,
+    stats: RunStats,
+    window: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    concurrent_load: bool = False,
+):
+    """入力ファイルを1回だけ読み込み、指定された複数のランキングを出力する
+
+    集計モードと最低プレイ回数が同じランキングは、最も大きい閾値で選んだ
+    ランキング候補を共有し、閾値ごとに切り出す。
+
+    Args:
+        queries (List[Tuple[str, int, int, Optional[str]]]):
+            集計モード･閾値･average集計時の最低プレイ回数･出力先ファイルパス
+            (Noneの場合は標準出力)
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (Union[str, List[str]]): プレイログファイルパス(複数の場合はリスト)
+        engine (str): プレイログの集計エンジン(python/numpy)
+        workers (int): プレイログを並列に集計するプロセス数
+        checkpoint_path (Optional[str]): チェックポイントファイルパス
+        use_cache (bool): 入力ファイルのキャッシュファイルを利用するか
+        stats (RunStats): フェーズごとの実行統計
+        window (Optional[Tuple[Optional[int], Optional[int]]]):
+            集計する期間の開始日時と終了日時のエポック秒(Noneの場合は全期間)
+        concurrent_load (bool): 2つの入力ファイルを並行して読み込むか
+    """
+    rankings = []  # ランキングデータと出力先ファイルパスの組
+
+    ranking_engine = load_logs(
+        entry_log_path,
+        score_log_path,
+        engine,
+        workers,
+        checkpoint_path,
+        use_cache,
+        stats,
+        window,
+        any(query[0] in PERCENTILE_MODES for query in queries),
+        concurrent_load,
+    )
+
+    # 最も大きい閾値で先にランキング候補を選び、以降のランキングは候補から切り出す
+    with stats.measure("extract_ranking_data"):
+        for (
+            aggregate_mode,
+            lowest_play_times,
+        ), ranking_threshold in collect_ranking_thresholds(queries).items():
+            ranking_engine.ranking(aggregate_mode, ranking_threshold, lowest_play_times)
+        for (
+            aggregate_mode,
+            ranking_threshold,
+            lowest_play_times,
+            output_path,
+        ) in queries:
+            ranking_data = ranking_engine.ranking(
+                aggregate_mode, ranking_threshold, lowest_play_times
             )
+            rankings.append((ranking_data, output_path))
+
+    # ランキングごとに出力
+    with stats.measure("output_ranking_data"):
+        for ranking_data, output_path in rankings:
+            if output_path is None:
+                output_ranking_data(ranking_data)
+                continue
+            with open(output_path, mode="w", encoding="utf-8") as output_file:
+                output_ranking_data(ranking_data, output_file)
+
+
+def print_spilled_rankings(
+    queries: List[Tuple[str, int, int, Optional[str]]],
+    entry_log_path: str,
+    score_log_path: Union[str, List[str]],
+    memory_budget: int,
+    stats: RunStats,
+):
+    """入力ファイルをプレイヤーIDで分割し、分割ごとに集計してランキングを出力する
+
+    全プレイヤーのエントリーデータ･プレイログデータがメモリに収まらない場合に、
+    1つの分割の集計がmemory_budgetに収まる分割数で処理する。分割ファイルは
+    一時ディレクトリ(環境変数TMPDIRで変更可)に書き込み、終了時に削除する。
+    不正な入力の場合は終了ステータス1で終了する。
+
+    Args:
+        queries (List[Tuple[str, int, int, Optional[str]]]):
+            集計モード･閾値･average集計時の最低プレイ回数･出力先ファイルパス
+            (Noneの場合は標準出力)
+        entry_log_path (str): エントリーファイルパス
+        score_log_path (Union[str, List[str]]): プレイログファイルパス(複数の場合はリスト)
+        memory_budget (int): 集計に使うメモリの上限(バイト)
+        stats (RunStats): フェーズごとの実行統計
+    """
+    score_log_paths = (
+        [score_log_path] if isinstance(score_log_path, str) else score_log_path
+    )
+    if not os.path.exists(entry_log_path):
+        print("ゲームのエントリーファイルが存在しません。", file=sys.stderr)
+        sys.exit(1)
+    partition_count = count_spill_partitions(entry_log_path, memory_budget)
+
+    with tempfile.TemporaryDirectory(prefix="ranking_spill_") as spill_dir:
+        partition_paths = partition_logs(
+            entry_log_path,
+            ENTRY_LOG_HEADER,
+            score_log_paths,
+            SCORE_LOG_HEADER,
+            spill_dir,
+            partition_count,
+            stats,
         )
-    elif aggregate_mode == "average":
-        # プレイ回数が指定回数に満たないユーザは集計しない
-        score_data = {k: v for k, v in score_data.items() if v[1] >= lowest_play_times}
-        score_data = dict(
-            sorted(
-                score_data.items(),
-                key=lambda item: (-int(item[1][4]), item[1][0], item[0]),
+        if partition_paths is None:
+            sys.exit(1)
+
+        with stats.measure("extract_ranking_data"):
+            entry_data, ranking_candidates = extract_partitioned_ranking_candidates(
+                partition_paths, collect_ranking_thresholds(queries)
             )
-        )
 
-    # ヘッダーを追加
-    ranking_data.append(ranking_data_header.split(","))
+    with stats.measure("output_ranking_data"):
+        output_ranking_queries(queries, entry_data, ranking_candidates)
 
-    # 集計データを基にランキングデータ生成
-    for player_id, score_item in score_data.items():
-        if aggregate_mode == "highscore":
-            score = int(score_item[2])
-        elif aggregate_mode == "average":
-            score = int(score_item[4])
-        rank += 1
 
-        # スコアが変わっている場合は順位を変更
-        if score != previous_score:
-            print_rank = rank
+def collect_ranking_thresholds(
+    queries: List[Tuple[str, int, int, Optional[str]]],
+) -> Dict[Tuple[str, int], int]:
+    """集計モードと最低プレイ回数が同じランキングのうち最も大きい閾値を求める
 
-        # ランキング圏外は処理しない
-        if print_rank > ranking_threshold:
-            break
+    Args:
+        queries (List[Tuple[str, int, int, Optional[str]]]):
+            集計モード･閾値･average集計時の最低プレイ回数･出力先ファイルパス
 
-        # ランキングデータに格納
-        handle_name = entry_data[player_id][1]
-        ranking_data.append([print_rank, player_id, handle_name, score])
-        previous_score = score
+    Returns:
+        Dict[Tuple[str, int], int]: (集計モード, 最低プレイ回数)と閾値の対応
+    """
+    largest_thresholds = {}
+    for aggregate_mode, ranking_threshold, lowest_play_times, _ in queries:
+        # highscoreは最低プレイ回数によらない
+        if aggregate_mode == "highscore":
+            lowest_play_times = 0
+        key = (aggregate_mode, lowest_play_times)
+        largest_thresholds[key] = max(largest_thresholds.get(key, 0), ranking_threshold)
 
-    return ranking_data
+    return largest_thresholds
 
 
-def output_ranking_data(ranking_data: Dict[str, List[str]]):
-    """ランキングデータを標準出力
+def output_ranking_queries(
+    queries: List[Tuple[str, int, int, Optional[str]]],
+    entry_data: Dict[str, List[str]],
+    ranking_candidates: Dict[Tuple[str, int], List[Tuple[int, int, str]]],
+):
+    """共有するランキング候補をランキングごとの閾値で切り出して出力する
 
     Args:
-        ranking_data (Dict[str,List[str]]): ランキングデータ
+        queries (List[Tuple[str, int, int, Optional[str]]]):
+            集計モード･閾値･average集計時の最低プレイ回数･出力先ファイルパス
+            (Noneの場合は標準出力)
+        entry_data (Dict[str, List[str]]): エントリーデータ
+        ranking_candidates (Dict[Tuple[str, int], List[Tuple[int, int, str]]]):
+            (集計モード, 最低プレイ回数)ごとの順位順のランキング候補
     """
-    # 配列をCSV形式で出力
-    for output_data in ranking_data:
-        print(",".join(map(str, output_data)))
+    for aggregate_mode, ranking_threshold, lowest_play_times, output_path in queries:
+        if aggregate_mode == "highscore":
+            lowest_play_times = 0
+        ranking_data = build_ranking_data(
+            entry_data,
+            ranking_candidates[aggregate_mode, lowest_play_times],
+            ranking_threshold,
+        )
+        if output_path is None:
+            output_ranking_data(ranking_data)
+            continue
+        with open(output_path, mode="w", encoding="utf-8") as output_file:
+            output_ranking_data(ranking_data, output_file)
 
 
-def main(aggregate_mode: str, entry_log_path: str, score_log_path: str):
-    """eスポーツ大会のランキングを出力するプログラム
+def print_database_rankings(
+    queries: List[Tuple[str, int, int, Optional[str]]],
+    entry_log_path: str,
+    score_log_path: Union[str, List[str]],
+    database_path: str,
+    stats: RunStats,
+):
+    """入力ファイルの追記分をデータベースに取り込み、SQLでランキングを出力する
+
+    不正な入力の場合は終了ステータス1で終了する。
 
     Args:
-        aggregate_mode (str): 集計モードを表す文字列
+        queries (List[Tuple[str, int, int, Optional[str]]]):
+            集計モード･閾値･average集計時の最低プレイ回数･出力先ファイルパス
+            (Noneの場合は標準出力)
         entry_log_path (str): エントリーファイルパス
-        score_log_path (str): プレイログファイルパス
+        score_log_path (Union[str, List[str]]): プレイログファイルパス(複数の場合はリスト)
+        database_path (str): データベースファイルパス
+        stats (RunStats): フェーズごとの実行統計
     """
-    entry_log_header = "create_timestamp,player_id,handle_name"
-    score_log_header = "create_timestamp,player_id,score"
-    LOWEST_PLAY_TIMES = 10  # average集計時の最低プレイ回数
-    RANKING_THRESHOLD = 10  # 出力するランキングの閾値
+    score_log_paths = (
+        [score_log_path] if isinstance(score_log_path, str) else score_log_path
+    )
 
-    # 集計モードの確認
-    if aggregate_mode not in ["highscore", "average"]:
-        print("不正な集計モードが指定されています。", file=sys.stderr)
-        sys.exit(1)
+    with contextlib.closing(open_database(database_path)) as connection:
+        if not ingest_logs(
+            connection,
+            entry_log_path,
+            ENTRY_LOG_HEADER,
+            score_log_paths,
+            SCORE_LOG_HEADER,
+            stats,
+        ):
+            sys.exit(1)
+
+        rankings = []  # ランキングデータと出力先ファイルパスの組
+        with stats.measure("extract_ranking_data"):
+            for (
+                aggregate_mode,
+                ranking_threshold,
+                lowest_play_times,
+                output_path,
+            ) in queries:
+                try:
+                    ranking_data = extract_database_ranking_data(
+                        connection, aggregate_mode, lowest_play_times, ranking_threshold
+                    )
+                except sqlite3.OperationalError as error:
+                    if str(error) != "integer overflow":
+                        raise
+                    print(
+                        "合計スコアがデータベースで集計できる範囲を超えています。",
+                        file=sys.stderr,
+                    )
+                    sys.exit(1)
+                rankings.append((ranking_data, output_path))
+
+    # ランキングごとに出力
+    with stats.measure("output_ranking_data"):
+        for ranking_data, output_path in rankings:
+            if output_path is None:
+                output_ranking_data(ranking_data)
+                continue
+            with open(output_path, mode="w", encoding="utf-8") as output_file:
+                output_ranking_data(ranking_data, output_file)
+
+
+def main(options: RankingOptions):
+    """eスポーツ大会のランキングを出力するプログラム
 
-    # 入力ファイルのバリデーションチェック
-    if not validate_entry_log(entry_log_path, entry_log_header):
+    Args:
+        options (RankingOptions): コマンドライン引数から作成した実行オプション
+    """
+    # プレイログは複数のファイル･ディレクトリ･globパターンで指定できる
+    score_log_paths = resolve_log_paths(
+        [options.score_log_path]
+        if isinstance(options.score_log_path, str)
+        else options.score_log_path
+    )
+    if score_log_paths is None:
         sys.exit(1)
-    if not validate_score_log(score_log_path, score_log_header):
+    options = dataclasses.replace(
+        options,
+        score_log_path=(
+            score_log_paths[0] if len(score_log_paths) == 1 else score_log_paths
+        ),
+    )
+    try:
+        validate_ranking_options(options)
+    except RankingError as error:
+        print(error, file=sys.stderr)
         sys.exit(1)
+    aggregate_mode = options.aggregate_mode
+    entry_log_path = options.entry_log_path
+    score_log_path = options.score_log_path
 
-    # ファイルを辞書に格納
-    entry_data = generate_entry_data(entry_log_path)
-    score_data = generate_score_data(score_log_path, entry_data)
+    # 入力ファイルの不正な行を全て出力
+    if aggregate_mode == "validate":
+        if report_log_violations(
+            entry_log_path, score_log_path, options.workers, options.max_errors
+        ):
+            sys.exit(1)
+        return
 
-    # ランキングデータ作成
-    ranking_data = extract_ranking_data(
-        entry_data, score_data, aggregate_mode, LOWEST_PLAY_TIMES, RANKING_THRESHOLD
-    )
+    # サーバーとして起動
+    if aggregate_mode == "serve":
+        serve_ranking(options.socket_path, entry_log_path, score_log_path)
+        return
 
-    # ランキングデータ出力
-    output_ranking_data(ranking_data)
+    # 追記を取り込み続けてランキングの変化を出力
+    if options.follow:
+        try:
+            follow_ranking(
+                aggregate_mode, entry_log_path, score_log_path, options.emit_interval
+            )
+        except KeyboardInterrupt:
+            pass
+        return
 
+    # 検証済みの指定を集計に使う値に変換
+    lookup = None
+    if (
+        options.player_id is not None
+        or options.offset is not None
+        or options.limit is not None
+    ):
+        lookup = (
+            options.player_id,
+            options.offset if options.offset is not None else 0,
+            options.limit if options.limit is not None else RANKING_THRESHOLD,
+        )
+    window = None
+    if options.window_start is not None or options.window_end is not None:
+        window = parse_time_window(options.window_start, options.window_end)
+    if aggregate_mode == "multi":
+        parsed_queries = [parse_ranking_query(query) for query in options.queries]
+    else:
+        parsed_queries = [(aggregate_mode, RANKING_THRESHOLD, LOWEST_PLAY_TIMES, None)]
 
-if __name__ == "__main__":
-    # 引数の数が要件と一致しない場合はエラー出力
-    EXPECTED_ARG_COUNT = 4
-    if len(sys.argv) != EXPECTED_ARG_COUNT:
-        print("入力引数の数が不正です。", file=sys.stderr)
+    # 実行統計は終了ステータスによらず出力する
+    stats = RunStats()
+    try:
+        if options.database_path is not None:
+            print_database_rankings(
+                parsed_queries,
+                entry_log_path,
+                score_log_path,
+                options.database_path,
+                stats,
+            )
+        elif options.memory_budget is not None:
+            print_spilled_rankings(
+                parsed_queries,
+                entry_log_path,
+                score_log_path,
+                parse_memory_size(options.memory_budget),
+                stats,
+            )
+        elif aggregate_mode == "multi":
+            print_multiple_rankings(
+                parsed_queries,
+                entry_log_path,
+                score_log_path,
+                options.engine,
+                options.workers,
+                options.checkpoint_path,
+                options.use_cache,
+                stats,
+                window,
+                options.concurrent_load,
+            )
+        elif options.export_format is not None:
+            export_ranking(
+                aggregate_mode,
+                entry_log_path,
+                score_log_path,
+                options.engine,
+                options.workers,
+                options.checkpoint_path,
+                options.use_cache,
+                stats,
+                window,
+                options.export_format,
+                options.export_threshold,
+                options.output_path,
+                options.concurrent_load,
+            )
+        else:
+            print_ranking(
+                aggregate_mode,
+                entry_log_path,
+                score_log_path,
+                options.engine,
+                options.workers,
+                options.checkpoint_path,
+                options.socket_path,
+                options.use_cache,
+                stats,
+                window,
+                lookup,
+                options.concurrent_load,
+            )
+    except RankingError as error:
+        print(error, file=sys.stderr)
         sys.exit(1)
+    finally:
+        if options.stats_path is not None:
+            stats.write_report(options.stats_path)
 
-    aggregate_mode = sys.argv[1]
-    entry_log_path = sys.argv[2]
-    score_log_path = sys.argv[3]
 
-    main(aggregate_mode, entry_log_path, score_log_path)
+if __name__ == "__main__":
+    main(parse_arguments(sys.argv[1:]))
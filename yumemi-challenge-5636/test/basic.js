@@ -24,10 +24,24 @@ const MESSAGES = {
 testRunner.verifyStatusCode = async function(testcase, inputData, outputData, result) {
     const MSG = this.messageBuilder;
     const shouldError = testcase._json.output.type === "error";
+    const exitCode = testcase._json.exitCode;
+    const stderr = testcase._json.stderr;
 
     if (shouldError) {
         testcase._output = "test/out/basic/empty.out";
     }
+    // add for expected stderr message.
+    if (stderr !== undefined) {
+        assert.include([].concat(result.stderr || []).join("\n"), stderr);
+    }
+    // add for exact exit status (e.g. validate outputs rows and exits with 1).
+    if (exitCode !== undefined) {
+        if (result.code !== exitCode) {
+            console.log(await MSG.abnormalEnd(inputData, outputData, result));
+            assert.equal(result.code, exitCode);
+        }
+        return;
+    }
     if (shouldError !== (result.code === 0)) {
         return;
     } else if (shouldError) {